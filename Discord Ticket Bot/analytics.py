@@ -0,0 +1,231 @@
+import math
+import time
+
+# Ticket analytics as running aggregates per guild, fed by the events the bot
+# already handles (ticket opened, first support reply, ticket closed). Nothing
+# is ever recomputed from message history: each guild keeps all-time counters,
+# one rollup per UTC day for the last RETENTION_DAYS days, and quantile
+# sketches of first-response and resolution times. Memory per guild is bounded
+# by the number of days kept and the sketch size, not by the ticket count.
+# Changed guilds are marked dirty and written out by the bot at intervals.
+
+DAY = 86400
+RETENTION_DAYS = 30
+
+
+class Sketch:
+    # Log-bucketed quantile sketch: a value lands in bucket ceil(log_gamma(v)),
+    # and every value in a bucket is within `accuracy` of the bucket's
+    # midpoint, so quantiles come back within that relative error. Durations
+    # from 1s to a year fit in ~400 buckets; past max_bins the lowest buckets
+    # are folded together, which only blurs the fastest values. Sketches merge
+    # by adding bucket counts.
+    def __init__(self, accuracy=0.02, max_bins=512):
+        self.accuracy = accuracy
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.max_bins = max_bins
+        self.bins = {}
+        self.zeros = 0
+        self.count = 0
+
+    def add(self, value, count=1):
+        self.count += count
+        if value < 1:
+            self.zeros += count
+            return
+        key = math.ceil(math.log(value) / self.log_gamma)
+        self.bins[key] = self.bins.get(key, 0) + count
+        if len(self.bins) > self.max_bins:
+            self._collapse()
+
+    def merge(self, other):
+        self.count += other.count
+        self.zeros += other.zeros
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+        while len(self.bins) > self.max_bins:
+            self._collapse()
+        return self
+
+    def _collapse(self):
+        lowest, second = sorted(self.bins)[:2]
+        self.bins[second] += self.bins.pop(lowest)
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if rank < seen:
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.bins) / (self.gamma + 1)
+
+    def to_dict(self):
+        return {'a': self.accuracy, 'z': self.zeros, 'b': self.bins}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data.get('a', 0.02))
+        sketch.zeros = data.get('z', 0)
+        sketch.bins = {int(k): v for k, v in data.get('b', {}).items()}
+        sketch.count = sketch.zeros + sum(sketch.bins.values())
+        return sketch
+
+
+class Rollup:
+    # Counts and sketches for one period (a day, or all time).
+    def __init__(self):
+        self.opened = 0
+        self.closed = 0
+        self.responded = 0
+        self.first_response = Sketch()
+        self.resolution = Sketch()
+
+    def merge(self, other):
+        self.opened += other.opened
+        self.closed += other.closed
+        self.responded += other.responded
+        self.first_response.merge(other.first_response)
+        self.resolution.merge(other.resolution)
+        return self
+
+    def to_dict(self):
+        return {'opened': self.opened, 'closed': self.closed, 'responded': self.responded,
+                'first_response': self.first_response.to_dict(), 'resolution': self.resolution.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data):
+        rollup = cls()
+        rollup.opened = data.get('opened', 0)
+        rollup.closed = data.get('closed', 0)
+        rollup.responded = data.get('responded', 0)
+        rollup.first_response = Sketch.from_dict(data.get('first_response', {}))
+        rollup.resolution = Sketch.from_dict(data.get('resolution', {}))
+        return rollup
+
+
+class GuildStats:
+    def __init__(self):
+        self.total = Rollup()
+        self.days = {}
+        self.types = {}
+
+    def day(self, when, retention):
+        day = int(when // DAY)
+        rollup = self.days.get(day)
+        if rollup is None:
+            rollup = self.days[day] = Rollup()
+            for old in [d for d in self.days if d <= day - retention]:
+                del self.days[old]
+        return rollup
+
+    def to_dict(self):
+        return {'total': self.total.to_dict(), 'types': self.types,
+                'days': {str(day): rollup.to_dict() for day, rollup in self.days.items()}}
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.total = Rollup.from_dict(data.get('total', {}))
+        stats.types = dict(data.get('types', {}))
+        stats.days = {int(day): Rollup.from_dict(rollup) for day, rollup in data.get('days', {}).items()}
+        return stats
+
+
+class Analytics:
+    def __init__(self, retention_days=RETENTION_DAYS):
+        self.retention_days = retention_days
+        self.guilds = {}
+        self.dirty = set()
+        self.windows = {}
+
+    def get(self, guild_id):
+        stats = self.guilds.get(guild_id)
+        if stats is None:
+            stats = self.guilds[guild_id] = GuildStats()
+        return stats
+
+    def _changed(self, guild_id):
+        self.dirty.add(guild_id)
+        self.windows.pop(guild_id, None)
+
+    # events
+
+    def opened(self, guild_id, ticket_type, when):
+        stats = self.get(guild_id)
+        stats.total.opened += 1
+        stats.day(when, self.retention_days).opened += 1
+        stats.types[ticket_type] = stats.types.get(ticket_type, 0) + 1
+        self._changed(guild_id)
+
+    def responded(self, guild_id, opened_at, when):
+        # first reply from support in a ticket, counted on the day it happened
+        stats = self.get(guild_id)
+        seconds = max(0.0, when - opened_at)
+        for rollup in (stats.total, stats.day(when, self.retention_days)):
+            rollup.responded += 1
+            rollup.first_response.add(seconds)
+        self._changed(guild_id)
+
+    def closed(self, guild_id, opened_at, when):
+        stats = self.get(guild_id)
+        seconds = max(0.0, when - opened_at)
+        for rollup in (stats.total, stats.day(when, self.retention_days)):
+            rollup.closed += 1
+            rollup.resolution.add(seconds)
+        self._changed(guild_id)
+
+    # queries
+
+    def window(self, guild_id, days, now=None):
+        # Merged rollup of the last `days` days (today included); cached until
+        # the guild's next event or the next day.
+        today = int((now or time.time()) // DAY)
+        cached = self.windows.setdefault(guild_id, {})
+        key = (days, today)
+        rollup = cached.get(key)
+        if rollup is None:
+            rollup = Rollup()
+            stats = self.guilds.get(guild_id)
+            if stats:
+                for day in range(today - min(days, self.retention_days) + 1, today + 1):
+                    if day in stats.days:
+                        rollup.merge(stats.days[day])
+            for old in [k for k in cached if k[1] != today]:
+                del cached[old]
+            cached[key] = rollup
+        return rollup
+
+    def total(self, guild_id):
+        stats = self.guilds.get(guild_id)
+        return stats.total if stats else Rollup()
+
+    # persistence
+
+    def load(self, rows):
+        # rows: (guild_id, json-ready dict) pairs from storage
+        for guild_id, data in rows:
+            self.guilds[guild_id] = GuildStats.from_dict(data)
+            self.windows.pop(guild_id, None)
+
+    def take_dirty(self):
+        rows = [(guild_id, self.guilds[guild_id].to_dict()) for guild_id in self.dirty if guild_id in self.guilds]
+        self.dirty.clear()
+        return rows
+
+
+def format_duration(seconds):
+    if seconds is None:
+        return "—"
+    if seconds < 60:
+        return f"{seconds:.0f}s"
+    if seconds < 3600:
+        return f"{seconds / 60:.0f}m"
+    if seconds < 2 * DAY:
+        return f"{seconds / 3600:.1f}h"
+    return f"{seconds / DAY:.1f}d"
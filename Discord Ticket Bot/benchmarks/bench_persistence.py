@@ -0,0 +1,110 @@
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from persistence import ConfigWriter, JsonFileSink
+from storage import SettingsCache, Storage
+
+# Measures how long the event loop is blocked while admins change settings,
+# comparing the old blocking json.dump with the write-behind ConfigWriter,
+# then the memory taken by loading every guild's settings from SQLite versus
+# the lazily loaded SettingsCache.
+
+GUILDS = int(os.getenv("BENCH_GUILDS", "5000"))
+EDITS = int(os.getenv("BENCH_EDITS", "200"))
+CACHE_SIZE = int(os.getenv("BENCH_CACHE_SIZE", "1000"))
+
+
+def make_config():
+    data = {}
+    for i in range(GUILDS):
+        data[str(10**17 + i)] = {
+            "support_role": 10**18 + i,
+            "category_id": 10**18 + i + 1,
+            "panel_channel": 10**18 + i + 2,
+            "panel_title": "📩 Support Tickets",
+            "panel_description": "Click to open a private ticket. " * 4,
+            "embed_color": "#00ff99",
+            "dashboard_channel_id": 10**18 + i + 3,
+        }
+    return data
+
+
+async def probe(stalls, stop):
+    interval = 0.001
+    while not stop.is_set():
+        before = time.perf_counter()
+        await asyncio.sleep(interval)
+        stalls.append(max(0.0, time.perf_counter() - before - interval))
+
+
+async def run(save):
+    stalls = []
+    stop = asyncio.Event()
+    task = asyncio.create_task(probe(stalls, stop))
+    started = time.perf_counter()
+    for i in range(EDITS):
+        await save(i)
+        await asyncio.sleep(0.002)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await task
+    return elapsed, max(stalls) * 1000, sum(stalls) * 1000
+
+
+async def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "config.json")
+        data = make_config()
+        keys = list(data)
+
+        async def blocking_save(i):
+            data[keys[i % len(keys)]]["panel_title"] = f"title {i}"
+            with open(path, "w") as f:
+                json.dump(data, f, indent=4)
+
+        writer = ConfigWriter(data, JsonFileSink(path, data), delay=0.05)
+
+        async def write_behind_save(i):
+            data[keys[i % len(keys)]]["panel_title"] = f"title {i}"
+            writer.mark_dirty(keys[i % len(keys)])
+
+        for name, save in (("json.dump", blocking_save), ("write-behind", write_behind_save)):
+            elapsed, worst, total = await run(save)
+            if save is write_behind_save:
+                await writer.flush()
+            print(f"{name:>13}: {EDITS} edits in {elapsed:.2f}s, worst stall {worst:.1f}ms, total stall {total:.1f}ms")
+        print(f"{'flushes':>13}: {writer.flush_count}, last took {writer.last_flush_ms:.1f}ms off-loop")
+
+        storage = Storage(os.path.join(tmp, "tickets.db"))
+        storage.write(storage.prepare(list(data.items())))
+        tracemalloc.start()
+        started = time.perf_counter()
+        everything = storage.load_settings()
+        elapsed = time.perf_counter() - started
+        print(f"{'load all':>13}: {len(everything)} guilds in {elapsed * 1000:.0f}ms, {tracemalloc.get_traced_memory()[0] / 1e6:.1f}MB resident")
+        del everything
+        tracemalloc.stop()
+        tracemalloc.start()
+        cache = SettingsCache(storage, CACHE_SIZE, min_idle=0)
+        started = time.perf_counter()
+        for key in keys:
+            await cache.fetch(key)
+            cache.get(key)
+        elapsed = time.perf_counter() - started
+        print(f"{'lazy':>13}: {len(keys)} first reads at {elapsed / len(keys) * 1e6:.0f}us each, "
+              f"{len(cache)} guilds and {tracemalloc.get_traced_memory()[0] / 1e6:.1f}MB resident, "
+              f"{cache.blocking_loads} read on the loop")
+        assert cache.blocking_loads == 0
+        tracemalloc.stop()
+        storage.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
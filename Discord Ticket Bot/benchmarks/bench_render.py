@@ -0,0 +1,74 @@
+import os
+import sys
+import timeit
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import discord
+from render import RenderCache
+
+# Compares rebuilding panel/ticket objects on every call (the old inline code)
+# with the per-guild RenderCache.
+
+N = int(os.getenv("BENCH_N", "20000"))
+
+
+class FakeObject(SimpleNamespace):
+    def __hash__(self):
+        return hash(self.id)
+
+
+role = FakeObject(id=3)
+guild = FakeObject(id=1, default_role=FakeObject(id=1), me=FakeObject(id=2), get_role=lambda rid: role)
+user = FakeObject(id=4, mention="<@4>")
+config = {str(guild.id): {"support_role": 3, "category_id": 5, "embed_color": "#5865f2", "welcome_message": "hi!"}}
+cache = RenderCache()
+
+
+def old_panel():
+    guild_config = config.get(str(guild.id), {})
+    title = guild_config.get('panel_title', '📩 Support Tickets')
+    description = guild_config.get('panel_description', 'Click to open a private ticket.')
+    try:
+        color = int(guild_config.get("embed_color", "0x00ff99").replace("#", "0x"), 16)
+    except:
+        color = 0x00ff99
+    return discord.Embed(title=title, description=description, color=color)
+
+
+def new_panel():
+    return cache.get(guild, config.get(str(guild.id), {})).panel_embed
+
+
+def old_ticket():
+    overwrites = {
+        guild.default_role: discord.PermissionOverwrite(read_messages=False),
+        user: discord.PermissionOverwrite(read_messages=True, send_messages=True),
+        guild.me: discord.PermissionOverwrite(read_messages=True, send_messages=True, manage_messages=True, manage_channels=True, embed_links=True, attach_files=True, read_message_history=True, add_reactions=True)
+    }
+    support_role_id = config.get(str(guild.id), {}).get('support_role')
+    if support_role_id:
+        support_role = guild.get_role(support_role_id)
+        if support_role:
+            overwrites[support_role] = discord.PermissionOverwrite(read_messages=True, send_messages=True)
+    guild_config = config.get(str(guild.id), {})
+    welcome_msg = guild_config.get('welcome_message', 'thank you for reaching out!')
+    try:
+        color = int(guild_config.get("embed_color", "0x00ff99").replace("#", "0x"), 16)
+    except:
+        color = 0x00ff99
+    embed = discord.Embed(title="Ticket Created 🎫", description=f"{user.mention}, {welcome_msg}\n**Type:** General\n\n**Issue:** x", color=color)
+    return overwrites, embed
+
+
+def new_ticket():
+    render = cache.get(guild, config.get(str(guild.id), {}))
+    return render.ticket_overwrites(user), render.welcome_embed(user, "General", "x")
+
+
+if __name__ == "__main__":
+    for name, old, new in (("panel render", old_panel, new_panel), ("ticket open", old_ticket, new_ticket)):
+        before = timeit.timeit(old, number=N) / N * 1e6
+        after = timeit.timeit(new, number=N) / N * 1e6
+        print(f"{name:>13}: {before:.2f}us -> {after:.2f}us per call ({before / after:.1f}x)")
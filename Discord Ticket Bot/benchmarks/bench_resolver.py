@@ -0,0 +1,98 @@
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import discord
+from resolver import Resolver
+
+# Name lookups on a large synthetic guild: the old discord.utils.find scans
+# against the Resolver index. Every lookup is checked against the scan result.
+
+ROLES = int(os.getenv("BENCH_ROLES", "5000"))
+CHANNELS = int(os.getenv("BENCH_CHANNELS", "20000"))
+LOOKUPS = int(os.getenv("BENCH_LOOKUPS", "2000"))
+
+
+def make_channel(cls, channel_id, name, guild):
+    channel = cls.__new__(cls)
+    channel.id = channel_id
+    channel.name = name
+    channel.guild = guild
+    return channel
+
+
+def make_guild():
+    rng = random.Random(1)
+    guild = SimpleNamespace(id=1)
+    guild.roles = [SimpleNamespace(id=i, name=f"Role-{i}-{rng.randint(0, 99)}", guild=guild) for i in range(ROLES)]
+    channels = []
+    for i in range(CHANNELS):
+        cls = discord.CategoryChannel if i % 40 == 0 else discord.TextChannel
+        channels.append(make_channel(cls, 10**6 + i, f"chan-{i}-{rng.choice('abcdef')}", guild))
+    guild.channels = channels
+    by_id = {c.id: c for c in channels}
+    guild.get_channel = by_id.get
+    guild.get_role = {r.id: r for r in guild.roles}.get
+    return guild
+
+
+def scan_role(guild, text):
+    return discord.utils.find(lambda r: r.name.lower() == text.strip().lower(), guild.roles)
+
+
+def scan_category(guild, text):
+    return discord.utils.find(lambda c: isinstance(c, discord.CategoryChannel) and c.name.lower() == text.strip().lower(), guild.channels)
+
+
+def scan_text_channel(guild, text):
+    return discord.utils.find(lambda c: isinstance(c, discord.TextChannel) and c.name.lower() == text.lower(), guild.channels)
+
+
+def timed(fn, queries):
+    started = time.perf_counter()
+    results = [fn(q) for q in queries]
+    return results, (time.perf_counter() - started) / len(queries) * 1e6
+
+
+if __name__ == "__main__":
+    guild = make_guild()
+    resolver = Resolver()
+    started = time.perf_counter()
+    resolver.get(guild)
+    print(f"index build: {(time.perf_counter() - started) * 1000:.1f}ms for {ROLES} roles / {CHANNELS} channels")
+    rng = random.Random(2)
+    categories = [c for c in guild.channels if isinstance(c, discord.CategoryChannel)]
+    texts = [c for c in guild.channels if isinstance(c, discord.TextChannel)]
+    cases = (
+        ("role", scan_role, resolver.role, [rng.choice(guild.roles).name.upper() for _ in range(LOOKUPS)] + ["missing"]),
+        ("category", scan_category, resolver.category, [rng.choice(categories).name for _ in range(LOOKUPS)] + ["missing"]),
+        ("text channel", scan_text_channel, resolver.text_channel, [rng.choice(texts).name for _ in range(LOOKUPS)] + ["missing"]),
+    )
+    for name, scan, indexed, queries in cases:
+        expected, before = timed(lambda q: scan(guild, q), queries)
+        actual, after = timed(lambda q: indexed(guild, q), queries)
+        assert [getattr(x, "id", None) for x in expected] == [getattr(x, "id", None) for x in actual], name
+        print(f"{name:>13}: {before:.1f}us -> {after:.2f}us per lookup")
+
+    # keep the index current through the event hooks
+    renamed = texts[0]
+    renamed.name = "Renamed-Channel"
+    resolver.channel_changed(renamed)
+    assert resolver.text_channel(guild, "#renamed-channel") is renamed
+    resolver.channel_deleted(renamed)
+    assert resolver.text_channel(guild, "renamed-channel") is None
+    index = resolver.get(guild).text_channels
+    _, first = timed(index.suggest, ["chna-1"])
+    print(f"{'trigrams':>13}: built in {first / 1000:.1f}ms on the first suggestion")
+    _, suggest = timed(index.suggest, ["chan-12", "chan-999-x", "chn-5-a"] * 100)
+    print(f"{'did you mean':>13}: {suggest:.1f}us per suggestion, e.g. {index.suggest('chn-5-a')}")
+
+    # typos of names far from the input's prefix are still found
+    for typo, meant in (("cahn-1999-b", "chan-1999-"), ("chn-5-a", "chan-5-"), ("chan1234a", "chan-1234-"), ("cahn-77-c", "chan-77-")):
+        suggested = index.suggest(typo)
+        assert any(name.startswith(meant) for name in suggested), (typo, suggested)
+        assert suggested[0].startswith(meant), (typo, suggested)
@@ -0,0 +1,151 @@
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rest import SWEEP_INTERVAL, CircuitOpen, Rest
+
+# Drives the REST wrapper against a fake HTTP layer with scripted failures:
+# 5xx retries, creates that must not be repeated, 429 budgeting, background
+# calls yielding to ticket creation, the per-guild circuit and dropping idle
+# route buckets. Every scenario checks its outcome and prints
+# what it took.
+
+
+class FakeHTTPError(Exception):
+    def __init__(self, status, retry_after=None):
+        super().__init__(f"{status} fake error")
+        self.status = status
+        if retry_after is not None:
+            self.retry_after = retry_after
+
+
+class FakeHTTP:
+    # Each route replays its script of statuses, then answers 200.
+    def __init__(self, scripts=None, latency=0.01):
+        self.scripts = {route: list(script) for route, script in (scripts or {}).items()}
+        self.latency = latency
+        self.log = []
+
+    def route(self, name):
+        async def request(*args, **kwargs):
+            await asyncio.sleep(self.latency)
+            self.log.append((name, time.monotonic()))
+            script = self.scripts.get(name)
+            status = script.pop(0) if script else 200
+            if status == 429:
+                raise FakeHTTPError(429, retry_after=0.2)
+            if status >= 400:
+                raise FakeHTTPError(status)
+            return name
+        return request
+
+
+async def retries_5xx():
+    http = FakeHTTP({'create': [500, 502]})
+    rest = Rest(base_delay=0.05)
+    assert await rest.call(1, 'create', http.route('create')) == 'create'
+    assert len(http.log) == 3 and rest.counts['retries'] == 2
+    return f"{len(http.log)} attempts"
+
+
+async def no_retry_4xx():
+    http = FakeHTTP({'send': [403]})
+    rest = Rest(base_delay=0.05)
+    try:
+        await rest.call(1, 'send', http.route('send'))
+    except FakeHTTPError as e:
+        assert e.status == 403
+    assert len(http.log) == 1 and not rest.failures
+    return "raised on first attempt"
+
+
+async def creates_not_retried():
+    http = FakeHTTP({'create': [504, 429]})
+    rest = Rest(base_delay=0.05)
+    request = http.route('create')
+
+    async def create_text_channel(*args, **kwargs):
+        return await request(*args, **kwargs)
+
+    try:
+        await rest.call(1, 'channels:1', create_text_channel)
+    except FakeHTTPError as e:
+        assert e.status == 504
+    assert len(http.log) == 1
+    # a 429 was never processed, so that one is safe to repeat
+    assert await rest.call(1, 'channels:1', create_text_channel) == 'create'
+    assert len(http.log) == 3
+    return "504 raised after one attempt, 429 retried"
+
+
+async def rate_limited():
+    http = FakeHTTP({'edit': [429]})
+    rest = Rest()
+    started = time.monotonic()
+    await rest.call(1, 'edit', http.route('edit'))
+    elapsed = time.monotonic() - started
+    assert elapsed >= 0.2 and rest.counts['rate_limited'] == 1
+    return f"waited {elapsed:.2f}s for retry_after=0.2"
+
+
+async def background_yields():
+    http = FakeHTTP(latency=0.05)
+    rest = Rest(rate=20, burst=5)
+    tickets = [asyncio.create_task(rest.call(1, 'create', http.route('create'))) for _ in range(5)]
+    await asyncio.sleep(0)
+    await asyncio.gather(rest.call(1, 'dashboard', http.route('dashboard'), low=True), *tickets)
+    order = [name for name, _ in http.log]
+    assert order.index('dashboard') == len(order) - 1, order
+    return "dashboard edit ran after all 5 ticket creates"
+
+
+async def circuit_opens():
+    http = FakeHTTP({'create': [503] * 100}, latency=0)
+    rest = Rest(retries=1, base_delay=0.01, failure_threshold=3, reset_after=0.3)
+    for _ in range(3):
+        try:
+            await rest.call(1, 'create', http.route('create'))
+        except FakeHTTPError:
+            pass
+    attempts = len(http.log)
+    started = time.perf_counter()
+    rejected = 0
+    for _ in range(100):
+        try:
+            await rest.call(1, 'create', http.route('create'))
+        except CircuitOpen:
+            rejected += 1
+    fast = time.perf_counter() - started
+    assert rejected == 100 and len(http.log) == attempts
+    assert await rest.call(2, 'other', http.route('other')) == 'other'
+    http.scripts['create'] = []
+    await asyncio.sleep(0.3)
+    assert await rest.call(1, 'create', http.route('create')) == 'create'
+    assert not rest.is_open(1)
+    return f"100 calls rejected in {fast * 1000:.2f}ms, closed again after reset"
+
+
+async def idle_buckets_dropped():
+    http = FakeHTTP(latency=0)
+    rest = Rest(rate=1000, burst=5)
+    for i in range(10000):
+        await rest.call(1, f"messages:{i}", http.route('send'))
+    assert len(rest.buckets) == 10000
+    await asyncio.sleep(0.01)
+    rest.swept -= SWEEP_INTERVAL
+    await rest.call(1, 'messages:last', http.route('send'))
+    assert len(rest.buckets) == 1, len(rest.buckets)
+    return "10000 refilled buckets dropped on the next sweep"
+
+
+async def main():
+    for scenario in (retries_5xx, no_retry_4xx, creates_not_retried, rate_limited, background_yields, circuit_opens, idle_buckets_dropped):
+        result = await scenario()
+        print(f"{scenario.__name__}: ok, {result}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
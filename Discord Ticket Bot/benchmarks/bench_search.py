@@ -0,0 +1,82 @@
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search import SearchIndex
+
+# Fills the ticket search index with synthetic conversations, then measures
+# indexing throughput, the longest event-loop stall while messages stream in,
+# query latency for rare, common and prefix terms in one guild, and a
+# retention purge.
+
+MESSAGES = int(os.getenv("BENCH_MESSAGES", "1000000"))
+GUILDS = int(os.getenv("BENCH_GUILDS", "20"))
+QUERIES = int(os.getenv("BENCH_QUERIES", "50"))
+
+WORDS = ("billing invoice refund payment error login password account reset email order shipping delivery "
+         "tracking crash update version server channel role permission bot ticket help please thanks hello "
+         "broken working screenshot attached again still issue problem support question urgent today").split()
+
+
+def sentence(rng):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 20)))
+
+
+async def probe(stalls, stop):
+    interval = 0.001
+    while not stop.is_set():
+        before = time.perf_counter()
+        await asyncio.sleep(interval)
+        stalls.append(max(0.0, time.perf_counter() - before - interval))
+
+
+async def main():
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory() as tmp:
+        index = SearchIndex(os.path.join(tmp, "search.db"))
+        tickets = [SimpleNamespace(guild_id=g, channel_id=10**17 + g * 10**6 + n, owner_id=n, number=n)
+                   for g in range(1, GUILDS + 1) for n in range(1, 200)]
+        stalls, stop = [], asyncio.Event()
+        prober = asyncio.create_task(probe(stalls, stop))
+        now = time.time()
+        started = time.perf_counter()
+        for i in range(MESSAGES):
+            ticket = tickets[i % len(tickets)]
+            text = sentence(rng)
+            if i % 50000 == 7:
+                text += " needle-" + str(i)
+            index.add(ticket, 10**18 + i, ticket.owner_id, text, now - (MESSAGES - i) * 2)
+            if i % 100 == 0:
+                await asyncio.sleep(0)
+        await index.flush()
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await prober
+        print(f"indexed {MESSAGES} messages in {elapsed:.1f}s = {MESSAGES / elapsed:,.0f}/s, "
+              f"worst loop stall {max(stalls) * 1000:.1f}ms")
+
+        for label, query in (("rare", "needle"), ("common", "billing error"), ("phrase", '"refund payment"'), ("prefix", "pass*")):
+            timings = []
+            for n in range(QUERIES):
+                guild_id = n % GUILDS + 1
+                t0 = time.perf_counter()
+                hits = await index.run(index.search, guild_id, query, 6, 0)
+                timings.append(time.perf_counter() - t0)
+            timings.sort()
+            print(f"{label:>7} {query!r}: p50 {timings[len(timings) // 2] * 1000:.1f}ms, "
+                  f"max {timings[-1] * 1000:.1f}ms, {len(hits)} hits on the last page")
+
+        t0 = time.perf_counter()
+        removed = await index.run(index.purge, 1, now - MESSAGES)
+        print(f"purged {removed} old rows of one guild in {(time.perf_counter() - t0) * 1000:.0f}ms")
+        index.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
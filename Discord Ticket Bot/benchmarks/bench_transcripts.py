@@ -0,0 +1,67 @@
+import asyncio
+import datetime
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transcripts import export_channel
+
+# Exports a synthetic ticket channel and reports messages/second and peak
+# traced memory, which should not grow with the number of messages.
+
+MESSAGES = int(os.getenv("BENCH_MESSAGES", "50000"))
+
+
+class FakeChannel:
+    def __init__(self, count):
+        self.count = count
+        self.authors = [FakeAuthor(1, "user#0001", False), FakeAuthor(2, "Support#0002", False), FakeAuthor(3, "Ticket Bot#0003", True)]
+        self.start = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+
+    def history(self, limit=None, oldest_first=True, after=None):
+        first = after.id + 1 if after else 1
+        return self._pages(first)
+
+    async def _pages(self, first):
+        for i in range(first, self.count + 1):
+            if i % 100 == 0:
+                await asyncio.sleep(0)
+            yield SimpleNamespace(
+                id=i,
+                author=self.authors[i % 3],
+                created_at=self.start + datetime.timedelta(seconds=i),
+                content=f"message {i}: the billing page shows error E{i % 97} <again> & again",
+                embeds=[],
+                attachments=[],
+            )
+
+
+class FakeAuthor:
+    def __init__(self, author_id, name, bot):
+        self.id = author_id
+        self.name = name
+        self.bot = bot
+
+    def __str__(self):
+        return self.name
+
+
+async def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        tracemalloc.start()
+        started = time.perf_counter()
+        jsonl_path, html_path, count = await export_channel(FakeChannel(MESSAGES), os.path.join(tmp, "ticket-0001"), "bench")
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{count} messages in {elapsed:.2f}s = {count / elapsed:,.0f} msg/s, peak traced memory {peak / 1024:.0f} KiB")
+        print(f"jsonl.gz {os.path.getsize(jsonl_path) / 1024:.0f} KiB, html {os.path.getsize(html_path) / 1024:.0f} KiB")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,681 @@
+import argparse
+import asyncio
+import datetime
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, HERE)
+
+import discord
+
+# Offline load test: bot.py is imported against an in-process fake of the
+# Discord objects it touches (guilds, roles, channels, messages, interactions)
+# and a fake HTTP layer with configurable latency and 429 injection. It then
+# drives the real handlers at a given concurrency:
+#   open      TicketButtonView -> TicketModal.on_submit -> queue -> create_ticket
+#   pooled    the same, with a warm pool of pre-created channels to claim
+#   dashboard BackendSettingModal / FrontendSettingModal -> save_config -> dashboard edit
+#   migrate   new support role and category -> paced update of open tickets
+#   panels    FrontendSettingModal -> debounced re-render of every posted panel
+#   close     user and support messages -> on_message, then
+#             CloseTicketView -> ConfirmationView.confirm -> transcript -> delete
+#   search    /search queries against the index of the closed tickets
+# and writes throughput, p50/p99 latency, loop stalls and HTTP counts to a
+# JSON file that can be compared with an earlier run (--compare).
+
+WORDS = "billing invoice refund login password crash order shipping email role permission error".split()
+
+
+class FakeHTTP:
+    # A 429 is waited out and retried like discord.py's own HTTP client does,
+    # or raised as RateLimited (what discord.py does past max_ratelimit_timeout).
+    def __init__(self, latency, jitter, rate_limit, retry_after, seed, raise_429=False, create_latency=None):
+        self.latency = latency
+        self.create_latency = latency if create_latency is None else create_latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.raise_429 = raise_429
+        self.random = random.Random(seed)
+        self.calls = {}
+        self.rate_limited = 0
+        self.ids = itertools.count(discord.utils.time_snowflake(datetime.datetime.now(datetime.timezone.utc)))
+
+    def next_id(self):
+        return next(self.ids)
+
+    async def request(self, route):
+        self.calls[route] = self.calls.get(route, 0) + 1
+        latency = self.create_latency if route == "channel_create" else self.latency
+        await asyncio.sleep(latency * (1 + self.random.uniform(-self.jitter, self.jitter)))
+        while self.rate_limit and self.random.random() < self.rate_limit:
+            self.rate_limited += 1
+            if self.raise_429:
+                raise discord.RateLimited(self.retry_after)
+            await asyncio.sleep(self.retry_after)
+            await asyncio.sleep(self.latency)
+
+
+class FakeObject(SimpleNamespace):
+    def __hash__(self):
+        return hash(self.id)
+
+    def __eq__(self, other):
+        return isinstance(other, FakeObject) and other.id == self.id
+
+    def __str__(self):
+        return self.name
+
+
+def not_found():
+    return discord.NotFound(SimpleNamespace(status=404, reason="Not Found"), "Unknown Message")
+
+
+class FakeMessage:
+    def __init__(self, channel, message_id, author, content=None, embed=None):
+        self.channel = channel
+        self.guild = channel.guild
+        self.id = message_id
+        self.author = author
+        self.content = content or ""
+        self.embeds = [embed] if embed else []
+        self.attachments = []
+        self.created_at = discord.utils.snowflake_time(message_id)
+
+    async def edit(self, content=None, embed=None, **kwargs):
+        await self.channel.guild.http.request("message_edit")
+        if self.id not in self.channel.messages:
+            raise not_found()
+        if content is not None:
+            self.content = content
+        if embed is not None:
+            self.embeds = [embed]
+        return self
+
+
+class FakeChannelMixin:
+    def setup(self, guild, name, category=None, overwrites=None, topic=None):
+        self.guild = guild
+        self.id = guild.http.next_id()
+        self.name = name
+        self.category_id = category.id if category else None
+        self.topic = topic
+        self.position = len(guild.channel_map)
+        self.nsfw = False
+        self.last_message_id = None
+        self.fake_overwrites = overwrites or {}
+        self.messages = {}
+        self.deleted = asyncio.get_running_loop().create_future()
+
+    @property
+    def overwrites(self):
+        return self.fake_overwrites
+
+    async def delete(self, reason=None):
+        await self.guild.http.request("channel_delete")
+        await self.guild.remove_channel(self)
+
+
+class FakeCategory(FakeChannelMixin, discord.CategoryChannel):
+    def __init__(self, guild, name, overwrites=None):
+        self.setup(guild, name, overwrites=overwrites)
+
+
+class FakeMessageable:
+    async def send(self, content=None, *, embed=None, view=None, files=None, **kwargs):
+        await self.guild.http.request("message_create")
+        message = FakeMessage(self, self.guild.http.next_id(), self.guild.me, content, embed)
+        self.messages[message.id] = message
+        self.last_message_id = message.id
+        return message
+
+    def get_partial_message(self, message_id):
+        return self.messages.get(message_id) or FakeMessage(self, message_id, self.guild.me)
+
+    def history(self, limit=100, oldest_first=None, after=None):
+        return self._history(limit, bool(oldest_first), after.id if after else 0)
+
+    async def _history(self, limit, oldest_first, after):
+        messages = [m for m in self.messages.values() if m.id > after]
+        if not oldest_first:
+            messages.reverse()
+        for i, message in enumerate(messages[:limit] if limit else messages):
+            if i % 100 == 0:
+                await self.guild.http.request("message_history")
+            yield message
+
+    async def purge(self, limit=100, **kwargs):
+        await self.guild.http.request("message_bulk_delete")
+        removed = list(self.messages)[-limit:]
+        for message_id in removed:
+            del self.messages[message_id]
+        return removed
+
+
+class FakeTextChannel(FakeMessageable, FakeChannelMixin, discord.TextChannel):
+    def __init__(self, guild, name, category=None, overwrites=None, topic=None):
+        self.setup(guild, name, category, overwrites, topic)
+
+    async def edit(self, **options):
+        await self.guild.http.request("channel_edit")
+        for key, value in options.items():
+            if key == 'category':
+                self.category_id = value.id if value else None
+            elif key == 'overwrites':
+                self.fake_overwrites = value
+            else:
+                setattr(self, key, value)
+        return self
+
+    async def create_thread(self, *, name, type=None, invitable=True, auto_archive_duration=None, reason=None):
+        await self.guild.http.request("thread_create")
+        thread = FakeThread(self, name)
+        self.guild.thread_map[thread.id] = thread
+        return thread
+
+
+class FakeThread(FakeMessageable, discord.Thread):
+    def __init__(self, parent, name):
+        self.guild = parent.guild
+        self.id = parent.guild.http.next_id()
+        self.name = name
+        self.parent_id = parent.id
+        self.archived = False
+        self.locked = False
+        self.last_message_id = None
+        self.messages = {}
+        self.member_ids = set()
+        self.deleted = asyncio.get_running_loop().create_future()
+
+    async def add_user(self, user):
+        await self.guild.http.request("thread_member_add")
+        self.member_ids.add(user.id)
+
+    async def edit(self, *, archived=None, locked=None, **kwargs):
+        await self.guild.http.request("channel_edit")
+        before = SimpleNamespace(archived=self.archived, locked=self.locked)
+        self.archived = self.archived if archived is None else archived
+        self.locked = self.locked if locked is None else locked
+        if self.archived and not before.archived:
+            self.guild.thread_map.pop(self.id, None)
+            await self.guild.bot_module.on_thread_update(before, self)
+            if not self.deleted.done():
+                self.deleted.set_result(time.perf_counter())
+        return self
+
+
+class FakeGuild:
+    def __init__(self, bot_module, http, index, roles):
+        self.bot_module = bot_module
+        self.http = http
+        self.id = http.next_id()
+        self.name = f"Load Test {index}"
+        self.default_role = FakeObject(id=self.id, name="@everyone", is_default=lambda: True)
+        self.me = FakeObject(id=http.next_id(), name="Ticket Bot", mention="<@bot>", bot=True,
+                             guild_permissions=SimpleNamespace(administrator=True))
+        self.roles = [self.default_role] + [FakeObject(id=http.next_id(), name=f"Role {i}", mention=f"<@&{i}>", mentionable=True, members=[], is_default=lambda: False) for i in range(roles)]
+        self.role_map = {r.id: r for r in self.roles}
+        self.channel_map = {}
+        self.thread_map = {}
+
+    @property
+    def channels(self):
+        return list(self.channel_map.values())
+
+    @property
+    def text_channels(self):
+        return [c for c in self.channel_map.values() if isinstance(c, discord.TextChannel)]
+
+    @property
+    def categories(self):
+        return [c for c in self.channel_map.values() if isinstance(c, discord.CategoryChannel)]
+
+    @property
+    def threads(self):
+        return list(self.thread_map.values())
+
+    def get_channel(self, channel_id):
+        return self.channel_map.get(channel_id)
+
+    def get_channel_or_thread(self, channel_id):
+        return self.channel_map.get(channel_id) or self.thread_map.get(channel_id)
+
+    def get_role(self, role_id):
+        return self.role_map.get(role_id)
+
+    async def fetch_channel(self, channel_id):
+        await self.http.request("channel_fetch")
+        channel = self.channel_map.get(channel_id)
+        if channel is None:
+            raise not_found()
+        return channel
+
+    async def add_channel(self, channel):
+        self.channel_map[channel.id] = channel
+        await self.bot_module.on_guild_channel_create(channel)
+        return channel
+
+    async def remove_channel(self, channel):
+        if self.channel_map.pop(channel.id, None) is not None:
+            await self.bot_module.on_guild_channel_delete(channel)
+            if not channel.deleted.done():
+                channel.deleted.set_result(time.perf_counter())
+
+    async def create_text_channel(self, name, *, category=None, overwrites=None, topic=None, **kwargs):
+        await self.http.request("channel_create")
+        return await self.add_channel(FakeTextChannel(self, name, category, overwrites, topic))
+
+    async def create_category(self, name, *, overwrites=None, **kwargs):
+        await self.http.request("channel_create")
+        return await self.add_channel(FakeCategory(self, name, overwrites))
+
+
+class FakeResponse:
+    def __init__(self, interaction):
+        self.interaction = interaction
+        self.done = False
+
+    def is_done(self):
+        return self.done
+
+    async def _respond(self):
+        if self.done:
+            raise discord.InteractionResponded(self.interaction)
+        await self.interaction.guild.http.request("interaction_callback")
+        self.done = True
+
+    async def send_message(self, content=None, *, view=None, **kwargs):
+        await self._respond()
+        self.interaction.view = view
+        self.interaction.finish(content)
+
+    async def defer(self, **kwargs):
+        await self._respond()
+
+    async def send_modal(self, modal):
+        await self._respond()
+        self.interaction.modal = modal
+
+    async def edit_message(self, content=None, **kwargs):
+        await self._respond()
+        self.interaction.finish(content)
+
+
+class FakeInteraction:
+    def __init__(self, guild, user, channel):
+        self.guild = guild
+        self.user = user
+        self.channel = channel
+        self.message = None
+        self.response = FakeResponse(self)
+        self.modal = None
+        self.view = None
+        self.finished = asyncio.get_running_loop().create_future()
+
+    def finish(self, content):
+        if not self.finished.done():
+            self.finished.set_result(content or "")
+
+    async def edit_original_response(self, content=None, **kwargs):
+        await self.guild.http.request("webhook_edit")
+        # queue position updates are progress, not the answer
+        if content and not content.startswith("⏳ You're in queue"):
+            self.finish(content)
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+class Scenario:
+    def __init__(self, name):
+        self.name = name
+        self.latencies = []
+        self.errors = 0
+        self.outcomes = {}
+        self.started = None
+        self.elapsed = 0.0
+
+    async def run(self, jobs, concurrency):
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(job):
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    outcome = await job()
+                except Exception as e:
+                    self.errors += 1
+                    outcome = type(e).__name__
+                self.latencies.append(time.perf_counter() - started)
+                self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+
+        self.started = time.perf_counter()
+        await asyncio.gather(*(one(job) for job in jobs))
+        self.elapsed = time.perf_counter() - self.started
+
+    def result(self):
+        count = len(self.latencies)
+        return {
+            'count': count,
+            'errors': self.errors,
+            'outcomes': self.outcomes,
+            'seconds': round(self.elapsed, 4),
+            'throughput': round(count / self.elapsed, 2) if self.elapsed else None,
+            'p50_ms': round(percentile(self.latencies, 50) * 1000, 2) if count else None,
+            'p99_ms': round(percentile(self.latencies, 99) * 1000, 2) if count else None,
+            'max_ms': round(max(self.latencies) * 1000, 2) if count else None,
+        }
+
+
+class StallMonitor:
+    def __init__(self, interval=0.01, threshold=0.05):
+        self.interval = interval
+        self.threshold = threshold
+        self.worst = 0.0
+        self.stalls = 0
+        self.total = 0.0
+        self.task = None
+
+    async def _watch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            late = loop.time() - expected
+            self.worst = max(self.worst, late)
+            if late >= self.threshold:
+                self.stalls += 1
+                self.total += late
+
+    def start(self):
+        self.task = asyncio.create_task(self._watch())
+
+    def result(self):
+        self.task.cancel()
+        return {'worst_ms': round(self.worst * 1000, 2), 'stalls_over_50ms': self.stalls, 'stalled_ms': round(self.total * 1000, 2)}
+
+
+def outcome_of(content):
+    if content.startswith("Ticket created"):
+        return "created"
+    if content.startswith("🔒"):
+        return "closing"
+    if content.startswith("✅"):
+        return "ok"
+    return content[:40]
+
+
+async def run(args):
+    import bot as bot_module
+
+    http = FakeHTTP(args.latency / 1000, args.jitter, args.rate_limit, args.retry_after, args.seed, args.raise_429, args.create_latency / 1000)
+    bot_module.rest.rate = args.route_rate
+    bot_module.rest.burst = max(bot_module.rest.burst, int(args.route_rate))
+    bot_module.ticket_button_view = bot_module.TicketButtonView()
+    bot_module.close_ticket_view = bot_module.CloseTicketView()
+    bot_module.dashboard_view = bot_module.DashboardView()
+
+    guilds = []
+    for i in range(args.guilds):
+        guild = FakeGuild(bot_module, http, i, args.roles)
+        for n in range(args.channels):
+            await guild.add_channel(FakeTextChannel(guild, f"channel-{n}"))
+        category = await guild.add_channel(FakeCategory(guild, "Tickets"))
+        panel = await guild.add_channel(FakeTextChannel(guild, "support"))
+        dashboard = await guild.add_channel(FakeTextChannel(guild, bot_module.DASHBOARD_CHANNEL_NAME))
+        guild_config = bot_module.config.setdefault(str(guild.id), {})
+        guild_config.update({'support_role': guild.roles[1].id if args.roles else None, 'category_id': category.id,
+                             'panel_channel': panel.id, bot_module.DASHBOARD_CONFIG_KEY: dashboard.id})
+        if args.threads:
+            guild_config['ticket_backend'] = 'thread'
+        bot_module.save_config(guild.id)
+        guild.panel = panel
+        guild.panels = [await bot_module.post_panel(panel) for _ in range(args.panels)]
+        guilds.append(guild)
+
+    users = itertools.count(1)
+    rng = random.Random(args.seed)
+
+    def member(guild, admin=False, roles=()):
+        user_id = next(users)
+        return FakeObject(id=user_id, name=f"user{user_id}", mention=f"<@{user_id}>", bot=False, guild=guild,
+                          roles=list(roles), guild_permissions=SimpleNamespace(administrator=admin))
+
+    opened = []
+
+    async def open_ticket(guild):
+        user = member(guild)
+        click = FakeInteraction(guild, user, guild.panel)
+        await bot_module.ticket_button_view.open.callback(click)
+        modal = click.modal
+        modal.description._value = "Load test: the billing page shows an error."
+        submit = FakeInteraction(guild, user, guild.panel)
+        await modal.on_submit(submit)
+        content = await asyncio.wait_for(submit.finished, args.timeout)
+        if content.startswith("Ticket created"):
+            opened.append((guild, user, int(content.split("<#")[1].rstrip(">"))))
+        return outcome_of(content)
+
+    async def edit_dashboard(guild, i):
+        admin = member(guild, admin=True)
+        interaction = FakeInteraction(guild, admin, guild.panel)
+        if i % 2:
+            modal = bot_module.FrontendSettingModal("panel_title", "", "Panel Title")
+            modal.input._value = f"Support #{i}"
+        else:
+            modal = bot_module.BackendSettingModal("category", "")
+            modal.input._value = "tickets"
+        await modal.on_submit(interaction)
+        return outcome_of(await asyncio.wait_for(interaction.finished, args.timeout))
+
+    async def migrate(guild):
+        # new support role and category from the dashboard, then wait for
+        # every open ticket to be moved over
+        admin = member(guild, admin=True)
+        role = guild.roles[2]
+        category = await guild.add_channel(FakeCategory(guild, f"Tickets {guild.id % 1000}"))
+        for setting, value in (("support_role", role.name), ("category", category.name)):
+            interaction = FakeInteraction(guild, admin, guild.panel)
+            modal = bot_module.BackendSettingModal(setting, "")
+            modal.input._value = value
+            await modal.on_submit(interaction)
+            await asyncio.wait_for(interaction.finished, args.timeout)
+        deadline = time.monotonic() + args.timeout
+        while bot_module.migrator.progress(guild.id) is not None and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        channels = [guild.get_channel(t.channel_id) for t in bot_module.tickets.for_guild(guild.id)]
+        stale = [c for c in channels if c and (role not in c.overwrites or c.category_id != category.id)]
+        return "stale" if stale else "migrated"
+
+    async def refresh_panels(guild):
+        # one panel is deleted by hand first; the refresh has to forget it
+        # and bring every other panel up to the new title and button label
+        gone = guild.panels.pop()
+        del guild.panel.messages[gone.id]
+        admin = member(guild, admin=True)
+        for setting, value in (("panel_title", f"Help desk {guild.id % 1000}"), ("button_label", "Get help")):
+            interaction = FakeInteraction(guild, admin, guild.panel)
+            modal = bot_module.FrontendSettingModal(setting, "", setting)
+            modal.input._value = value
+            await modal.on_submit(interaction)
+            await asyncio.wait_for(interaction.finished, args.timeout)
+        deadline = time.monotonic() + args.timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+            rows = await bot_module.storage.run(bot_module.storage.get_messages, guild.id, bot_module.PANEL_KIND)
+            stale = [m for m in guild.panels if m.embeds[0].title != f"Help desk {guild.id % 1000}"]
+            if not stale and gone.id not in {row['message_id'] for row in rows}:
+                return "refreshed" if bot_module.panel_view(guild).open.label == "Get help" else "stale"
+        return "stale"
+
+    async def close_ticket(guild, user, channel_id):
+        channel = guild.get_channel_or_thread(channel_id)
+        support = member(guild, roles=guild.roles[1:2])
+        for n in range(args.messages):
+            # posted through the fake HTTP layer, then delivered to the
+            # on_message listener as if the user (or, once, support) wrote it
+            message = await channel.send(f"message {n} from {user.name}: {rng.choice(WORDS)} {rng.choice(WORDS)}")
+            message.author = support if n == 1 else user
+            await bot_module.track_ticket_activity(message)
+        click = FakeInteraction(guild, user, channel)
+        await bot_module.close_ticket_view.close.callback(click)
+        confirm = FakeInteraction(guild, user, channel)
+        await click.view.confirm.callback(confirm)
+        await asyncio.wait_for(channel.deleted, args.timeout)
+        return "deleted"
+
+    monitor = StallMonitor()
+    monitor.start()
+    scenarios = {}
+
+    scenario = scenarios['open'] = Scenario('open')
+    await scenario.run([lambda g=guilds[i % len(guilds)]: open_ticket(g) for i in range(args.tickets)], args.concurrency)
+
+    if args.pool and not args.threads:
+        for guild in guilds:
+            bot_module.warm_pool.set_size(guild, args.pool)
+        deadline = time.monotonic() + args.timeout
+        while any(bot_module.warm_pool.available(g.id) < args.pool for g in guilds) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        scenario = scenarios['pooled'] = Scenario('pooled')
+        await scenario.run([lambda g=guilds[i % len(guilds)]: open_ticket(g) for i in range(args.pool * len(guilds))], args.concurrency)
+
+    scenario = scenarios['dashboard'] = Scenario('dashboard')
+    await scenario.run([lambda g=guilds[i % len(guilds)], i=i: edit_dashboard(g, i) for i in range(args.dashboard_edits)], args.concurrency)
+    await asyncio.sleep(bot_module.DASHBOARD_DEBOUNCE + args.latency / 1000 * 4)
+
+    if args.panels:
+        scenario = scenarios['panels'] = Scenario('panels')
+        await scenario.run([lambda g=g: refresh_panels(g) for g in guilds], args.concurrency)
+
+    if args.roles >= 2 and not args.threads:
+        scenario = scenarios['migrate'] = Scenario('migrate')
+        await scenario.run([lambda g=g: migrate(g) for g in guilds], args.concurrency)
+
+    scenario = scenarios['close'] = Scenario('close')
+    await scenario.run([lambda t=t: close_ticket(*t) for t in opened], args.concurrency)
+
+    async def search(guild, i):
+        query, page = WORDS[i % len(WORDS)], i % 3
+        hits, elapsed = await bot_module.run_search(guild, query, page)
+        bot_module.search_embed(guild, query, hits, page, elapsed)
+        return "hits" if hits else "none"
+
+    scenario = scenarios['search'] = Scenario('search')
+    await scenario.run([lambda g=guilds[i % len(guilds)], i=i: search(g, i) for i in range(args.searches)], args.concurrency)
+
+    started = time.perf_counter()
+    await bot_module.config_writer.flush()
+    flush_ms = (time.perf_counter() - started) * 1000
+
+    return {
+        'version': git_version(),
+        'at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'params': vars(args),
+        'scenarios': {name: s.result() for name, s in scenarios.items()},
+        'loop': monitor.result(),
+        'http': {'calls': dict(sorted(http.calls.items())), 'rate_limited': http.rate_limited},
+        'bot': {'open_tickets': len(bot_module.tickets), 'rest': dict(bot_module.rest.counts),
+                'config_flushes': bot_module.config_writer.flush_count, 'final_flush_ms': round(flush_ms, 2),
+                'analytics': {str(g.id): bot_module.analytics_summary(g.id, 7) for g in guilds},
+                'time_to_ready_p50_ms': {kind: round(bot_module.warm_pool.p50(kind) * 1000, 2)
+                                         for kind in ('cold', 'pooled') if bot_module.warm_pool.p50(kind) is not None}},
+        'traces': {'sampled': len(bot_module.tracer.traces),
+                   'slowest': [bot_module.summarize(t) for t in bot_module.tracer.slowest(3)]},
+    }
+
+
+def git_version():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], cwd=HERE, capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def report(result, previous=None):
+    print(f"version {result['version']}")
+    for name, s in result['scenarios'].items():
+        line = f"{name:>10}: {s['count']} in {s['seconds']:.2f}s = {s['throughput'] or 0:.1f}/s, p50 {s['p50_ms']}ms, p99 {s['p99_ms']}ms, errors {s['errors']} {s['outcomes']}"
+        old = (previous or {}).get('scenarios', {}).get(name)
+        if old and old.get('p99_ms') and s['p99_ms']:
+            line += f" (p99 {s['p99_ms'] / old['p99_ms']:.2f}x, throughput {(s['throughput'] or 0) / (old['throughput'] or 1):.2f}x vs {previous.get('version')})"
+        print(line)
+    loop = result['loop']
+    print(f"      loop: worst stall {loop['worst_ms']}ms, {loop['stalls_over_50ms']} stalls over 50ms")
+    print(f"      http: {sum(result['http']['calls'].values())} calls, {result['http']['rate_limited']} rate limited, rest {result['bot']['rest']}")
+    ready = result['bot'].get('time_to_ready_p50_ms')
+    if ready:
+        print(f"     ready: p50 time to a usable ticket channel " + ", ".join(f"{kind} {ms}ms" for kind, ms in ready.items()))
+    traces = result.get('traces')
+    if traces and traces['sampled']:
+        print(f"    traces: {traces['sampled']} sampled, slowest:")
+        for line in traces['slowest']:
+            print(f"            {line}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test for the ticket bot")
+    parser.add_argument('--guilds', type=int, default=4)
+    parser.add_argument('--tickets', type=int, default=200, help="tickets opened (and then closed) in total")
+    parser.add_argument('--dashboard-edits', type=int, default=50)
+    parser.add_argument('--searches', type=int, default=50, help="admin searches after all tickets are closed")
+    parser.add_argument('--pool', type=int, default=5, help="warm pool size per guild for the pooled scenario (0 to skip)")
+    parser.add_argument('--panels', type=int, default=3, help="ticket panels posted per guild")
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--messages', type=int, default=20, help="messages posted in each ticket before closing")
+    parser.add_argument('--channels', type=int, default=100, help="unrelated channels per guild")
+    parser.add_argument('--roles', type=int, default=50)
+    parser.add_argument('--threads', action='store_true', help="use private-thread tickets")
+    parser.add_argument('--latency', type=float, default=50.0, help="fake HTTP latency in ms")
+    parser.add_argument('--create-latency', type=float, default=250.0, help="fake latency of channel creates in ms, which Discord answers slower than edits")
+    parser.add_argument('--jitter', type=float, default=0.3, help="latency jitter as a fraction")
+    parser.add_argument('--rate-limit', type=float, default=0.02, help="fraction of HTTP calls answered with a 429")
+    parser.add_argument('--retry-after', type=float, default=0.5)
+    parser.add_argument('--raise-429', action='store_true', help="raise RateLimited instead of waiting it out")
+    parser.add_argument('--route-rate', type=float, default=100.0, help="per-route budget of the REST wrapper, calls/s")
+    parser.add_argument('--timeout', type=float, default=30.0, help="seconds to wait for each flow to finish")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', default='loadtest-result.json')
+    parser.add_argument('--compare', help="earlier result file to compare against")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output)
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+
+    # bot.py reads its settings from the environment at import time; the
+    # ticket queue is opened up so the run measures the bot, not its pacing.
+    os.environ.setdefault('TICKET_RATE', '1000')
+    os.environ.setdefault('TICKET_BURST', '1000')
+    os.environ.setdefault('TICKET_WORKERS', '8')
+    os.environ.setdefault('MIGRATION_PAUSE', '0.1')
+    os.environ.setdefault('PANEL_DEBOUNCE', '0.2')
+    os.environ.setdefault('POOL_REFILL_RATE', '1000')
+    os.environ.setdefault('PANEL_PAUSE', '0.1')
+    os.environ['METRICS_PORT'] = '0'
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_FILE'] = os.path.join(tmp, 'tickets.db')
+        os.chdir(tmp)
+        result = asyncio.run(run(args))
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+    report(result, previous)
+    print(f"wrote {output}")
+
+
+if __name__ == "__main__":
+    main()
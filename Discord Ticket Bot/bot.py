@@ -1,105 +1,714 @@
 import os
+import asyncio
 import discord
-from discord.ext import commands
+from discord import app_commands
+from discord.ext import commands, tasks
 from dotenv import load_dotenv
+import hashlib
+import io
+import secrets
+import signal
 import json
-import random
+import sys
+import time
 import traceback
+from collections import deque
+from persistence import ConfigWriter, JsonFileSink, load_json
+from storage import SettingsCache, Storage
+from tickets import Ticket, TicketRegistry
+from pipeline import TicketPipeline
+from render import TICKET_SUPPORT, RenderCache, is_emoji
+from resolver import Resolver, did_you_mean
+from transcripts import export_channel
+from pool import MAX_POOL_SIZE, POOL_PREFIX, POOL_TOPIC, WarmPool, is_pool_channel
+from categories import CATEGORY_LIMIT, CategoryIndex
+from migration import CONFIG_KEY as MIGRATION_KEY, Migrator
+from rest import CircuitOpen, Rest
+from metrics import Metrics
+from tracing import summarize, tracer
+from analytics import Analytics, format_duration
+from search import SearchIndex
 
 load_dotenv()
 TOKEN = os.getenv('TOKEN')
 
+STARTED_AT = time.monotonic()
+metrics = Metrics()
+
+# Lean mode (default) skips the members intent and member chunking; the bot
+# never needs the member list, dashboard access is granted through admin roles.
+LEAN_GATEWAY = os.getenv('LEAN_GATEWAY', '1') != '0'
+
+# Slash-only mode drops message content and message events entirely; every
+# command is also a slash command, so nothing else needs them.
+SLASH_ONLY = os.getenv('SLASH_ONLY', '0') == '1'
+
 intents = discord.Intents.default()
-intents.message_content = True
-intents.members = True
+intents.message_content = not SLASH_ONLY
+intents.members = not LEAN_GATEWAY
+if SLASH_ONLY:
+    intents.guild_messages = False
+    intents.dm_messages = False
+bot_options = {}
+if LEAN_GATEWAY:
+    bot_options = {'chunk_guilds_at_startup': False, 'member_cache_flags': discord.MemberCacheFlags.none()}
+
+COMMAND_PREFIX = commands.when_mentioned if SLASH_ONLY else '!'
+
+# Set by cluster.py when this process runs one shard group of a cluster.
+SHARD_COUNT = int(os.getenv('SHARD_COUNT', '0'))
+SHARD_IDS = [int(s) for s in os.getenv('SHARD_IDS', '').split(',') if s]
 
-bot = commands.Bot(command_prefix='!', intents=intents)
+if SHARD_COUNT:
+    bot = commands.AutoShardedBot(command_prefix=COMMAND_PREFIX, intents=intents, shard_count=SHARD_COUNT, shard_ids=SHARD_IDS or None, **bot_options)
+else:
+    bot = commands.Bot(command_prefix=COMMAND_PREFIX, intents=intents, **bot_options)
+
+def memory_usage_mb():
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+def owns_guild(guild_id):
+    return not SHARD_IDS or (int(guild_id) >> 22) % SHARD_COUNT in SHARD_IDS
 
 CONFIG_FILE = 'config.json'
+DATABASE_FILE = os.getenv('DATABASE_FILE', 'tickets.db')
+CONFIG_BACKEND = os.getenv('CONFIG_BACKEND', 'sqlite')
+
+storage = Storage(DATABASE_FILE)
+search_index = SearchIndex(os.getenv('SEARCH_DATABASE', 'search.db'))
 
 def load_config():
-    if os.path.exists(CONFIG_FILE):
-        with open(CONFIG_FILE, 'r') as f:
-            try:
-                return json.load(f)
-            except:
-                return {}
-    return {}
+    if CONFIG_BACKEND == 'json':
+        return load_json(CONFIG_FILE)
+    if storage.get_meta('imported_config_json') is None and os.path.exists(CONFIG_FILE):
+        count = storage.import_config(load_json(CONFIG_FILE))
+        print(f"✅ Imported {count} guilds from {CONFIG_FILE} into {DATABASE_FILE}")
+    return SettingsCache(storage, int(os.getenv('SETTINGS_CACHE_SIZE', '10000')))
 
-def save_config(data):
-    with open(CONFIG_FILE, 'w') as f:
-        json.dump(data, f, indent=4)
+def save_config(guild_id):
+    with tracer.span("save_config"):
+        render_cache.invalidate(guild_id)
+        config_writer.mark_dirty(guild_id)
+
+def guild_render(guild):
+    return render_cache.get(guild, config.get(str(guild.id), {}))
+
+async def load_guild_settings(guild_id):
+    # make the guild's settings resident through the storage thread, so the
+    # handler that follows never reads the database on the event loop
+    if isinstance(config, SettingsCache):
+        await config.fetch(str(guild_id))
+
+async def guilds_with_settings(*keys):
+    # (guild id, settings) for the guilds this process owns that set any of keys
+    if isinstance(config, SettingsCache):
+        found = await config.with_settings(*keys)
+    else:
+        found = [(guild_id, settings) for guild_id, settings in list(config.items()) if any(key in settings for key in keys)]
+    return [(guild_id, settings) for guild_id, settings in found if owns_guild(guild_id)]
 
 config = load_config()
+render_cache = RenderCache(int(os.getenv('RENDER_CACHE_SIZE', '2048')))
+resolver = Resolver()
+config_writer = ConfigWriter(config, JsonFileSink(CONFIG_FILE, config) if CONFIG_BACKEND == 'json' else storage)
+if isinstance(config, SettingsCache):
+    config.pinned = lambda guild_id: guild_id in config_writer.dirty
+tickets = TicketRegistry()
+analytics = Analytics(int(os.getenv('ANALYTICS_RETENTION_DAYS', '30')))
+ANALYTICS_FLUSH_SECONDS = int(os.getenv('ANALYTICS_FLUSH_SECONDS', '60'))
+rest = Rest(retries=int(os.getenv('REST_RETRIES', '3')), failure_threshold=int(os.getenv('REST_FAILURE_THRESHOLD', '3')),
+            reset_after=float(os.getenv('REST_CIRCUIT_RESET', '30')))
+
+async def delete_channel(channel, reason=None, low=True):
+    await rest.call(channel.guild.id, f"channel:{channel.id}", channel.delete, reason=reason, low=low)
+
+MAX_OPEN_TICKETS = int(os.getenv('MAX_OPEN_TICKETS', '1'))
+TICKET_COOLDOWN = int(os.getenv('TICKET_COOLDOWN', '30'))
+ticket_pipeline = TicketPipeline(lambda *args: run_ticket_job(*args),
+                                 workers=int(os.getenv('TICKET_WORKERS', '2')),
+                                 rate=float(os.getenv('TICKET_RATE', '0.5')),
+                                 burst=int(os.getenv('TICKET_BURST', '5')))
+
+category_index = CategoryIndex(int(os.getenv('CATEGORY_LIMIT', str(CATEGORY_LIMIT))))
+MAX_OVERFLOW_CATEGORIES = 10
+OVERFLOW_CLEANUP_DELAY = 300
+overflow_locks = {}
+overflow_cleanups = {}
+
+def ticket_category_ids(guild, render):
+    # configured categories that still exist; one deleted while the bot was
+    # offline is dropped from the settings on startup
+    return [cid for cid in render.category_ids if guild.get_channel(cid) is not None]
+
+@tracer.traced("ticket_category")
+async def ticket_category(guild, render, overflow=True):
+    # Reserves a slot in the first ticket category with room, creating an
+    # overflow category when they are all full. The caller settles the
+    # reservation with category_index.placed().
+    category_index.load(guild)
+    category_index.set_order(guild.id, ticket_category_ids(guild, render))
+    category_id = category_index.pick(guild.id)
+    if category_id is not None:
+        category = guild.get_channel(category_id)
+        if category is None:
+            category_index.placed(guild.id, category_id)
+        return category
+    if overflow and ticket_category_ids(guild, render) and config.get(str(guild.id), {}).get('auto_overflow', True):
+        return await add_overflow_category(guild)
+    return None
+
+async def add_overflow_category(guild):
+    async with overflow_locks.setdefault(guild.id, asyncio.Lock()):
+        # another job may have made room while this one waited
+        render = guild_render(guild)
+        category_index.set_order(guild.id, ticket_category_ids(guild, render))
+        category_id = category_index.pick(guild.id)
+        if category_id is not None:
+            return guild.get_channel(category_id)
+        primary = guild.get_channel(render.category_ids[0])
+        if len(render.category_ids) >= MAX_OVERFLOW_CATEGORIES or primary is None:
+            return None
+        last = guild.get_channel(render.category_ids[-1]) or primary
+        try:
+            category = await rest.call(guild.id, f"channels:{guild.id}", guild.create_category, f"{primary.name} {len(render.category_ids) + 1}", overwrites=primary.overwrites, position=last.position + 1, reason="Ticket categories are full")
+        except (discord.HTTPException, CircuitOpen) as e:
+            print(f"Error creating overflow category in {guild.id}: {e}")
+            return None
+        guild_config = config.setdefault(str(guild.id), {})
+        guild_config['overflow_categories'] = guild_config.get('overflow_categories', []) + [category.id]
+        guild_config['auto_categories'] = guild_config.get('auto_categories', []) + [category.id]
+        save_config(guild.id)
+        schedule_dashboard_update(guild)
+        category_index.set_order(guild.id, ticket_category_ids(guild, guild_render(guild)))
+        category_id = category_index.pick(guild.id)
+        if category_id == category.id:
+            return category
+        return guild.get_channel(category_id) if category_id else None
+
+def forget_category(guild, category_id):
+    guild_config = config.get(str(guild.id))
+    if not guild_config:
+        return
+    changed = False
+    if guild_config.get('category_id') == category_id:
+        guild_config.pop('category_id')
+        changed = True
+    for key in ('overflow_categories', 'auto_categories'):
+        if category_id in guild_config.get(key, ()):
+            guild_config[key] = [c for c in guild_config[key] if c != category_id]
+            changed = True
+    if changed:
+        save_config(guild.id)
+        schedule_dashboard_update(guild)
+
+def schedule_overflow_cleanup(guild, category_id):
+    if category_id not in config.get(str(guild.id), {}).get('auto_categories', ()) or category_index.count(guild.id, category_id):
+        return
+    task = overflow_cleanups.get(category_id)
+    if task and not task.done():
+        return
+    overflow_cleanups[category_id] = asyncio.create_task(remove_empty_overflow(guild, category_id))
+
+async def remove_empty_overflow(guild, category_id):
+    # Waits a while first so a busy guild doesn't delete and recreate the
+    # same overflow category as tickets open and close.
+    await asyncio.sleep(OVERFLOW_CLEANUP_DELAY)
+    overflow_cleanups.pop(category_id, None)
+    category = guild.get_channel(category_id)
+    if category is None or category_index.count(guild.id, category_id):
+        return
+    # out of the ticket order before the delete, so nothing is placed in it meanwhile
+    forget_category(guild, category_id)
+    try:
+        await delete_channel(category, "Empty ticket overflow category")
+    except (discord.HTTPException, CircuitOpen) as e:
+        print(f"Error deleting overflow category {category_id}: {e}")
+
+def category_summary(guild):
+    render = guild_render(guild)
+    if not render.category_ids:
+        return "Not set"
+    category_index.load(guild)
+    category_index.set_order(guild.id, ticket_category_ids(guild, render))
+    lines = []
+    for category_id, count in category_index.utilization(guild.id):
+        category = guild.get_channel(category_id)
+        lines.append(f"`{category.name if category else category_id}` {count}/{category_index.limit}")
+    auto = config.get(str(guild.id), {}).get('auto_overflow', True)
+    lines.append("Overflow categories are created automatically" if auto else "Automatic overflow is off")
+    return "\n".join(lines)
+
+async def create_pool_channel(guild):
+    render = guild_render(guild)
+    category = await ticket_category(guild, render, overflow=False)
+    channel = None
+    try:
+        channel = await rest.call(guild.id, f"channels:{guild.id}", guild.create_text_channel, f"{POOL_PREFIX}{secrets.token_hex(3)}", category=category, overwrites=render.pool_overwrites, topic=POOL_TOPIC, low=True)
+    finally:
+        if category:
+            category_index.placed(guild.id, category.id, channel.id if channel else None)
+    return channel
+
+warm_pool = WarmPool(create_pool_channel, delete_channel, rate=float(os.getenv('POOL_REFILL_RATE', '0.1')))
+
+# Prometheus endpoint, off unless METRICS_PORT is set. Cluster workers each
+# listen on METRICS_PORT + their cluster id.
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+if METRICS_PORT and os.getenv('CLUSTER_ID'):
+    METRICS_PORT += int(os.getenv('CLUSTER_ID'))
+
+# Sampled traces of ticket opens, settings modals and dashboard updates. The
+# last TRACE_BUFFER traces are kept; /trace dumps them, and so does SIGUSR1
+# (into TRACE_DIR, all guilds).
+tracer.rate = float(os.getenv('TRACE_SAMPLE_RATE', '0.1'))
+tracer.traces = deque(tracer.traces, maxlen=int(os.getenv('TRACE_BUFFER', '500')))
+TRACE_DIR = os.getenv('TRACE_DIR', '.')
+
+metrics.describe('handler_seconds', 'histogram', 'Latency of commands, view callbacks, modals and ticket tasks')
+metrics.describe('handler_errors_total', 'counter', 'Errors raised by commands, view callbacks, modals and ticket tasks')
+metrics.describe('config_flush_seconds', 'histogram', 'Time to write dirty guild settings')
+metrics.describe('event_loop_lag_seconds', 'histogram', 'How late a 1s sleep on the event loop wakes up')
+metrics.describe('rest_calls_total', 'counter', 'REST calls made through the shared wrapper, by route')
+metrics.describe('rest_events_total', 'counter', 'REST retries, rate limits, failures and circuit rejections')
+metrics.describe('rest_open_circuits', 'gauge', 'Guilds whose REST circuit is open')
+metrics.describe('gateway_latency_seconds', 'gauge', 'Gateway heartbeat latency')
+metrics.describe('open_tickets', 'gauge', 'Open tickets in the registry')
+metrics.describe('ticket_queue_depth', 'gauge', 'Ticket creations waiting in the queue')
+metrics.describe('warm_pool_channels', 'gauge', 'Pre-created channels ready in the warm pool')
+metrics.describe('guilds', 'gauge', 'Guilds this process serves')
+
+config_writer.on_flush = lambda seconds, count: metrics.observe('config_flush_seconds', seconds)
+
+@metrics.collector
+def bot_metrics():
+    latency = bot.latency
+    if latency == latency and latency != float('inf'):
+        yield 'gateway_latency_seconds', (), latency
+    yield 'guilds', (), len(bot.guilds)
+    yield 'open_tickets', (), len(tickets)
+    yield 'ticket_queue_depth', (), sum(q.qsize() for q in ticket_pipeline.queues.values())
+    yield 'warm_pool_channels', (), sum(len(dq) for dq in warm_pool.channels.values())
+    for family, count in rest.routes.items():
+        yield 'rest_calls_total', (('route', family),), count
+    for event, count in rest.counts.items():
+        if event != 'calls':
+            yield 'rest_events_total', (('event', event),), count
+    yield 'rest_open_circuits', (), sum(1 for guild_id in rest.opened_until if rest.is_open(guild_id))
+
+@bot.listen('on_command')
+async def start_command_timer(ctx):
+    ctx.metrics_started = time.perf_counter()
+
+@bot.listen('on_command_completion')
+async def record_command(ctx):
+    started = getattr(ctx, 'metrics_started', None)
+    if started is not None:
+        metrics.observe('handler_seconds', time.perf_counter() - started, (('kind', 'command'), ('name', ctx.command.qualified_name)))
+
+@bot.listen('on_command_error')
+async def record_command_error(ctx, error):
+    if ctx.command is None:
+        return
+    labels = (('kind', 'command'), ('name', ctx.command.qualified_name))
+    metrics.inc('handler_errors_total', labels)
+    started = getattr(ctx, 'metrics_started', None)
+    if started is not None:
+        metrics.observe('handler_seconds', time.perf_counter() - started, labels)
+
+async def load_warm_pools():
+    pooled = dict(await guilds_with_settings('warm_pool_size'))
+    for guild in bot.guilds:
+        found = [c for c in guild.text_channels if is_pool_channel(c) and c.id not in tickets]
+        size = pooled.get(str(guild.id), {}).get('warm_pool_size', 0)
+        if not found and not size:
+            continue
+        for channel in warm_pool.reclaim(guild, size, found):
+            try:
+                await delete_channel(channel, "Orphaned warm pool channel")
+            except (discord.HTTPException, CircuitOpen) as e:
+                print(f"Error deleting pool channel {channel.id}: {e}")
+            await asyncio.sleep(1)
+
+async def load_tickets():
+    rows = [r for r in await storage.run(storage.open_tickets) if owns_guild(r['guild_id'])]
+    numbers = await storage.run(storage.ticket_numbers)
+    tickets.load(rows, numbers)
+    adopted, missing = [], []
+    for guild in bot.guilds:
+        guild_adopted, guild_missing = tickets.reconcile(guild)
+        adopted += guild_adopted
+        missing += guild_missing
+    if adopted:
+        await storage.run(storage.add_tickets, adopted)
+    if missing:
+        await storage.run(storage.close_tickets, [t.channel_id for t in missing], time.time())
+    print(f"🎫 {len(tickets)} open tickets loaded ({len(adopted)} adopted, {len(missing)} gone)")
+
+async def sync_command_tree():
+    # Only sync when the slash command definitions changed since the last sync.
+    try:
+        payload = json.dumps([cmd.to_dict(bot.tree) for cmd in bot.tree.get_commands()], sort_keys=True)
+        digest = hashlib.sha256(payload.encode()).hexdigest()
+        if digest == await storage.run(storage.get_meta, 'command_tree_hash'):
+            return
+        synced = await bot.tree.sync()
+        await storage.run(storage.set_meta, 'command_tree_hash', digest)
+        print(f"✅ Synced {len(synced)} slash commands")
+    except Exception as e:
+        print(f"Error syncing slash commands: {e}")
+        traceback.print_exc()
+
+CHANGE_POLL = float(os.getenv('CHANGE_POLL', '2'))
+change_watcher = None
+
+async def watch_changes():
+    # Other bot processes sharing the database log their settings writes;
+    # reload those guilds so caches here never serve stale settings.
+    seq = await storage.run(storage.last_change)
+    while not bot.is_closed():
+        await asyncio.sleep(CHANGE_POLL)
+        try:
+            changed, seq = await storage.run(storage.changes_since, seq)
+            for guild_id in changed:
+                if not owns_guild(guild_id) or str(guild_id) in config_writer.dirty:
+                    continue
+                # a guild that is not resident is read fresh on its next use
+                if config.resident(str(guild_id)):
+                    settings = await storage.run(storage.get_settings, guild_id)
+                    if settings:
+                        config[str(guild_id)] = settings
+                    else:
+                        config.pop(str(guild_id), None)
+                render_cache.invalidate(guild_id)
+                guild = bot.get_guild(guild_id)
+                if guild:
+                    schedule_dashboard_update(guild)
+        except Exception as e:
+            print(f"Error reading settings changes: {e}")
 
 @bot.event
 async def on_ready():
     print(f'{bot.user} is now online!')
     print(f'In {len(bot.guilds)} servers')
-    bot.add_view(TicketButtonView())
-    bot.add_view(CloseTicketView())
-    bot.add_view(DashboardView())
+    print(f"Ready after {time.monotonic() - STARTED_AT:.1f}s, peak RSS {memory_usage_mb():.0f} MB ({'lean' if LEAN_GATEWAY else 'full member cache'})")
+    global ticket_button_view, close_ticket_view, dashboard_view
+    if dashboard_view is None:
+        ticket_button_view = TicketButtonView()
+        close_ticket_view = CloseTicketView()
+        dashboard_view = DashboardView()
+    bot.add_view(ticket_button_view)
+    bot.add_view(close_ticket_view)
+    bot.add_view(dashboard_view)
     print("✅ All persistent views registered!")
+    if not tickets.loaded:
+        analytics.load(await storage.run(storage.load_analytics, owns_guild))
+        await load_tickets()
+        await load_warm_pools()
+        # only the guilds with categories or a migration need anything here;
+        # the rest are loaded on first use
+        for guild_id, guild_config in await guilds_with_settings('category_id', 'overflow_categories', 'auto_categories', MIGRATION_KEY):
+            guild = bot.get_guild(int(guild_id))
+            if guild is None:
+                continue
+            for category_id in guild_render(guild).category_ids:
+                if guild.get_channel(category_id) is None:
+                    forget_category(guild, category_id)
+            for category_id in guild_config.get('auto_categories', ()):
+                category_index.load(guild)
+                schedule_overflow_cleanup(guild, category_id)
+            job = guild_config.get(MIGRATION_KEY)
+            if job:
+                migrator.start(guild, job)
+    if not SHARD_IDS or 0 in SHARD_IDS:
+        await sync_command_tree()
+    if not reap_stale_tickets.is_running():
+        reap_stale_tickets.start()
+    if not flush_analytics.is_running():
+        flush_analytics.start()
+    if not expire_search_index.is_running():
+        expire_search_index.start()
+    if METRICS_PORT and metrics.server is None:
+        try:
+            await metrics.serve(METRICS_HOST, METRICS_PORT)
+            print(f"📈 Metrics on http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+        except OSError as e:
+            print(f"Error starting metrics endpoint: {e}")
+    if hasattr(signal, 'SIGUSR1'):
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGUSR1, dump_traces)
+        except (NotImplementedError, RuntimeError):
+            pass
+    global change_watcher
+    if CONFIG_BACKEND == 'sqlite' and change_watcher is None:
+        change_watcher = asyncio.create_task(watch_changes())
+
+@bot.event
+async def on_guild_role_create(role):
+    resolver.role_changed(role)
+
+@bot.event
+async def on_guild_role_update(before, after):
+    if before.name != after.name:
+        resolver.role_changed(after)
+
+@bot.event
+async def on_guild_role_delete(role):
+    resolver.role_deleted(role)
+    render_cache.invalidate(role.guild.id)
+
+@bot.event
+async def on_guild_channel_create(channel):
+    resolver.channel_changed(channel)
+    category_index.added(channel)
+
+@bot.event
+async def on_guild_channel_update(before, after):
+    await load_guild_settings(after.guild.id)
+    if before.name != after.name:
+        resolver.channel_changed(after)
+    if before.category_id != after.category_id:
+        category_index.moved(before, after)
+        if before.category_id:
+            schedule_overflow_cleanup(after.guild, before.category_id)
+
+@bot.event
+async def on_guild_remove(guild):
+    resolver.drop(guild.id)
+    render_cache.invalidate(guild.id)
+    category_index.drop(guild.id)
+
+@bot.event
+async def on_guild_channel_delete(channel):
+    await load_guild_settings(channel.guild.id)
+    resolver.channel_deleted(channel)
+    category_index.removed(channel)
+    if isinstance(channel, discord.CategoryChannel):
+        forget_category(channel.guild, channel.id)
+    elif channel.category_id:
+        schedule_overflow_cleanup(channel.guild, channel.category_id)
+    warm_pool.discard(channel.id)
+    ticket = tickets.remove(channel.id)
+    if ticket:
+        await ticket_closed(ticket)
+
+@bot.event
+async def on_thread_update(before, after):
+    if after.archived and not before.archived:
+        await close_thread_ticket(after)
+
+@bot.event
+async def on_thread_delete(thread):
+    await close_thread_ticket(thread)
+
+async def close_thread_ticket(thread):
+    ticket = tickets.remove(thread.id)
+    if ticket:
+        await ticket_closed(ticket)
+
+async def ticket_closed(ticket):
+    now = time.time()
+    analytics.closed(ticket.guild_id, ticket.opened_at, now)
+    await storage.run(storage.close_ticket, ticket.channel_id, now)
+    guild = bot.get_guild(ticket.guild_id)
+    if guild:
+        schedule_dashboard_update(guild)
+
+@bot.before_invoke
+async def load_command_guild(ctx):
+    if ctx.guild:
+        await load_guild_settings(ctx.guild.id)
 
 @bot.event
 async def on_command_error(ctx, error):
     if isinstance(error, commands.CommandNotFound):
         return
+    original = error
+    while getattr(original, 'original', None) is not None:
+        original = original.original
+    if isinstance(original, CircuitOpen):
+        await ctx.send("⚠️ Discord is having trouble right now, please try again in a minute.")
+        return
     await ctx.send(f"⚠️ Error: {error}")
 
-@bot.command()
+@bot.hybrid_command(description="Check that the bot is alive")
 async def ping(ctx):
     await ctx.send("Pong! 🏓")
 
-@bot.command()
+async def role_autocomplete(interaction: discord.Interaction, current: str):
+    index = resolver.get(interaction.guild).roles
+    roles = index.prefix(current) if current else [r for r in reversed(interaction.guild.roles) if not r.is_default()][:25]
+    return [app_commands.Choice(name=r.name[:100], value=r.mention) for r in roles[:25]]
+
+async def category_autocomplete(interaction: discord.Interaction, current: str):
+    index = resolver.get(interaction.guild).categories
+    return [app_commands.Choice(name=c.name[:100], value=c.mention) for c in index.prefix(current)[:25]]
+
+async def text_channel_autocomplete(interaction: discord.Interaction, current: str):
+    index = resolver.get(interaction.guild).text_channels
+    return [app_commands.Choice(name=f"#{c.name}"[:100], value=c.mention) for c in index.prefix(current.lstrip('#'))[:25]]
+
+@bot.hybrid_command(description="Set the support role that can see tickets")
+@app_commands.default_permissions(administrator=True)
 @commands.has_permissions(administrator=True)
+@app_commands.describe(role_input="Role name or mention")
+@app_commands.autocomplete(role_input=role_autocomplete)
 async def role(ctx, *, role_input: str = None):
     if not role_input:
         await ctx.send("❌ Usage: `!role @Support` or `!role Support`")
         return
-    if role_input.startswith('<@&') and role_input.endswith('>'):
-        try:
-            role_id = int(role_input[3:-1])
-            role = ctx.guild.get_role(role_id)
-        except ValueError:
-            role = None
-    else:
-        role = discord.utils.find(lambda r: r.name.lower() == role_input.strip().lower(), ctx.guild.roles)
-    
+    role = resolver.role(ctx.guild, role_input)
     if not role:
-        await ctx.send("❌ Role not found.")
+        await ctx.send("❌ Role not found." + did_you_mean(resolver.get(ctx.guild).roles.suggest(role_input)))
         return
         
-    config.setdefault(str(ctx.guild.id), {})['support_role'] = role.id
-    save_config(config)
-    await ctx.send(f"✅ Support role set to {role.mention}")
+    guild_config = config.setdefault(str(ctx.guild.id), {})
+    old_role = guild_config.get('support_role')
+    guild_config['support_role'] = role.id
+    save_config(ctx.guild.id)
+    note = migrate_open_tickets(ctx.guild, old_role=old_role, new_role=role.id) if old_role != role.id else ""
+    await ctx.send(f"✅ Support role set to {role.mention}" + note)
 
-@bot.command()
+@bot.hybrid_command(description="Set the category new tickets are created in")
+@app_commands.default_permissions(administrator=True)
 @commands.has_permissions(administrator=True)
+@app_commands.describe(cat_name="Category name")
+@app_commands.autocomplete(cat_name=category_autocomplete)
 async def category(ctx, *, cat_name: str = None):
     if not cat_name:
         await ctx.send("❌ Usage: `!category ticketing`")
         return
-    category = discord.utils.find(lambda c: isinstance(c, discord.CategoryChannel) and c.name.lower() == cat_name.strip().lower(), ctx.guild.channels)
+    category = resolver.category(ctx.guild, cat_name)
     if not category:
-        all_cats = [c.name for c in ctx.guild.channels if isinstance(c, discord.CategoryChannel)]
-        await ctx.send(f"❌ Not found. Available: {', '.join(all_cats) or 'None'}")
+        await ctx.send("❌ Category not found." + did_you_mean(resolver.get(ctx.guild).categories.suggest(cat_name)))
         return
-    config.setdefault(str(ctx.guild.id), {})['category_id'] = category.id
-    save_config(config)
-    await ctx.send(f"✅ Default category set to **{category.name}**")
+    guild_config = config.setdefault(str(ctx.guild.id), {})
+    old_category = guild_config.get('category_id')
+    guild_config['category_id'] = category.id
+    save_config(ctx.guild.id)
+    note = migrate_open_tickets(ctx.guild, old_category=old_category) if old_category != category.id else ""
+    await ctx.send(f"✅ Default category set to **{category.name}**" + note)
 
-@bot.command()
+@bot.hybrid_command(description="Create tickets as channels or as private threads")
+@app_commands.default_permissions(administrator=True)
 @commands.has_permissions(administrator=True)
-async def panel(ctx, channel: discord.TextChannel = None):
-    if not channel:
+@app_commands.describe(mode="'channel' for a text channel per ticket, 'thread' for a private thread under the panel channel")
+@app_commands.choices(mode=[app_commands.Choice(name="channel", value="channel"), app_commands.Choice(name="thread", value="thread")])
+async def ticketmode(ctx, mode: str = None):
+    if mode not in ('channel', 'thread'):
+        await ctx.send("❌ Usage: `!ticketmode channel` or `!ticketmode thread`")
+        return
+    guild_config = config.setdefault(str(ctx.guild.id), {})
+    if mode == 'thread':
+        guild_config['ticket_backend'] = 'thread'
+    else:
+        guild_config.pop('ticket_backend', None)
+    save_config(ctx.guild.id)
+    schedule_dashboard_update(ctx.guild)
+    warning = ""
+    render = guild_render(ctx.guild)
+    parent = ctx.guild.get_channel(render.settings.get('panel_channel') or 0) or ctx.channel
+    if mode == 'thread' and render.support_role and isinstance(parent, discord.TextChannel) and not support_mention_reaches(parent, render.support_role):
+        warning = (f"\n⚠️ I can't mention **{render.support_role.name}**, so mentioning it won't add its members to ticket threads. "
+                   f"Make the role mentionable or give me **Mention @everyone** in {parent.mention}. "
+                   + ("Until then nobody from it is added, since the member list is off." if LEAN_GATEWAY else
+                      f"Until then I add up to {THREAD_STAFF_LIMIT} of its members one by one."))
+    await ctx.send(f"✅ New tickets will be created as {'private threads' if mode == 'thread' else 'text channels'}{warning}")
+
+@bot.hybrid_group(description="Manage the overflow categories tickets spill into when a category is full", fallback="show")
+@app_commands.default_permissions(administrator=True)
+@commands.has_permissions(administrator=True)
+async def overflow(ctx):
+    if ctx.invoked_subcommand is None:
+        embed = discord.Embed(title="📂 Ticket Categories", description=category_summary(ctx.guild), color=guild_render(ctx.guild).color)
+        await ctx.send(embed=embed)
+
+@overflow.command(name="add", description="Add a category tickets spill into, after the existing ones")
+@app_commands.describe(cat_name="Category name")
+@app_commands.autocomplete(cat_name=category_autocomplete)
+@commands.has_permissions(administrator=True)
+async def overflow_add(ctx, *, cat_name: str):
+    category = resolver.category(ctx.guild, cat_name)
+    if not category:
+        await ctx.send("❌ Category not found." + did_you_mean(resolver.get(ctx.guild).categories.suggest(cat_name)))
+        return
+    guild_config = config.setdefault(str(ctx.guild.id), {})
+    if category.id in guild_render(ctx.guild).category_ids:
+        await ctx.send(f"❌ **{category.name}** is already a ticket category.")
+        return
+    if len(guild_render(ctx.guild).category_ids) >= MAX_OVERFLOW_CATEGORIES:
+        await ctx.send(f"❌ At most {MAX_OVERFLOW_CATEGORIES} ticket categories are supported.")
+        return
+    guild_config['overflow_categories'] = guild_config.get('overflow_categories', []) + [category.id]
+    save_config(ctx.guild.id)
+    schedule_dashboard_update(ctx.guild)
+    await ctx.send(f"✅ Tickets will spill into **{category.name}**")
+
+@overflow.command(name="remove", description="Stop using a category for overflow tickets")
+@app_commands.describe(cat_name="Category name")
+@app_commands.autocomplete(cat_name=category_autocomplete)
+@commands.has_permissions(administrator=True)
+async def overflow_remove(ctx, *, cat_name: str):
+    category = resolver.category(ctx.guild, cat_name)
+    if not category or category.id not in config.get(str(ctx.guild.id), {}).get('overflow_categories', ()):
+        await ctx.send("❌ Not an overflow category.")
+        return
+    forget_category(ctx.guild, category.id)
+    await ctx.send(f"✅ **{category.name}** is no longer used for tickets")
+
+@overflow.command(name="auto", description="Create overflow categories automatically when all are full")
+@app_commands.describe(enabled="Whether to create overflow categories automatically")
+@commands.has_permissions(administrator=True)
+async def overflow_auto(ctx, enabled: bool):
+    guild_config = config.setdefault(str(ctx.guild.id), {})
+    if enabled:
+        guild_config.pop('auto_overflow', None)
+    else:
+        guild_config['auto_overflow'] = False
+    save_config(ctx.guild.id)
+    schedule_dashboard_update(ctx.guild)
+    await ctx.send(f"✅ Automatic overflow categories {'on' if enabled else 'off'}")
+
+@bot.hybrid_command(description="Restrict panel setup to one channel")
+@app_commands.default_permissions(administrator=True)
+@commands.has_permissions(administrator=True)
+@app_commands.describe(channel_input="Text channel")
+@app_commands.autocomplete(channel_input=text_channel_autocomplete)
+async def panel(ctx, *, channel_input: str = None):
+    if not channel_input:
         await ctx.send("❌ Usage: `!panel #support-channel`")
         return
+    channel = resolver.text_channel(ctx.guild, channel_input)
+    if not channel:
+        await ctx.send("❌ Channel not found." + did_you_mean(resolver.get(ctx.guild).text_channels.suggest(channel_input.lstrip('#'))))
+        return
     config.setdefault(str(ctx.guild.id), {})['panel_channel'] = channel.id
-    save_config(config)
+    save_config(ctx.guild.id)
     await ctx.send(f"✅ Restricted to {channel.mention}")
 
-@bot.command()
+@bot.hybrid_command(description="Set the channel closed ticket transcripts are posted in")
+@app_commands.default_permissions(administrator=True)
+@commands.has_permissions(administrator=True)
+@app_commands.describe(channel_input="Text channel")
+@app_commands.autocomplete(channel_input=text_channel_autocomplete)
+async def transcripts(ctx, *, channel_input: str = None):
+    if not channel_input:
+        await ctx.send("❌ Usage: `!transcripts #ticket-logs`")
+        return
+    channel = resolver.text_channel(ctx.guild, channel_input)
+    if not channel:
+        await ctx.send("❌ Channel not found." + did_you_mean(resolver.get(ctx.guild).text_channels.suggest(channel_input.lstrip('#'))))
+        return
+    config.setdefault(str(ctx.guild.id), {})['transcript_channel'] = channel.id
+    save_config(ctx.guild.id)
+    await ctx.send(f"✅ Transcripts will be posted in {channel.mention}")
+
+@bot.hybrid_command(description="Show the current ticket settings")
 async def show(ctx):
     settings = config.get(str(ctx.guild.id), {})
     embed = discord.Embed(title="Current Settings", color=0x00ff99)
@@ -111,14 +720,188 @@ async def show(ctx):
     c = settings.get('category_id')
     cat_obj = ctx.guild.get_channel(c) if c else None
     embed.add_field(name="Default Category", value=cat_obj.name if cat_obj else "Not set", inline=False)
+    embed.add_field(name="Ticket Mode", value="Private threads" if settings.get('ticket_backend') == 'thread' else "Text channels", inline=False)
+    embed.add_field(name="Ticket Categories", value=category_summary(ctx.guild), inline=False)
     
     p = settings.get('panel_channel')
     chan_obj = ctx.guild.get_channel(p) if p else None
     embed.add_field(name="Panel Channel", value=chan_obj.mention if chan_obj else "Any", inline=False)
+
+    t = settings.get('transcript_channel')
+    log_obj = ctx.guild.get_channel(t) if t else None
+    embed.add_field(name="Transcript Channel", value=log_obj.mention if log_obj else "Not set", inline=False)
+
+    stats = ticket_pipeline.stats(ctx.guild.id)
+    embed.add_field(name="Ticket Queue", value=f"{stats['depth']} waiting • avg wait {stats['avg_wait']:.1f}s", inline=False)
+    embed.add_field(name="Warm Pool", value=warm_pool_summary(ctx.guild), inline=False)
         
     await ctx.send(embed=embed)
 
-@bot.command()
+def warm_pool_summary(guild):
+    size = warm_pool.sizes.get(guild.id, 0)
+    if not size:
+        return "Disabled"
+    text = f"{warm_pool.available(guild.id)}/{size} ready"
+    for kind in ('pooled', 'cold'):
+        p50 = warm_pool.p50(kind)
+        if p50 is not None:
+            text += f" • {kind} p50 {p50 * 1000:.0f}ms"
+    return text
+
+@bot.hybrid_group(description="Manage the pool of pre-created ticket channels", fallback="show")
+@app_commands.default_permissions(administrator=True)
+@commands.has_permissions(administrator=True)
+async def warmpool(ctx):
+    if ctx.invoked_subcommand is None:
+        await ctx.send(f"Warm pool: {warm_pool_summary(ctx.guild)}")
+
+@warmpool.command(name="size", description="Set how many ticket channels to keep ready (0 disables)")
+@app_commands.describe(size=f"Number of channels to keep ready (0-{MAX_POOL_SIZE})")
+@commands.has_permissions(administrator=True)
+async def warmpool_size(ctx, size: commands.Range[int, 0, MAX_POOL_SIZE]):
+    config.setdefault(str(ctx.guild.id), {})['warm_pool_size'] = size
+    save_config(ctx.guild.id)
+    warm_pool.set_size(ctx.guild, size)
+    await ctx.send(f"✅ Warm pool size set to {size}")
+
+async def migrate_ticket(guild, job, channel_id):
+    # One ticket of a migration job: a single channel edit covering the new
+    # role, stripped old roles and a move out of an old category.
+    ticket = tickets.get(channel_id)
+    channel = guild.get_channel_or_thread(channel_id)
+    if ticket is None or ticket.state != "open" or channel is None:
+        return False
+    render = guild_render(guild)
+    if isinstance(channel, discord.Thread):
+        # thread access comes from membership; mentioning the role adds its members
+        role = render.support_role
+        if role is None or role.id != job.get('mention_role'):
+            return False
+        await rest.call(guild.id, f"messages:{channel.id}", channel.send, f"{role.mention} is now the support role for this ticket.", allowed_mentions=discord.AllowedMentions(roles=True), low=True)
+        return True
+    overwrites = dict(channel.overwrites)
+    options = {}
+    if render.support_role and render.support_role not in overwrites:
+        overwrites[render.support_role] = TICKET_SUPPORT
+        options['overwrites'] = overwrites
+    for role_id in job['remove_roles']:
+        role = guild.get_role(role_id)
+        if role and role_id != render.support_role_id and role in overwrites:
+            del overwrites[role]
+            options['overwrites'] = overwrites
+    category = None
+    if render.category_ids and channel.category_id in job['from_categories'] and channel.category_id not in render.category_ids:
+        category = await ticket_category(guild, render)
+        if category:
+            options['category'] = category
+    if not options:
+        return False
+    placed = None
+    try:
+        await rest.call(guild.id, f"channel:{channel.id}", channel.edit, reason="Ticket settings changed", low=True, **options)
+        placed = channel.id
+    finally:
+        if category:
+            category_index.placed(guild.id, category.id, placed)
+    return True
+
+def save_migration(guild, job):
+    guild_config = config.setdefault(str(guild.id), {})
+    if job is None:
+        guild_config.pop(MIGRATION_KEY, None)
+    else:
+        guild_config[MIGRATION_KEY] = job
+    save_config(guild.id)
+    schedule_dashboard_update(guild)
+
+migrator = Migrator(lambda guild: tickets.by_guild.get(guild.id, ()), migrate_ticket, save_migration,
+                    batch=int(os.getenv('MIGRATION_BATCH', '5')), pause=float(os.getenv('MIGRATION_PAUSE', '5')))
+
+def migrate_open_tickets(guild, old_role=None, old_category=None, new_role=None):
+    # Called after the support role or ticket category changed; returns a
+    # note for the admin when open tickets will be updated.
+    count = len(tickets.by_guild.get(guild.id, ()))
+    if not count or not (old_role or old_category or new_role):
+        return ""
+    guild_config = config.get(str(guild.id), {})
+    migrator.request(guild, guild_config.get(MIGRATION_KEY), old_role=old_role, old_category=old_category,
+                     remove_old=guild_config.get('migration_remove_old', False), new_role=new_role)
+    return f"\n🔁 Updating {count} open tickets in the background (`/migrate status` for progress)."
+
+def migration_summary(guild):
+    progress = migrator.progress(guild.id)
+    if progress is None:
+        return None
+    done, total = progress
+    job = migrator.jobs[guild.id]
+    text = f"{done}/{total} open tickets checked ({done * 100 // max(total, 1)}%), {job['changed']} updates made"
+    if job['failed']:
+        text += f", {job['failed']} failed"
+    return text
+
+@bot.hybrid_group(description="Follow or stop the update of open tickets after a settings change", fallback="status")
+@app_commands.default_permissions(administrator=True)
+@commands.has_permissions(administrator=True)
+async def migrate(ctx):
+    if ctx.invoked_subcommand is None:
+        remove_old = config.get(str(ctx.guild.id), {}).get('migration_remove_old', False)
+        status = migration_summary(ctx.guild) or "No update running."
+        await ctx.send(f"🔁 {status}\nOld support roles are {'removed from' if remove_old else 'kept on'} open tickets.")
+
+@migrate.command(name="cancel", description="Stop updating open tickets")
+@commands.has_permissions(administrator=True)
+async def migrate_cancel(ctx):
+    if migrator.cancel(ctx.guild):
+        await ctx.send("⏹️ Stopped updating open tickets.")
+    else:
+        await ctx.send("❌ No update is running.")
+
+@migrate.command(name="removeold", description="Whether changing the support role also removes the old role from open tickets")
+@app_commands.describe(enabled="Remove the old role's access to open tickets")
+@commands.has_permissions(administrator=True)
+async def migrate_removeold(ctx, enabled: bool):
+    config.setdefault(str(ctx.guild.id), {})['migration_remove_old'] = enabled
+    save_config(ctx.guild.id)
+    await ctx.send(f"✅ Old support roles will be {'removed from' if enabled else 'kept on'} open tickets when the role changes.")
+
+def slow_traces_text(guild_id, count):
+    slowest = tracer.slowest(count, guild_id)
+    if not slowest:
+        return f"No traces recorded yet (sampling {tracer.rate:.0%} of interactions)."
+    lines = [f"`{summarize(trace)}`" for trace in slowest]
+    return f"Slowest of {len(tracer.finished(guild_id))} sampled interactions:\n" + "\n".join(lines)
+
+@bot.hybrid_group(description="Inspect sampled traces of slow interactions", fallback="summary")
+@app_commands.default_permissions(administrator=True)
+@commands.has_permissions(administrator=True)
+async def trace(ctx):
+    if ctx.invoked_subcommand is None:
+        await ctx.send(slow_traces_text(ctx.guild.id, 5), ephemeral=True)
+
+@trace.command(name="slow", description="List the slowest sampled interactions in this server")
+@app_commands.describe(count="How many to list (1-20)")
+@commands.has_permissions(administrator=True)
+async def trace_slow(ctx, count: commands.Range[int, 1, 20] = 10):
+    await ctx.send(slow_traces_text(ctx.guild.id, count)[:2000], ephemeral=True)
+
+@trace.command(name="dump", description="Download this server's sampled traces (open in chrome://tracing or Perfetto)")
+@commands.has_permissions(administrator=True)
+async def trace_dump(ctx):
+    data = json.dumps(tracer.chrome_trace(ctx.guild.id)).encode()
+    file = discord.File(io.BytesIO(data), filename=f"trace-{ctx.guild.id}-{int(time.time())}.json")
+    await ctx.send(f"📎 {len(tracer.finished(ctx.guild.id))} traces", file=file, ephemeral=True)
+
+def dump_traces():
+    try:
+        path = tracer.dump(os.path.join(TRACE_DIR, f"trace-{int(time.time())}.json"))
+        print(f"📎 Dumped {len(tracer.traces)} traces to {path}")
+        for trace in tracer.slowest(5):
+            print(f"   {summarize(trace)}")
+    except OSError as e:
+        print(f"Error dumping traces: {e}")
+
+@bot.hybrid_command(description="Post the ticket panel in this channel")
+@app_commands.default_permissions(administrator=True)
 @commands.has_permissions(administrator=True)
 async def panelsetup(ctx):
     guild_id = str(ctx.guild.id)
@@ -127,70 +910,260 @@ async def panelsetup(ctx):
         await ctx.send("❌ Use in the allowed panel channel!")
         return
     
-    guild_config = config.get(guild_id, {})
-    title = guild_config.get('panel_title', '📩 Support Tickets')
-    description = guild_config.get('panel_description', 'Click to open a private ticket.')
-    
+    await post_panel(ctx.channel)
+    if ctx.interaction:
+        await ctx.send("✅ Panel posted!", ephemeral=True)
+
+# Every posted panel is recorded in the messages table, so changing the panel
+# settings re-renders all of them in place instead of leaving old copies stale.
+PANEL_KIND = 'panel'
+PANEL_KEYS = ('panel_title', 'panel_description', 'embed_color', 'button_label', 'button_emoji')
+PANEL_DEBOUNCE = float(os.getenv('PANEL_DEBOUNCE', '10'))
+PANEL_BATCH = 5
+PANEL_PAUSE = float(os.getenv('PANEL_PAUSE', '2'))
+panel_refreshes = {}
+
+def panel_view(guild):
+    # Keeps the persistent custom_id, so clicks on any guild's panel still
+    # reach the TicketButtonView registered at startup.
+    render = guild_render(guild)
+    if render.panel_view is None:
+        render.panel_view = TicketButtonView(render.button_label, render.button_emoji)
+    return render.panel_view
+
+def valid_button_emoji(value):
+    # a single unicode emoji, or a server emoji pasted as <:name:id>
+    return bool(discord.PartialEmoji.from_str(value).id) or is_emoji(value)
+
+async def post_panel(channel):
+    guild = channel.guild
+    message = await rest.call(guild.id, f"messages:{channel.id}", channel.send, embed=guild_render(guild).panel_embed, view=panel_view(guild))
+    # every panel stays recorded; refresh_panels paces the edits however many
+    # there are, and drops the ones that were deleted
+    await storage.run(storage.set_message, guild.id, channel.id, message.id, PANEL_KIND)
+    return message
+
+async def delayed_panel_refresh(guild):
+    await asyncio.sleep(PANEL_DEBOUNCE)
+    panel_refreshes.pop(guild.id, None)
+    await refresh_panels(guild)
+
+def schedule_panel_refresh(guild):
+    # Same debounce as the dashboard: a burst of edits to the panel settings
+    # re-renders the panels once, with the settings as they are by then.
+    task = panel_refreshes.get(guild.id)
+    if task and not task.done():
+        return
+    panel_refreshes[guild.id] = asyncio.create_task(delayed_panel_refresh(guild))
+
+@metrics.timed("task")
+async def refresh_panels(guild):
+    # Edits the recorded panels as low-priority calls, PANEL_BATCH at a time
+    # with a pause in between, and forgets panels whose message or channel is
+    # gone. Returns (edited, pruned).
+    edited = pruned = 0
     try:
-        color = int(guild_config.get("embed_color", "0x00ff99").replace("#", "0x"), 16)
-    except:
-        color = 0x00ff99
-    
-    embed = discord.Embed(title=title, description=description, color=color)
-    await ctx.send(embed=embed, view=TicketButtonView())
+        rows = await storage.run(storage.get_messages, guild.id, PANEL_KIND)
+        for i, row in enumerate(rows):
+            if i and i % PANEL_BATCH == 0:
+                await asyncio.sleep(PANEL_PAUSE)
+            render = guild_render(guild)
+            channel = guild.get_channel_or_thread(row['channel_id'])
+            if channel is not None:
+                try:
+                    await rest.call(guild.id, f"messages:{channel.id}", channel.get_partial_message(row['message_id']).edit, embed=render.panel_embed, view=panel_view(guild), low=True)
+                    edited += 1
+                    continue
+                except discord.NotFound:
+                    pass
+                except (discord.HTTPException, CircuitOpen) as e:
+                    print(f"Error refreshing panel {row['message_id']} in {guild.id}: {e}")
+                    continue
+            await storage.run(storage.delete_message, row['message_id'])
+            pruned += 1
+    except Exception as e:
+        print(f"Error refreshing panels in {guild.id}: {e}")
+        traceback.print_exc()
+    return edited, pruned
+
+NO_DESCRIPTION = "No description provided."
 
 class TicketModal(discord.ui.Modal, title="Create Support Ticket"):
     def __init__(self, selected_type=None):
         super().__init__()
         self.selected_type = selected_type
-        self.description = discord.ui.TextInput(label="Briefly describe your issue", style=discord.TextStyle.paragraph, required=False)
+        self.description = discord.ui.TextInput(label="Briefly describe your issue", style=discord.TextStyle.paragraph, required=False, max_length=2000)
         self.add_item(self.description)
 
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        await load_guild_settings(interaction.guild.id)
+        return True
+
+    @metrics.timed("modal")
+    @tracer.traced("open_ticket")
     async def on_submit(self, interaction: discord.Interaction):
-        description = self.description.value or "No description provided."
-        await create_ticket(interaction, self.selected_type, description)
+        description = self.description.value or NO_DESCRIPTION
+        guild = interaction.guild
+        guild_config = config.get(str(guild.id), {})
+        reason = ticket_pipeline.admit(guild.id, interaction.user.id, len(tickets.open_for(guild.id, interaction.user.id)),
+                                       max_open=guild_config.get('max_open_tickets', MAX_OPEN_TICKETS),
+                                       cooldown=guild_config.get('ticket_cooldown', TICKET_COOLDOWN))
+        if reason:
+            await interaction.response.send_message(reason, ephemeral=True)
+            return
+        with tracer.span("interaction defer"):
+            await interaction.response.defer(ephemeral=True, thinking=True)
+        position = ticket_pipeline.submit(guild.id, interaction.user.id, interaction, self.selected_type, description, tracer.handoff())
+        if position > 1:
+            await interaction.edit_original_response(content=f"⏳ You're in queue (position {position}), your ticket will be created shortly.")
+
+async def run_ticket_job(interaction, selected_type, description, trace=None):
+    try:
+        await tracer.resume(trace, create_ticket(interaction, selected_type, description))
+    except Exception:
+        await interaction.edit_original_response(content="❌ Could not create your ticket, please try again later.")
+        raise
 
+async def reply_ephemeral(interaction, content):
+    with tracer.span("interaction reply"):
+        if interaction.response.is_done():
+            await interaction.edit_original_response(content=content)
+        else:
+            await interaction.response.send_message(content, ephemeral=True)
+
+@metrics.timed("task")
+@tracer.traced("create_ticket")
 async def create_ticket(interaction, selected_type=None, description=None):
     guild = interaction.guild
     user = interaction.user
-    cat_id = config.get(str(guild.id), {}).get('category_id')
-    category = guild.get_channel(cat_id) if cat_id else None
-    suffix = f"-{random.randint(1000,9999)}"
-    channel_name = f"ticket-{user.id}{suffix}"
-
-    overwrites = {
-        guild.default_role: discord.PermissionOverwrite(read_messages=False),
-        user: discord.PermissionOverwrite(read_messages=True, send_messages=True),
-        guild.me: discord.PermissionOverwrite(read_messages=True, send_messages=True, manage_messages=True, manage_channels=True, embed_links=True, attach_files=True, read_message_history=True, add_reactions=True)
-    }
-
-    support_role_id = config.get(str(guild.id), {}).get('support_role')
-    if support_role_id:
-        support_role = guild.get_role(support_role_id)
-        if support_role:
-            overwrites[support_role] = discord.PermissionOverwrite(read_messages=True, send_messages=True)
+    render = guild_render(guild)
+    if render.ticket_backend == 'thread':
+        await create_thread_ticket(interaction, render, selected_type, description)
+        return
+    started = time.perf_counter()
 
-    channel = await guild.create_text_channel(channel_name, category=category, overwrites=overwrites)
-    guild_config = config.get(str(guild.id), {})
-    welcome_msg = guild_config.get('welcome_message', 'thank you for reaching out!')
-    
+    channel = warm_pool.claim(guild)
+    pooled = channel is not None
+    category = None
+    if not pooled or (ticket_category_ids(guild, render) and not category_index.holds(guild.id, channel.category_id)):
+        category = await ticket_category(guild, render)
+        # with every configured category gone the ticket goes outside any category
+        if category is None and not pooled and ticket_category_ids(guild, render):
+            await reply_ephemeral(interaction, "❌ All ticket categories are full, please try again later.")
+            return
+    ticket = Ticket(0, guild.id, user.id, selected_type or "general", tickets.next_number(guild.id), "open", time.time())
+    topic = f"Ticket #{ticket.number} opened by {user} ({user.id})"
+
+    placed = None
+    try:
+        if pooled:
+            # Register first: if we crash mid-edit the channel is still a ticket, not an orphan.
+            ticket.channel_id = channel.id
+            tickets.add(ticket)
+            await storage.run(storage.add_ticket, channel.id, guild.id, user.id, ticket.type, ticket.number, ticket.opened_at)
+            options = {'name': ticket.name, 'topic': topic, 'overwrites': render.ticket_overwrites(user)}
+            if category:
+                options['category'] = category
+            try:
+                await rest.call(guild.id, f"channel:{channel.id}", channel.edit, **options)
+            except (discord.HTTPException, CircuitOpen) as e:
+                await abandon_pooled_ticket(guild, channel, e)
+                raise
+        else:
+            channel = await rest.call(guild.id, f"channels:{guild.id}", guild.create_text_channel, ticket.name, category=category, overwrites=render.ticket_overwrites(user), topic=topic)
+            ticket.channel_id = channel.id
+            tickets.add(ticket)
+            await storage.run(storage.add_ticket, channel.id, guild.id, user.id, ticket.type, ticket.number, ticket.opened_at)
+        placed = channel.id
+        ticket_opened(ticket, description)
+    finally:
+        if category:
+            category_index.placed(guild.id, category.id, placed)
+
+    await rest.call(guild.id, f"messages:{channel.id}", channel.send, embed=render.welcome_embed(user, "General", description), view=close_ticket_view)
+    warm_pool.record(pooled, started)
+    await reply_ephemeral(interaction, f"Ticket created: {channel.mention}")
+
+async def abandon_pooled_ticket(guild, channel, error):
+    # The edit that turns a pool channel into the ticket failed, so the
+    # ticket is taken back. The channel goes back to the pool when the edit
+    # never went out (circuit open) and is deleted otherwise; if that fails
+    # too it still looks like a pool channel and is adopted at startup.
+    tickets.remove(channel.id)
+    await storage.run(storage.close_ticket, channel.id, time.time())
+    if isinstance(error, CircuitOpen):
+        warm_pool.release(guild, channel)
+        return
     try:
-        color = int(guild_config.get("embed_color", "0x00ff99").replace("#", "0x"), 16)
-    except:
-        color = 0x00ff99
+        await delete_channel(channel, "Could not turn the pool channel into a ticket")
+    except (discord.HTTPException, CircuitOpen) as e:
+        print(f"Error deleting pool channel {channel.id}: {e}")
+
+def ticket_opened(ticket, description):
+    analytics.opened(ticket.guild_id, ticket.type, ticket.opened_at)
+    if description != NO_DESCRIPTION:
+        search_index.add(ticket, ticket.channel_id, ticket.owner_id, description, ticket.opened_at)
+
+THREAD_STAFF_LIMIT = 25
 
-    welcome = discord.Embed(title="Ticket Created 🎫", description=f"{user.mention}, {welcome_msg}\n**Type:** General", color=color)
-    await channel.send(embed=welcome)
-    await channel.send(f"**Issue:** {description}\n\n\n\n", view=CloseTicketView())
+def support_mention_reaches(channel, role):
+    # a role mention only adds the role's members to a private thread when the
+    # bot is allowed to mention that role
+    return role.mentionable or channel.permissions_for(channel.guild.me).mention_everyone
 
-    if not interaction.response.is_done():
-        await interaction.response.send_message(f"Ticket created: {channel.mention}", ephemeral=True)
+async def add_support_members(guild, thread, role):
+    # fallback for a role the bot can't mention: add the members it has
+    # cached, which is nobody in lean mode
+    members = [m for m in role.members if not m.bot][:THREAD_STAFF_LIMIT]
+    if not members:
+        print(f"⚠️ Support role {role.id} in {guild.id} can't be mentioned and has no cached members, ticket thread {thread.id} has no staff")
+    for member in members:
+        try:
+            await rest.call(guild.id, f"thread_members:{thread.id}", thread.add_user, member, low=True)
+        except (discord.HTTPException, CircuitOpen) as e:
+            print(f"Error adding support staff to ticket thread {thread.id}: {e}")
+            return
+
+@tracer.traced("create_thread_ticket")
+async def create_thread_ticket(interaction, render, selected_type, description):
+    # A private thread under the panel channel: no channel slot, no overwrites,
+    # and access comes from thread membership instead.
+    guild = interaction.guild
+    user = interaction.user
+    panel_id = render.settings.get('panel_channel')
+    parent = guild.get_channel(panel_id) if panel_id else interaction.channel
+    if not isinstance(parent, discord.TextChannel):
+        await reply_ephemeral(interaction, "❌ Ticket threads need a panel text channel, ask an admin to set one.")
+        return
+    ticket = Ticket(0, guild.id, user.id, selected_type or "general", tickets.next_number(guild.id), "open", time.time())
+    thread = await rest.call(guild.id, f"threads:{parent.id}", parent.create_thread, name=ticket.name, type=discord.ChannelType.private_thread, invitable=False, auto_archive_duration=10080, reason=f"Ticket #{ticket.number} opened by {user} ({user.id})")
+    ticket.channel_id = thread.id
+    tickets.add(ticket)
+    await storage.run(storage.add_ticket, thread.id, guild.id, user.id, ticket.type, ticket.number, ticket.opened_at)
+    ticket_opened(ticket, description)
+    await rest.call(guild.id, f"thread_members:{thread.id}", thread.add_user, user)
+    # mentioning the support role adds all of its members to the private
+    # thread in one message, without needing the member list
+    content = render.support_role.mention if render.support_role else None
+    await rest.call(guild.id, f"messages:{thread.id}", thread.send, content=content, embed=render.welcome_embed(user, "General", description), view=close_ticket_view, allowed_mentions=discord.AllowedMentions(roles=True))
+    await reply_ephemeral(interaction, f"Ticket created: {thread.mention}")
+    if render.support_role and not support_mention_reaches(parent, render.support_role):
+        await add_support_members(guild, thread, render.support_role)
 
 class TicketButtonView(discord.ui.View):
-    def __init__(self):
+    def __init__(self, label=None, emoji=None):
         super().__init__(timeout=None)
+        if label:
+            self.open.label = label[:80]
+        if emoji and valid_button_emoji(emoji):
+            self.open.emoji = emoji
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        await load_guild_settings(interaction.guild.id)
+        return True
 
     @discord.ui.button(label="Open Ticket", style=discord.ButtonStyle.green, emoji="🎫", custom_id="open_ticket")
+    @metrics.timed("view")
     async def open(self, interaction: discord.Interaction, button):
         modal = TicketModal("general")
         await interaction.response.send_modal(modal)
@@ -199,9 +1172,14 @@ class CloseTicketView(discord.ui.View):
     def __init__(self):
         super().__init__(timeout=None)
 
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        await load_guild_settings(interaction.guild.id)
+        return True
+
     @discord.ui.button(label="Close Ticket", style=discord.ButtonStyle.red, emoji="🔒", custom_id="close_ticket")
+    @metrics.timed("view")
     async def close(self, interaction: discord.Interaction, button):
-        if not interaction.channel.name.startswith("ticket-"):
+        if interaction.channel.id not in tickets:
             await interaction.response.send_message("Only in ticket channels.", ephemeral=True)
             return
         view = ConfirmationView(interaction.channel, interaction.user)
@@ -214,34 +1192,418 @@ class ConfirmationView(discord.ui.View):
         self.requester = requester
 
     @discord.ui.button(label="Yes, Close", style=discord.ButtonStyle.danger)
+    @metrics.timed("view")
     async def confirm(self, interaction: discord.Interaction, button):
-        if interaction.user != self.requester and not interaction.user.guild_permissions.administrator:
+        ticket = tickets.get(self.channel.id)
+        owner_id = ticket.owner_id if ticket else None
+        if interaction.user != self.requester and interaction.user.id != owner_id and not interaction.user.guild_permissions.administrator:
             await interaction.response.send_message("Only the ticket owner or admin can close.", ephemeral=True)
             return
+        if ticket and ticket.state == "closing":
+            await interaction.response.edit_message(content="🔒 Ticket is already closing...", view=None)
+            return
         await interaction.response.edit_message(content="🔒 Ticket closing...", view=None)
-        await self.channel.delete()
+        if ticket:
+            ticket.state = "closing"
+        task = asyncio.create_task(archive_and_close(self.channel, ticket, interaction.user))
+        closing_tasks.add(task)
+        task.add_done_callback(closing_tasks.discard)
 
     @discord.ui.button(label="Cancel", style=discord.ButtonStyle.grey)
+    @metrics.timed("view")
     async def cancel(self, interaction: discord.Interaction, button):
         await interaction.response.edit_message(content="Close cancelled.", view=None)
 
+TRANSCRIPT_DIR = os.getenv('TRANSCRIPT_DIR', 'transcripts')
+TRANSCRIPT_PROGRESS_EVERY = 5.0
+# closes started from the button run as their own tasks, and the event loop
+# only keeps weak references to tasks
+closing_tasks = set()
+
+@metrics.timed("task")
+async def archive_and_close(channel, ticket, closed_by, low=False):
+    # The channel is only deleted once its transcript is safely on disk. If
+    # any step fails the ticket goes back to open, so it can be closed again.
+    guild = channel.guild
+    status = None
+    try:
+        status = await rest.call(guild.id, f"messages:{channel.id}", channel.send, "📝 Saving transcript...", low=low)
+        last_progress = time.monotonic()
+
+        async def progress(count):
+            nonlocal last_progress
+            if time.monotonic() - last_progress >= TRANSCRIPT_PROGRESS_EVERY:
+                last_progress = time.monotonic()
+                await rest.call(guild.id, f"messages:{channel.id}", status.edit, content=f"📝 Saving transcript... {count} messages", low=True)
+
+        name = ticket.name if ticket else channel.name
+        try:
+            jsonl_path, html_path, count = await export_channel(channel, os.path.join(TRANSCRIPT_DIR, str(guild.id), f"{name}-{channel.id}"), f"{guild.name} • #{channel.name}", progress)
+        except Exception as e:
+            print(f"❌ Error saving transcript for {channel.id}: {e}")
+            traceback.print_exc()
+            if ticket:
+                ticket.state = "open"
+            await rest.call(guild.id, f"messages:{channel.id}", status.edit, content="❌ Could not save the transcript, the ticket was not closed. Try again later.", low=low)
+            return
+
+        log_id = config.get(str(guild.id), {}).get('transcript_channel')
+        log_channel = guild.get_channel(log_id) if log_id else None
+        if log_channel:
+            embed = discord.Embed(title=f"🗂️ Transcript • {name}", color=guild_render(guild).color)
+            embed.add_field(name="Owner", value=f"<@{ticket.owner_id}>" if ticket else "Unknown", inline=True)
+            embed.add_field(name="Closed by", value=closed_by.mention, inline=True)
+            embed.add_field(name="Messages", value=str(count), inline=True)
+            try:
+                # files are opened per attempt, a retry can't reuse a consumed upload
+                await rest.call(guild.id, f"messages:{log_channel.id}", send_transcript, log_channel, embed, html_path, jsonl_path, low=low)
+            except (discord.HTTPException, CircuitOpen) as e:
+                print(f"Error posting transcript for {channel.id}: {e}")
+        if isinstance(channel, discord.Thread):
+            # thread tickets are kept, archived and locked, instead of deleted
+            await rest.call(guild.id, f"messages:{channel.id}", status.edit, content=f"🔒 Ticket closed by {closed_by.mention}.", low=low)
+            await rest.call(guild.id, f"channel:{channel.id}", channel.edit, archived=True, locked=True, low=low)
+        else:
+            await delete_channel(channel, low=low)
+    except Exception as e:
+        print(f"❌ Error closing ticket {channel.id}: {e}")
+        traceback.print_exc()
+        if ticket:
+            ticket.state = "open"
+        who = "" if closed_by == guild.me else f"{closed_by.mention} "
+        content = f"❌ {who}Could not close the ticket, try again later."
+        try:
+            if status:
+                await rest.call(guild.id, f"messages:{channel.id}", status.edit, content=content, low=low)
+            else:
+                await rest.call(guild.id, f"messages:{channel.id}", channel.send, content, low=low)
+        except (discord.HTTPException, CircuitOpen) as e:
+            print(f"Error reporting failed close of {channel.id}: {e}")
+
+async def send_transcript(log_channel, embed, html_path, jsonl_path):
+    return await log_channel.send(embed=embed, files=[discord.File(html_path), discord.File(jsonl_path)])
+
+REAP_INTERVAL_MINUTES = int(os.getenv('REAP_INTERVAL_MINUTES', '10'))
+REAP_BATCH = 5
+REAP_PAUSE = 5.0
+
+def stale_settings(guild_id):
+    guild_config = config.get(str(guild_id), {})
+    return guild_config.get('stale_after_hours', 0), guild_config.get('stale_grace_hours', 24)
+
+def find_stale_tickets(guild, now=None):
+    now = now or time.time()
+    stale_after, _ = stale_settings(guild.id)
+    if not stale_after:
+        return []
+    return sorted((t for t in tickets.for_guild(guild.id) if t.state == "open" and now - t.last_activity > stale_after * 3600), key=lambda t: t.last_activity)
+
+async def sweep_guild(guild, force=False):
+    # Warns owners of idle tickets, then closes the ones still idle after the
+    # grace period. Closes go out in small batches to stay under delete limits.
+    now = time.time()
+    _, grace = stale_settings(guild.id)
+    to_close = []
+    warned = 0
+    for ticket in find_stale_tickets(guild, now):
+        channel = guild.get_channel_or_thread(ticket.channel_id)
+        if not channel:
+            continue
+        if SLASH_ONLY:
+            # no message events in this mode, so check the real last message
+            # of each candidate before warning or closing it
+            try:
+                fresh = await rest.call(guild.id, f"channel:{ticket.channel_id}", guild.fetch_channel, ticket.channel_id, low=True)
+            except discord.NotFound:
+                continue
+            if fresh.last_message_id:
+                ticket.touch(discord.utils.snowflake_time(fresh.last_message_id).timestamp())
+            if now - ticket.last_activity <= stale_settings(guild.id)[0] * 3600:
+                continue
+        if force or (ticket.warned_at and now - ticket.warned_at > grace * 3600):
+            to_close.append((channel, ticket))
+        elif not ticket.warned_at:
+            ticket.warned_at = now
+            warned += 1
+            try:
+                await rest.call(guild.id, f"messages:{channel.id}", channel.send, f"<@{ticket.owner_id}> ⏰ This ticket has been inactive for a while and will be closed in {grace:g}h unless someone replies.", low=True)
+            except (discord.HTTPException, CircuitOpen) as e:
+                print(f"Error warning stale ticket {channel.id}: {e}")
+    for i in range(0, len(to_close), REAP_BATCH):
+        if i:
+            await asyncio.sleep(REAP_PAUSE)
+        for channel, ticket in to_close[i:i + REAP_BATCH]:
+            ticket.state = "closing"
+        await asyncio.gather(*(archive_and_close(channel, ticket, guild.me, low=True) for channel, ticket in to_close[i:i + REAP_BATCH]), return_exceptions=True)
+    return warned, len(to_close)
+
+@tasks.loop(minutes=REAP_INTERVAL_MINUTES)
+async def reap_stale_tickets():
+    for guild in bot.guilds:
+        # guilds without open tickets are skipped before their settings load
+        if not tickets.by_guild.get(guild.id):
+            continue
+        await load_guild_settings(guild.id)
+        if not stale_settings(guild.id)[0]:
+            continue
+        try:
+            warned, closed = await sweep_guild(guild)
+            if warned or closed:
+                print(f"⏰ {guild.name}: warned {warned}, closed {closed} stale tickets")
+        except Exception as e:
+            print(f"Error sweeping stale tickets in {guild.id}: {e}")
+            traceback.print_exc()
+
+@bot.listen('on_message')
+async def track_ticket_activity(message):
+    if message.author.bot or not message.guild:
+        return
+    ticket = tickets.get(message.channel.id)
+    if ticket:
+        when = message.created_at.timestamp()
+        ticket.touch(when)
+        search_index.add(ticket, message.id, message.author.id, message.content, when)
+        if not ticket.first_response_at and message.author.id != ticket.owner_id and is_support(message.author):
+            ticket.first_response_at = when
+            analytics.responded(ticket.guild_id, ticket.opened_at, when)
+            await storage.run(storage.set_first_response, ticket.channel_id, when)
+
+def is_support(member):
+    permissions = getattr(member, 'guild_permissions', None)
+    if permissions and permissions.administrator:
+        return True
+    role_id = guild_render(member.guild).support_role_id
+    return bool(role_id) and any(role.id == role_id for role in getattr(member, 'roles', ()))
+
+@tasks.loop(seconds=ANALYTICS_FLUSH_SECONDS)
+async def flush_analytics():
+    rows = analytics.take_dirty()
+    if not rows:
+        return
+    try:
+        await storage.run(storage.save_analytics, rows)
+    except Exception as e:
+        analytics.dirty.update(guild_id for guild_id, _ in rows)
+        print(f"Error saving analytics: {e}")
+
+def analytics_summary(guild_id, days):
+    window = analytics.window(guild_id, days)
+    if not window.opened and not window.closed:
+        return f"No tickets in the last {days} days"
+    first_response, resolution = window.first_response, window.resolution
+    return (f"**Opened:** {window.opened} • **Closed:** {window.closed}\n"
+            f"**First reply:** p50 `{format_duration(first_response.quantile(0.5))}` • p90 `{format_duration(first_response.quantile(0.9))}`\n"
+            f"**Resolution:** p50 `{format_duration(resolution.quantile(0.5))}` • p90 `{format_duration(resolution.quantile(0.9))}`")
+
+@bot.hybrid_command(description="Ticket volume, first reply and resolution times")
+@app_commands.default_permissions(administrator=True)
+@app_commands.describe(days=f"How many days to cover (1-{analytics.retention_days})")
+@commands.has_permissions(administrator=True)
+async def stats(ctx, days: commands.Range[int, 1, analytics.retention_days] = 7):
+    guild = ctx.guild
+    total = analytics.total(guild.id)
+    embed = discord.Embed(title="📈 Ticket Stats", color=guild_render(guild).color)
+    embed.add_field(name=f"Last {days} days", value=analytics_summary(guild.id, days), inline=False)
+    all_time = f"**Opened:** {total.opened} • **Closed:** {total.closed} • **Open now:** {len(tickets.by_guild.get(guild.id, ()))}"
+    if total.closed:
+        all_time += f"\n**Replied to:** {total.responded / max(total.opened, 1):.0%} • **Resolution p50:** `{format_duration(total.resolution.quantile(0.5))}`"
+    embed.add_field(name="All time", value=all_time, inline=False)
+    types = analytics.guilds[guild.id].types if guild.id in analytics.guilds else {}
+    if len(types) > 1:
+        embed.add_field(name="By type", value="\n".join(f"`{name}` {count}" for name, count in sorted(types.items(), key=lambda kv: -kv[1])[:10]), inline=False)
+    if SLASH_ONLY:
+        embed.set_footer(text="First reply times need message events, which slash-only mode turns off")
+    await ctx.send(embed=embed)
+
+SEARCH_PAGE_SIZE = 5
+MAX_SEARCH_RETENTION_DAYS = 3650
+
+async def run_search(guild, query, page):
+    # anything still buffered is written first, so fresh messages show up
+    await search_index.flush()
+    started = time.perf_counter()
+    hits = await search_index.run(search_index.search, guild.id, query, SEARCH_PAGE_SIZE + 1, page * SEARCH_PAGE_SIZE)
+    return hits, time.perf_counter() - started
+
+def search_embed(guild, query, hits, page, elapsed):
+    embed = discord.Embed(title=f"🔎 {query}"[:256], color=guild_render(guild).color)
+    if not hits:
+        embed.description = "No matches." if not page else "No more matches."
+    for i, hit in enumerate(hits[:SEARCH_PAGE_SIZE]):
+        channel = guild.get_channel_or_thread(hit['channel_id'])
+        where = channel.mention if channel else f"`ticket-{hit['number'] or 0:04d}` (closed)"
+        if channel and hit['id'] != hit['channel_id']:
+            where += f" • [jump](https://discord.com/channels/{guild.id}/{hit['channel_id']}/{hit['id']})"
+        kind = "issue" if hit['id'] == hit['channel_id'] else f"<@{hit['author_id']}>"
+        embed.add_field(name=f"{page * SEARCH_PAGE_SIZE + i + 1}. Ticket #{hit['number'] or 0}",
+                        value=f"{where}\nOwner <@{hit['owner_id']}> • {kind} • <t:{int(hit['created_at'])}:d>\n{hit['snippet'][:700]}",
+                        inline=False)
+    embed.set_footer(text=f"Page {page + 1} • {elapsed * 1000:.0f}ms")
+    return embed
+
+class SearchView(discord.ui.View):
+    def __init__(self, author_id, query, page, has_next):
+        super().__init__(timeout=300)
+        self.author_id = author_id
+        self.query = query
+        self.page = page
+        self.previous.disabled = page == 0
+        self.next.disabled = not has_next
+
+    async def interaction_check(self, interaction: discord.Interaction):
+        if interaction.user.id != self.author_id:
+            await interaction.response.send_message("Run /search yourself to page through results.", ephemeral=True)
+            return False
+        return True
+
+    async def show(self, interaction, page):
+        hits, elapsed = await run_search(interaction.guild, self.query, page)
+        self.page = page
+        self.previous.disabled = page == 0
+        self.next.disabled = len(hits) <= SEARCH_PAGE_SIZE
+        await interaction.response.edit_message(embed=search_embed(interaction.guild, self.query, hits, page, elapsed), view=self)
+
+    @discord.ui.button(label="Previous", style=discord.ButtonStyle.grey, emoji="◀️")
+    @metrics.timed("view")
+    async def previous(self, interaction: discord.Interaction, button):
+        await self.show(interaction, max(0, self.page - 1))
+
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.grey, emoji="▶️")
+    @metrics.timed("view")
+    async def next(self, interaction: discord.Interaction, button):
+        await self.show(interaction, self.page + 1)
+
+@bot.hybrid_command(description="Search ticket conversations, closed tickets included")
+@app_commands.default_permissions(administrator=True)
+@app_commands.describe(query='Words to find: "quotes" for a phrase, word* for a prefix')
+@commands.has_permissions(administrator=True)
+async def search(ctx, *, query: str):
+    if ctx.interaction is None:
+        # a prefix command can't answer ephemerally, and hits quote private tickets
+        await ctx.send("❌ Use the /search slash command, its results are only shown to you.")
+        return
+    hits, elapsed = await run_search(ctx.guild, query, 0)
+    view = SearchView(ctx.author.id, query, 0, len(hits) > SEARCH_PAGE_SIZE)
+    await ctx.send(embed=search_embed(ctx.guild, query, hits, 0, elapsed), view=view, ephemeral=True)
+
+@bot.hybrid_group(description="Manage the ticket search index", fallback="stats")
+@app_commands.default_permissions(administrator=True)
+@commands.has_permissions(administrator=True)
+async def searchindex(ctx):
+    if ctx.invoked_subcommand is None:
+        count, oldest = await search_index.run(search_index.stats, ctx.guild.id)
+        days = config.get(str(ctx.guild.id), {}).get('search_retention_days', 0)
+        text = f"🔎 {count} messages indexed" + (f", oldest <t:{int(oldest)}:d>" if oldest else "")
+        text += f" • kept {days} days" if days else " • kept forever"
+        if SLASH_ONLY:
+            text += "\nSlash-only mode has no message events, so only issue descriptions are indexed."
+        await ctx.send(text)
+
+@searchindex.command(name="retention", description="Delete indexed messages older than this many days (0 keeps them forever)")
+@app_commands.describe(days=f"Days to keep (0-{MAX_SEARCH_RETENTION_DAYS})")
+@commands.has_permissions(administrator=True)
+async def searchindex_retention(ctx, days: commands.Range[int, 0, MAX_SEARCH_RETENTION_DAYS]):
+    guild_config = config.setdefault(str(ctx.guild.id), {})
+    if days:
+        guild_config['search_retention_days'] = days
+    else:
+        guild_config.pop('search_retention_days', None)
+    save_config(ctx.guild.id)
+    removed = await search_index.run(search_index.purge, ctx.guild.id, time.time() - days * 86400) if days else 0
+    await ctx.send(f"✅ Search index keeps {f'{days} days' if days else 'everything'}" + (f", removed {removed} older messages" if removed else ""))
+
+@searchindex.command(name="purge", description="Delete everything this server has in the search index")
+@app_commands.describe(confirm="Set to True to really delete it")
+@commands.has_permissions(administrator=True)
+async def searchindex_purge(ctx, confirm: bool = False):
+    if not confirm:
+        await ctx.send("⚠️ This deletes every indexed ticket message of this server. Run it again with `confirm: True`.")
+        return
+    await search_index.flush()
+    removed = await search_index.run(search_index.purge, ctx.guild.id)
+    await ctx.send(f"🗑️ Removed {removed} messages from the search index")
+
+@tasks.loop(hours=6)
+async def expire_search_index():
+    now = time.time()
+    try:
+        retained = await guilds_with_settings('search_retention_days')
+    except Exception as e:
+        print(f"Error listing search retention settings: {e}")
+        return
+    for guild_id, guild_config in retained:
+        try:
+            days = guild_config.get('search_retention_days')
+            if not days:
+                continue
+            removed = await search_index.run(search_index.purge, int(guild_id), now - float(days) * 86400)
+            if removed:
+                print(f"🔎 Expired {removed} search index entries in {guild_id}")
+        except Exception as e:
+            print(f"Error expiring search index in {guild_id}: {e}")
+
+@expire_search_index.error
+async def expire_search_index_error(error):
+    # failures are handled per guild above, so this is a bug; the loop has
+    # stopped and on_ready starts it again after the next reconnect
+    print(f"Error in search index expiry, loop stopped: {error}")
+    traceback.print_exception(type(error), error, error.__traceback__)
+
+@bot.hybrid_command(description="Preview tickets that will be auto-closed")
+@app_commands.default_permissions(administrator=True)
+@commands.has_permissions(administrator=True)
+async def stale(ctx):
+    stale_after, grace = stale_settings(ctx.guild.id)
+    if not stale_after:
+        await ctx.send("❌ Auto-close is off. Set it from the dashboard (⏰ Auto-Close).")
+        return
+    found = find_stale_tickets(ctx.guild)
+    now = time.time()
+    lines = [f"<#{t.channel_id}> • <@{t.owner_id}> • idle {(now - t.last_activity) / 3600:.1f}h{' • warned' if t.warned_at else ''}" for t in found[:20]]
+    if len(found) > 20:
+        lines.append(f"...and {len(found) - 20} more")
+    embed = discord.Embed(title=f"⏰ {len(found)} stale tickets", description="\n".join(lines) or "Nothing to close.", color=guild_render(ctx.guild).color)
+    embed.set_footer(text=f"Inactive after {stale_after:g}h • closed {grace:g}h after warning • /sweep or /sweep force")
+    await ctx.send(embed=embed)
+
+@bot.hybrid_command(description="Warn and close stale tickets now")
+@app_commands.default_permissions(administrator=True)
+@commands.has_permissions(administrator=True)
+@app_commands.describe(mode="Use 'force' to close stale tickets without a warning")
+@app_commands.choices(mode=[app_commands.Choice(name="force", value="force")])
+async def sweep(ctx, mode: str = None):
+    if not stale_settings(ctx.guild.id)[0]:
+        await ctx.send("❌ Auto-close is off. Set it from the dashboard (⏰ Auto-Close).")
+        return
+    await ctx.defer()
+    warned, closed = await sweep_guild(ctx.guild, force=mode == "force")
+    await ctx.send(f"✅ Warned {warned}, closing {closed} tickets.")
+
 DASHBOARD_CHANNEL_NAME = "ticket-bot-dashboard"
 DASHBOARD_CONFIG_KEY = "dashboard_channel_id"
+DASHBOARD_MESSAGE_KEY = "dashboard_message_id"
+DASHBOARD_TITLE = "🎛️ Ticket Bot Dashboard"
+DASHBOARD_DEBOUNCE = 1.5
+dashboard_updates = {}
+ticket_button_view = None
+close_ticket_view = None
+dashboard_view = None
 
 class BackendSettingModal(discord.ui.Modal):
     def __init__(self, setting_type, current_display):
-        titles = {'support_role': 'Set Support Role', 'category': 'Set Category', 'panel_channel': 'Set Panel Channel'}
+        titles = {'support_role': 'Set Support Role', 'category': 'Set Category', 'panel_channel': 'Set Panel Channel', 'transcript_channel': 'Set Transcript Channel'}
         super().__init__(title=titles.get(setting_type, 'Update Setting'))
         self.setting_type = setting_type
         
         # Labels with descriptions for clarity
-        labels = {'support_role': 'Role Name', 'category': 'Category Name', 'panel_channel': 'Channel Name'}
+        labels = {'support_role': 'Role Name', 'category': 'Category Name', 'panel_channel': 'Channel Name', 'transcript_channel': 'Channel Name'}
         
         # Detailed placeholders that explain what each setting does
         placeholders = {
             'support_role': 'Role that can see and manage tickets (e.g. Support)',
             'category': 'Category where ticket channels will be created (e.g. TICKETS)',
-            'panel_channel': 'Restrict !panelsetup to specific channel (e.g. support)'
+            'panel_channel': 'Restrict !panelsetup to specific channel (e.g. support)',
+            'transcript_channel': 'Channel where closed ticket transcripts are posted (e.g. ticket-logs)'
         }
         
         self.input = discord.ui.TextInput(
@@ -253,7 +1615,10 @@ class BackendSettingModal(discord.ui.Modal):
         )
         self.add_item(self.input)
 
+    @metrics.timed("modal")
+    @tracer.traced("backend_setting")
     async def on_submit(self, interaction: discord.Interaction):
+        tracer.annotate(setting=self.setting_type)
         try:
             value = self.input.value.strip()
             guild = interaction.guild
@@ -261,66 +1626,71 @@ class BackendSettingModal(discord.ui.Modal):
             
             if not value:
                 if self.setting_type == 'support_role':
-                    guild_config.pop('support_role', None)
+                    old_role = guild_config.pop('support_role', None)
                     msg = "Support role cleared!"
+                    msg += migrate_open_tickets(guild, old_role=old_role)
                 elif self.setting_type == 'category':
                     guild_config.pop('category_id', None)
                     msg = "Category cleared!"
                 elif self.setting_type == 'panel_channel':
                     guild_config.pop('panel_channel', None)
                     msg = "Panel channel restriction removed!"
-                save_config(config)
-                await update_dashboard_message(guild)
+                elif self.setting_type == 'transcript_channel':
+                    guild_config.pop('transcript_channel', None)
+                    msg = "Transcript channel cleared!"
+                save_config(guild.id)
+                schedule_dashboard_update(guild)
                 await interaction.response.send_message(f"✅ {msg}", ephemeral=True)
                 return
             
             if self.setting_type == 'support_role':
-                if value.startswith('<@&') and value.endswith('>'):
-                    try:
-                        role_id = int(value[3:-1])
-                        role = guild.get_role(role_id)
-                    except ValueError:
-                        role = None
-                else:
-                    role = discord.utils.find(lambda r: r.name.lower() == value.lower(), guild.roles)
+                role = resolver.role(guild, value)
                 
                 if role:
+                    old_role = guild_config.get('support_role')
                     guild_config['support_role'] = role.id
-                    save_config(config)
-                    await update_dashboard_message(guild)
-                    await interaction.response.send_message(f"✅ Support role set to {role.mention}!", ephemeral=True)
+                    save_config(guild.id)
+                    schedule_dashboard_update(guild)
+                    note = migrate_open_tickets(guild, old_role=old_role, new_role=role.id) if old_role != role.id else ""
+                    await interaction.response.send_message(f"✅ Support role set to {role.mention}!" + note, ephemeral=True)
                 else:
-                    await interaction.response.send_message(f"❌ Role '{value}' not found!", ephemeral=True)
+                    await interaction.response.send_message(f"❌ Role '{value}' not found!" + did_you_mean(resolver.get(guild).roles.suggest(value)), ephemeral=True)
             
             elif self.setting_type == 'category':
-                category = discord.utils.find(lambda c: isinstance(c, discord.CategoryChannel) and c.name.lower() == value.lower(), guild.channels)
+                category = resolver.category(guild, value)
                 if category:
+                    old_category = guild_config.get('category_id')
                     guild_config['category_id'] = category.id
-                    save_config(config)
-                    await update_dashboard_message(guild)
-                    await interaction.response.send_message(f"✅ Category set to **{category.name}**!", ephemeral=True)
+                    save_config(guild.id)
+                    schedule_dashboard_update(guild)
+                    note = migrate_open_tickets(guild, old_category=old_category) if old_category != category.id else ""
+                    await interaction.response.send_message(f"✅ Category set to **{category.name}**!" + note, ephemeral=True)
                 else:
-                    all_cats = [c.name for c in guild.channels if isinstance(c, discord.CategoryChannel)]
-                    await interaction.response.send_message(f"❌ Category '{value}' not found!\n**Available:** {', '.join(all_cats) if all_cats else 'None'}", ephemeral=True)
+                    await interaction.response.send_message(f"❌ Category '{value}' not found!" + did_you_mean(resolver.get(guild).categories.suggest(value)), ephemeral=True)
             
             elif self.setting_type == 'panel_channel':
-                if value.startswith('<#') and value.endswith('>'):
-                    try:
-                        channel_id = int(value[2:-1])
-                        channel = guild.get_channel(channel_id)
-                    except ValueError:
-                        channel = None
-                else:
-                    channel = discord.utils.find(lambda c: isinstance(c, discord.TextChannel) and c.name.lower() == value.lower(), guild.channels)
+                channel = resolver.text_channel(guild, value)
                 
                 if channel and isinstance(channel, discord.TextChannel):
                     guild_config['panel_channel'] = channel.id
-                    save_config(config)
-                    await update_dashboard_message(guild)
+                    save_config(guild.id)
+                    schedule_dashboard_update(guild)
                     await interaction.response.send_message(f"✅ Panel channel restricted to {channel.mention}!", ephemeral=True)
                 else:
-                    await interaction.response.send_message(f"❌ Text channel '{value}' not found!", ephemeral=True)
+                    await interaction.response.send_message(f"❌ Text channel '{value}' not found!" + did_you_mean(resolver.get(guild).text_channels.suggest(value.lstrip('#'))), ephemeral=True)
+
+            elif self.setting_type == 'transcript_channel':
+                channel = resolver.text_channel(guild, value)
+                
+                if channel:
+                    guild_config['transcript_channel'] = channel.id
+                    save_config(guild.id)
+                    schedule_dashboard_update(guild)
+                    await interaction.response.send_message(f"✅ Transcripts will be posted in {channel.mention}!", ephemeral=True)
+                else:
+                    await interaction.response.send_message(f"❌ Text channel '{value}' not found!" + did_you_mean(resolver.get(guild).text_channels.suggest(value.lstrip('#'))), ephemeral=True)
         except Exception as e:
+            metrics.failed("modal", "BackendSettingModal.on_submit")
             print(f"❌ Error in BackendSettingModal: {e}")
             traceback.print_exc()
             if not interaction.response.is_done():
@@ -353,7 +1723,10 @@ class FrontendSettingModal(discord.ui.Modal):
         )
         self.add_item(self.input)
 
+    @metrics.timed("modal")
+    @tracer.traced("frontend_setting")
     async def on_submit(self, interaction: discord.Interaction):
+        tracer.annotate(setting=self.field_key)
         try:
             value = self.input.value.strip() if self.input.value.strip() else None
             guild_config = config.setdefault(str(interaction.guild.id), {})
@@ -367,6 +1740,9 @@ class FrontendSettingModal(discord.ui.Modal):
                 except ValueError:
                     await interaction.response.send_message("❌ Invalid hex color!", ephemeral=True)
                     return
+            if self.field_key == 'button_emoji' and value and not valid_button_emoji(value):
+                await interaction.response.send_message("❌ Use a single emoji, like 🎫 or a server emoji", ephemeral=True)
+                return
             
             if value is None:
                 guild_config.pop(self.field_key, None)
@@ -375,15 +1751,58 @@ class FrontendSettingModal(discord.ui.Modal):
                 guild_config[self.field_key] = value
                 msg = f"{self.label} updated!"
             
-            save_config(config)
-            await update_dashboard_message(interaction.guild)
+            save_config(interaction.guild.id)
+            schedule_dashboard_update(interaction.guild)
+            if self.field_key in PANEL_KEYS:
+                schedule_panel_refresh(interaction.guild)
             await interaction.response.send_message(f"✅ {msg}", ephemeral=True)
         except Exception as e:
+            metrics.failed("modal", "FrontendSettingModal.on_submit")
             print(f"❌ Error in FrontendSettingModal: {e}")
             traceback.print_exc()
             if not interaction.response.is_done():
                 await interaction.response.send_message(f"❌ Error occurred!", ephemeral=True)
 
+class AutoCloseModal(discord.ui.Modal, title="Auto-Close Stale Tickets"):
+    def __init__(self, stale_after, grace):
+        super().__init__()
+        self.stale_after = discord.ui.TextInput(label="Close after hours of inactivity", default=f"{stale_after:g}" if stale_after else "", placeholder="e.g. 72 (leave empty to turn auto-close off)", required=False, max_length=6)
+        self.grace = discord.ui.TextInput(label="Hours between warning and close", default=f"{grace:g}", placeholder="e.g. 24", required=False, max_length=6)
+        self.add_item(self.stale_after)
+        self.add_item(self.grace)
+
+    @metrics.timed("modal")
+    @tracer.traced("auto_close_setting")
+    async def on_submit(self, interaction: discord.Interaction):
+        try:
+            guild_config = config.setdefault(str(interaction.guild.id), {})
+            try:
+                stale_after = float(self.stale_after.value) if self.stale_after.value.strip() else 0
+                grace = float(self.grace.value) if self.grace.value.strip() else 24
+            except ValueError:
+                await interaction.response.send_message("❌ Hours must be numbers!", ephemeral=True)
+                return
+            if stale_after < 0 or grace < 0:
+                await interaction.response.send_message("❌ Hours can't be negative!", ephemeral=True)
+                return
+            if stale_after:
+                guild_config['stale_after_hours'] = stale_after
+                guild_config['stale_grace_hours'] = grace
+                msg = f"Tickets idle for {stale_after:g}h will be warned and closed {grace:g}h later!"
+            else:
+                guild_config.pop('stale_after_hours', None)
+                guild_config.pop('stale_grace_hours', None)
+                msg = "Auto-close turned off!"
+            save_config(interaction.guild.id)
+            schedule_dashboard_update(interaction.guild)
+            await interaction.response.send_message(f"✅ {msg}", ephemeral=True)
+        except Exception as e:
+            metrics.failed("modal", "AutoCloseModal.on_submit")
+            print(f"❌ Error in AutoCloseModal: {e}")
+            traceback.print_exc()
+            if not interaction.response.is_done():
+                await interaction.response.send_message(f"❌ Error occurred!", ephemeral=True)
+
 class DashboardView(discord.ui.View):
     def __init__(self):
         super().__init__(timeout=None)
@@ -392,9 +1811,11 @@ class DashboardView(discord.ui.View):
         if not interaction.user.guild_permissions.administrator:
             await interaction.response.send_message("❌ Admin only!", ephemeral=True)
             return False
+        await load_guild_settings(interaction.guild.id)
         return True
 
     @discord.ui.button(label="Set Support Role", style=discord.ButtonStyle.primary, row=0, custom_id="dash_support_role")
+    @metrics.timed("view")
     async def support_role(self, interaction: discord.Interaction, button):
         try:
             guild_config = config.get(str(interaction.guild.id), {})
@@ -404,11 +1825,13 @@ class DashboardView(discord.ui.View):
             modal = BackendSettingModal('support_role', current)
             await interaction.response.send_modal(modal)
         except Exception as e:
+            metrics.failed("view", "DashboardView.support_role")
             print(f"Error: {e}")
             traceback.print_exc()
             await interaction.response.send_message(f"❌ Error!", ephemeral=True)
 
     @discord.ui.button(label="Set Category", style=discord.ButtonStyle.primary, row=0, custom_id="dash_category")
+    @metrics.timed("view")
     async def category(self, interaction: discord.Interaction, button):
         try:
             guild_config = config.get(str(interaction.guild.id), {})
@@ -418,11 +1841,13 @@ class DashboardView(discord.ui.View):
             modal = BackendSettingModal('category', current)
             await interaction.response.send_modal(modal)
         except Exception as e:
+            metrics.failed("view", "DashboardView.category")
             print(f"Error: {e}")
             traceback.print_exc()
             await interaction.response.send_message(f"❌ Error!", ephemeral=True)
 
     @discord.ui.button(label="Restrict Panel Channel", style=discord.ButtonStyle.primary, row=0, custom_id="dash_panel_channel")
+    @metrics.timed("view")
     async def panel_channel(self, interaction: discord.Interaction, button):
         try:
             guild_config = config.get(str(interaction.guild.id), {})
@@ -432,149 +1857,242 @@ class DashboardView(discord.ui.View):
             modal = BackendSettingModal('panel_channel', current)
             await interaction.response.send_modal(modal)
         except Exception as e:
+            metrics.failed("view", "DashboardView.panel_channel")
+            print(f"Error: {e}")
+            traceback.print_exc()
+            await interaction.response.send_message(f"❌ Error!", ephemeral=True)
+
+    @discord.ui.button(label="Transcript Channel", style=discord.ButtonStyle.primary, row=0, custom_id="dash_transcript_channel")
+    @metrics.timed("view")
+    async def transcript_channel(self, interaction: discord.Interaction, button):
+        try:
+            guild_config = config.get(str(interaction.guild.id), {})
+            chan_id = guild_config.get('transcript_channel')
+            chan = interaction.guild.get_channel(chan_id) if chan_id else None
+            current = chan.name if chan else ""
+            modal = BackendSettingModal('transcript_channel', current)
+            await interaction.response.send_modal(modal)
+        except Exception as e:
+            metrics.failed("view", "DashboardView.transcript_channel")
             print(f"Error: {e}")
             traceback.print_exc()
             await interaction.response.send_message(f"❌ Error!", ephemeral=True)
 
     @discord.ui.button(label="Panel Title", style=discord.ButtonStyle.secondary, row=1, custom_id="dash_panel_title")
+    @metrics.timed("view")
     async def panel_title(self, interaction: discord.Interaction, button):
         try:
             current = config.get(str(interaction.guild.id), {}).get("panel_title", "")
             modal = FrontendSettingModal("panel_title", current, "Panel Title")
             await interaction.response.send_modal(modal)
         except Exception as e:
+            metrics.failed("view", "DashboardView.panel_title")
             print(f"Error: {e}")
             traceback.print_exc()
             await interaction.response.send_message(f"❌ Error!", ephemeral=True)
 
     @discord.ui.button(label="Panel Description", style=discord.ButtonStyle.secondary, row=1, custom_id="dash_panel_desc")
+    @metrics.timed("view")
     async def panel_desc(self, interaction: discord.Interaction, button):
         try:
             current = config.get(str(interaction.guild.id), {}).get("panel_description", "")
             modal = FrontendSettingModal("panel_description", current, "Panel Description")
             await interaction.response.send_modal(modal)
         except Exception as e:
+            metrics.failed("view", "DashboardView.panel_desc")
             print(f"Error: {e}")
             traceback.print_exc()
             await interaction.response.send_message(f"❌ Error!", ephemeral=True)
 
     @discord.ui.button(label="Button Label", style=discord.ButtonStyle.secondary, row=1, custom_id="dash_button_label")
+    @metrics.timed("view")
     async def button_label(self, interaction: discord.Interaction, button):
         try:
             current = config.get(str(interaction.guild.id), {}).get("button_label", "")
             modal = FrontendSettingModal("button_label", current, "Button Label")
             await interaction.response.send_modal(modal)
         except Exception as e:
+            metrics.failed("view", "DashboardView.button_label")
             print(f"Error: {e}")
             traceback.print_exc()
             await interaction.response.send_message(f"❌ Error!", ephemeral=True)
 
     @discord.ui.button(label="Button Emoji", style=discord.ButtonStyle.secondary, row=2, custom_id="dash_button_emoji")
+    @metrics.timed("view")
     async def button_emoji(self, interaction: discord.Interaction, button):
         try:
             current = config.get(str(interaction.guild.id), {}).get("button_emoji", "")
             modal = FrontendSettingModal("button_emoji", current, "Button Emoji")
             await interaction.response.send_modal(modal)
         except Exception as e:
+            metrics.failed("view", "DashboardView.button_emoji")
             print(f"Error: {e}")
             traceback.print_exc()
             await interaction.response.send_message(f"❌ Error!", ephemeral=True)
 
     @discord.ui.button(label="Embed Color", style=discord.ButtonStyle.secondary, row=2, custom_id="dash_embed_color")
+    @metrics.timed("view")
     async def embed_color(self, interaction: discord.Interaction, button):
         try:
             current = config.get(str(interaction.guild.id), {}).get("embed_color", "")
             modal = FrontendSettingModal("embed_color", current, "Embed Color")
             await interaction.response.send_modal(modal)
         except Exception as e:
+            metrics.failed("view", "DashboardView.embed_color")
             print(f"Error: {e}")
             traceback.print_exc()
             await interaction.response.send_message(f"❌ Error!", ephemeral=True)
 
     @discord.ui.button(label="Welcome Message", style=discord.ButtonStyle.secondary, row=2, custom_id="dash_welcome_msg")
+    @metrics.timed("view")
     async def welcome_msg(self, interaction: discord.Interaction, button):
         try:
             current = config.get(str(interaction.guild.id), {}).get("welcome_message", "")
             modal = FrontendSettingModal("welcome_message", current, "Welcome Message")
             await interaction.response.send_modal(modal)
         except Exception as e:
+            metrics.failed("view", "DashboardView.welcome_msg")
+            print(f"Error: {e}")
+            traceback.print_exc()
+            await interaction.response.send_message(f"❌ Error!", ephemeral=True)
+
+    @discord.ui.button(label="Auto-Close", style=discord.ButtonStyle.secondary, emoji="⏰", row=3, custom_id="dash_auto_close")
+    @metrics.timed("view")
+    async def auto_close(self, interaction: discord.Interaction, button):
+        try:
+            stale_after, grace = stale_settings(interaction.guild.id)
+            await interaction.response.send_modal(AutoCloseModal(stale_after, grace))
+        except Exception as e:
+            metrics.failed("view", "DashboardView.auto_close")
             print(f"Error: {e}")
             traceback.print_exc()
             await interaction.response.send_message(f"❌ Error!", ephemeral=True)
 
     @discord.ui.button(label="Refresh Dashboard", style=discord.ButtonStyle.green, emoji="🔄", row=3, custom_id="dash_refresh")
+    @metrics.timed("view")
     async def refresh(self, interaction: discord.Interaction, button):
         try:
-            await update_dashboard_message(interaction.guild)
-            await interaction.response.send_message("🔄 Refreshed!", ephemeral=True)
+            # The button lives on the dashboard itself, so the interaction
+            # response doubles as the edit and no extra REST call is needed.
+            await interaction.response.edit_message(embed=build_dashboard_embed(interaction.guild), view=self)
+            guild_config = config.setdefault(str(interaction.guild.id), {})
+            if guild_config.get(DASHBOARD_MESSAGE_KEY) != interaction.message.id:
+                guild_config[DASHBOARD_MESSAGE_KEY] = interaction.message.id
+                save_config(interaction.guild.id)
         except Exception as e:
+            metrics.failed("view", "DashboardView.refresh")
             print(f"Error: {e}")
             traceback.print_exc()
             await interaction.response.send_message(f"❌ Error!", ephemeral=True)
 
+def build_dashboard_embed(guild: discord.Guild):
+    guild_config = config.get(str(guild.id), {})
+    support_role = None
+    support_role_id = guild_config.get('support_role')
+    if support_role_id:
+        support_role = guild.get_role(support_role_id)
+    category = None
+    cat_id = guild_config.get('category_id')
+    if cat_id:
+        category = guild.get_channel(cat_id)
+    panel_channel = None
+    chan_id = guild_config.get('panel_channel')
+    if chan_id:
+        panel_channel = guild.get_channel(chan_id)
+    log_id = guild_config.get('transcript_channel')
+    transcript_channel = guild.get_channel(log_id) if log_id else None
+    render = guild_render(guild)
+    panel_title = render.panel_title
+    panel_desc = render.panel_description
+    button_label = render.button_label
+    button_emoji = render.button_emoji
+    embed_color_str = render.embed_color
+    welcome_msg = render.welcome_message
+    embed = discord.Embed(title=DASHBOARD_TITLE, color=render.color)
+    backend_value = f"**Support Role:**\n{support_role.mention if support_role else '`Not set`'}\n\n**Category:**\n{f'`{category.name}`' if category else '`Not set`'}\n\n**Panel Channel:**\n{panel_channel.mention if panel_channel else '`Any channel`'}\n\n**Transcript Channel:**\n{transcript_channel.mention if transcript_channel else '`Not set`'}\n\n**Ticket Mode:**\n`{'Private threads' if render.ticket_backend == 'thread' else 'Text channels'}`"
+    embed.add_field(name="🔧 Backend Settings", value=backend_value, inline=False)
+    frontend_value = f"**Panel Title:**\n`{panel_title}`\n\n**Panel Description:**\n`{panel_desc}`\n\n**Button:**\n{button_emoji} `{button_label}`\n\n**Embed Color:**\n`{embed_color_str}`\n\n**Welcome Message:**\n`{welcome_msg}`"
+    embed.add_field(name="🎨 Frontend Settings", value=frontend_value, inline=False)
+    stale_after, grace = stale_settings(guild.id)
+    auto_close_value = f"Close after `{stale_after:g}h` idle, `{grace:g}h` after a warning\n**Stale now:** {len(find_stale_tickets(guild))}" if stale_after else "`Off`"
+    embed.add_field(name="⏰ Auto-Close", value=auto_close_value, inline=False)
+    embed.add_field(name="📂 Ticket Categories", value=category_summary(guild), inline=False)
+    embed.add_field(name="🔥 Warm Pool", value=warm_pool_summary(guild), inline=False)
+    embed.add_field(name="📈 Last 7 Days", value=analytics_summary(guild.id, 7), inline=False)
+    migration = migration_summary(guild)
+    if migration:
+        embed.add_field(name="🔁 Updating Open Tickets", value=migration, inline=False)
+    embed.set_footer(text="Use buttons below to configure • Changes apply instantly")
+    return embed
+
+async def find_dashboard_message(guild, dashboard_channel):
+    async for msg in dashboard_channel.history(limit=10):
+        if msg.author == guild.me and msg.embeds and len(msg.embeds) > 0 and msg.embeds[0].title == DASHBOARD_TITLE:
+            return msg
+    return None
+
+@metrics.timed("task")
+@tracer.traced("dashboard_update", root=True)
 async def update_dashboard_message(guild: discord.Guild):
     try:
         guild_config = config.get(str(guild.id), {})
-        support_role = None
-        support_role_id = guild_config.get('support_role')
-        if support_role_id:
-            support_role = guild.get_role(support_role_id)
-        category = None
-        cat_id = guild_config.get('category_id')
-        if cat_id:
-            category = guild.get_channel(cat_id)
-        panel_channel = None
-        chan_id = guild_config.get('panel_channel')
-        if chan_id:
-            panel_channel = guild.get_channel(chan_id)
-        panel_title = guild_config.get('panel_title', '📩 Support Tickets')
-        panel_desc = guild_config.get('panel_description', 'Click to open a private ticket.')
-        button_label = guild_config.get('button_label', 'Open Ticket')
-        button_emoji = guild_config.get('button_emoji', '🎫')
-        embed_color_str = guild_config.get('embed_color', '0x00ff99')
-        welcome_msg = guild_config.get('welcome_message', 'thank you for reaching out!')
-        try:
-            color = int(embed_color_str.replace("#", "0x"), 16)
-        except:
-            color = 0x00ff99
-        embed = discord.Embed(title="🎛️ Ticket Bot Dashboard", color=color)
-        backend_value = f"**Support Role:**\n{support_role.mention if support_role else '`Not set`'}\n\n**Category:**\n{f'`{category.name}`' if category else '`Not set`'}\n\n**Panel Channel:**\n{panel_channel.mention if panel_channel else '`Any channel`'}"
-        embed.add_field(name="🔧 Backend Settings", value=backend_value, inline=False)
-        frontend_value = f"**Panel Title:**\n`{panel_title}`\n\n**Panel Description:**\n`{panel_desc}`\n\n**Button:**\n{button_emoji} `{button_label}`\n\n**Embed Color:**\n`{embed_color_str}`\n\n**Welcome Message:**\n`{welcome_msg}`"
-        embed.add_field(name="🎨 Frontend Settings", value=frontend_value, inline=False)
-        embed.set_footer(text="Use buttons below to configure • Changes apply instantly")
         dashboard_channel_id = guild_config.get(DASHBOARD_CONFIG_KEY)
         dashboard_channel = guild.get_channel(dashboard_channel_id) if dashboard_channel_id else None
-        if dashboard_channel:
-            message = None
-            async for msg in dashboard_channel.history(limit=10):
-                if msg.author == guild.me and msg.embeds and len(msg.embeds) > 0 and msg.embeds[0].title == "🎛️ Ticket Bot Dashboard":
-                    message = msg
-                    break
-            if message:
-                await message.edit(embed=embed, view=DashboardView())
-            else:
-                await dashboard_channel.send(embed=embed, view=DashboardView())
+        if not dashboard_channel:
+            return
+        embed = build_dashboard_embed(guild)
+        message_id = guild_config.get(DASHBOARD_MESSAGE_KEY)
+        if message_id:
+            try:
+                await rest.call(guild.id, f"messages:{dashboard_channel.id}", dashboard_channel.get_partial_message(message_id).edit, embed=embed, view=dashboard_view, low=True)
+                return
+            except discord.NotFound:
+                pass
+        message = await rest.call(guild.id, f"messages:{dashboard_channel.id}", find_dashboard_message, guild, dashboard_channel, low=True)
+        if message:
+            await rest.call(guild.id, f"messages:{dashboard_channel.id}", message.edit, embed=embed, view=dashboard_view, low=True)
+        else:
+            message = await rest.call(guild.id, f"messages:{dashboard_channel.id}", dashboard_channel.send, embed=embed, view=dashboard_view, low=True)
+        config.setdefault(str(guild.id), {})[DASHBOARD_MESSAGE_KEY] = message.id
+        save_config(guild.id)
+    except CircuitOpen as e:
+        print(f"Skipped dashboard update: {e}")
     except Exception as e:
         print(f"Error updating dashboard: {e}")
         traceback.print_exc()
 
-@bot.command()
+async def delayed_dashboard_update(guild):
+    await asyncio.sleep(DASHBOARD_DEBOUNCE)
+    dashboard_updates.pop(guild.id, None)
+    await update_dashboard_message(guild)
+
+def schedule_dashboard_update(guild):
+    # A burst of settings changes only edits the dashboard once; the pending
+    # update reads the config when it fires, so it picks up every change.
+    task = dashboard_updates.get(guild.id)
+    if task and not task.done():
+        return
+    dashboard_updates[guild.id] = asyncio.create_task(delayed_dashboard_update(guild))
+
+@bot.hybrid_command(description="Create the admin dashboard channel")
+@app_commands.default_permissions(administrator=True)
 @commands.has_permissions(administrator=True)
 async def setupdashboard(ctx):
     try:
+        await ctx.defer()
         guild = ctx.guild
         guild_config = config.setdefault(str(guild.id), {})
         dashboard_channel = discord.utils.get(guild.text_channels, name=DASHBOARD_CHANNEL_NAME)
         if not dashboard_channel:
             overwrites = {guild.default_role: discord.PermissionOverwrite(view_channel=False), guild.me: discord.PermissionOverwrite(view_channel=True, send_messages=True, manage_messages=True), ctx.author: discord.PermissionOverwrite(view_channel=True, send_messages=True)}
-            for member in guild.members:
-                if member.guild_permissions.administrator:
-                    overwrites[member] = discord.PermissionOverwrite(view_channel=True, send_messages=True)
-            dashboard_channel = await guild.create_text_channel(name=DASHBOARD_CHANNEL_NAME, overwrites=overwrites, topic="Admin dashboard for ticket bot")
+            for role in guild.roles:
+                if role.permissions.administrator and not role.is_default():
+                    overwrites[role] = discord.PermissionOverwrite(view_channel=True, send_messages=True)
+            dashboard_channel = await rest.call(guild.id, f"channels:{guild.id}", guild.create_text_channel, name=DASHBOARD_CHANNEL_NAME, overwrites=overwrites, topic="Admin dashboard for ticket bot")
         guild_config[DASHBOARD_CONFIG_KEY] = dashboard_channel.id
-        save_config(config)
-        await dashboard_channel.purge(limit=50)
+        guild_config.pop(DASHBOARD_MESSAGE_KEY, None)
+        save_config(guild.id)
+        await rest.call(guild.id, f"messages:{dashboard_channel.id}", dashboard_channel.purge, limit=50)
         await update_dashboard_message(guild)
         await ctx.send(f"✅ Dashboard created in {dashboard_channel.mention}")
     except Exception as e:
@@ -582,4 +2100,14 @@ async def setupdashboard(ctx):
         traceback.print_exc()
         await ctx.send(f"❌ Error setting up dashboard!")
 
-bot.run(TOKEN)
\ No newline at end of file
+if __name__ == "__main__":
+    try:
+        bot.run(TOKEN)
+    finally:
+        config_writer.flush_sync()
+        rows = analytics.take_dirty()
+        if rows:
+            storage.save_analytics(rows)
+        storage.close()
+        search_index.flush_sync()
+        search_index.close()
@@ -0,0 +1,103 @@
+import discord
+
+# Ticket categories per guild, in order: the configured category followed by
+# its overflow categories. Discord allows 50 channels in a category, so the
+# channel ids in each category are tracked from the gateway events and a new
+# ticket goes into the first category with room. A per-guild cursor skips the
+# categories already known to be full, and creates still in flight count as
+# pending so concurrent opens cannot overshoot the limit.
+
+CATEGORY_LIMIT = 50
+
+
+class CategoryIndex:
+    def __init__(self, limit=CATEGORY_LIMIT):
+        self.limit = limit
+        self.members = {}
+        self.pending = {}
+        self.order = {}
+        self.position = {}
+        self.cursor = {}
+
+    def load(self, guild):
+        if guild.id in self.members:
+            return
+        members = self.members[guild.id] = {}
+        for channel in guild.channels:
+            if channel.category_id:
+                members.setdefault(channel.category_id, set()).add(channel.id)
+
+    def drop(self, guild_id):
+        for table in (self.members, self.pending, self.order, self.position, self.cursor):
+            table.pop(guild_id, None)
+
+    def set_order(self, guild_id, category_ids):
+        if self.order.get(guild_id) == category_ids:
+            return
+        self.order[guild_id] = list(category_ids)
+        self.position[guild_id] = {cid: i for i, cid in enumerate(category_ids)}
+        self.cursor[guild_id] = 0
+
+    def count(self, guild_id, category_id):
+        members = self.members.get(guild_id, {}).get(category_id, ())
+        return len(members) + self.pending.get(guild_id, {}).get(category_id, 0)
+
+    def holds(self, guild_id, category_id):
+        return category_id in self.position.get(guild_id, {})
+
+    def pick(self, guild_id):
+        # Returns the first ticket category with room and reserves a slot in
+        # it, or None when they are all full.
+        order = self.order.get(guild_id, [])
+        i = self.cursor.get(guild_id, 0)
+        while i < len(order) and self.count(guild_id, order[i]) >= self.limit:
+            i += 1
+        self.cursor[guild_id] = i
+        if i == len(order):
+            return None
+        pending = self.pending.setdefault(guild_id, {})
+        pending[order[i]] = pending.get(order[i], 0) + 1
+        return order[i]
+
+    def placed(self, guild_id, category_id, channel_id=None):
+        # Settles a reservation from pick(); without a channel id the create failed.
+        pending = self.pending.get(guild_id, {})
+        if pending.get(category_id):
+            pending[category_id] -= 1
+        if channel_id and guild_id in self.members:
+            self.members[guild_id].setdefault(category_id, set()).add(channel_id)
+        else:
+            self._freed(guild_id, category_id)
+
+    def added(self, channel):
+        members = self.members.get(channel.guild.id)
+        if members is not None and channel.category_id:
+            members.setdefault(channel.category_id, set()).add(channel.id)
+
+    def removed(self, channel, category_id=None):
+        members = self.members.get(channel.guild.id)
+        if members is None:
+            return
+        if isinstance(channel, discord.CategoryChannel):
+            members.pop(channel.id, None)
+            order = self.order.get(channel.guild.id)
+            if order and channel.id in order:
+                self.set_order(channel.guild.id, [cid for cid in order if cid != channel.id])
+            return
+        category_id = category_id or channel.category_id
+        if category_id:
+            members.get(category_id, set()).discard(channel.id)
+            self._freed(channel.guild.id, category_id)
+
+    def moved(self, before, after):
+        if before.category_id != after.category_id:
+            self.removed(before, before.category_id)
+            self.added(after)
+
+    def _freed(self, guild_id, category_id):
+        i = self.position.get(guild_id, {}).get(category_id)
+        if i is not None and i < self.cursor.get(guild_id, 0):
+            self.cursor[guild_id] = i
+
+    def utilization(self, guild_id):
+        return [(cid, self.count(guild_id, cid)) for cid in self.order.get(guild_id, [])]
@@ -0,0 +1,165 @@
+import argparse
+import asyncio
+import os
+import random
+import signal
+import subprocess
+import sys
+import time
+
+# Cluster launcher: splits the shards into groups and runs each group as its
+# own bot.py process (an AutoShardedBot, see SHARD_COUNT/SHARD_IDS in bot.py).
+# All processes share the SQLite database from storage.py. Dead workers are
+# restarted with a backoff that resets once a worker has stayed up for a while.
+#
+#   python cluster.py --shards 8 --clusters 4
+#   python cluster.py --shards 4 --clusters 2 --fake     (no Discord connection)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+STABLE_AFTER = 300
+MAX_BACKOFF = 60
+
+
+def plan(shard_count, clusters):
+    clusters = max(1, min(clusters, shard_count))
+    return [list(range(shard_count))[i::clusters] for i in range(clusters)]
+
+
+class Worker:
+    def __init__(self, cluster_id, shard_ids, shard_count, command):
+        self.cluster_id = cluster_id
+        self.shard_ids = shard_ids
+        self.shard_count = shard_count
+        self.command = command
+        self.process = None
+        self.started_at = 0.0
+        self.restarts = 0
+        self.restart_at = 0.0
+
+    def start(self):
+        env = dict(os.environ)
+        env['CLUSTER_ID'] = str(self.cluster_id)
+        env['SHARD_COUNT'] = str(self.shard_count)
+        env['SHARD_IDS'] = ','.join(map(str, self.shard_ids))
+        self.process = subprocess.Popen(self.command, env=env, cwd=HERE)
+        self.started_at = time.monotonic()
+        print(f"🚀 Cluster {self.cluster_id} started (pid {self.process.pid}, shards {self.shard_ids})")
+
+    def check(self, now):
+        if self.process is None:
+            if now >= self.restart_at:
+                self.start()
+            return
+        code = self.process.poll()
+        if code is None:
+            if self.restarts and now - self.started_at > STABLE_AFTER:
+                self.restarts = 0
+            return
+        self.process = None
+        delay = min(MAX_BACKOFF, 2 ** self.restarts)
+        self.restarts += 1
+        self.restart_at = now + delay
+        print(f"⚠️ Cluster {self.cluster_id} exited with code {code}, restarting in {delay}s")
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.send_signal(signal.SIGINT)
+
+    def wait(self, timeout):
+        if self.process is None:
+            return
+        try:
+            self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+def supervise(workers, duration=None):
+    stopping = []
+    signal.signal(signal.SIGINT, lambda *_: stopping.append(True))
+    signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+    started = time.monotonic()
+    while not stopping:
+        now = time.monotonic()
+        if duration and now - started > duration:
+            break
+        for worker in workers:
+            worker.check(now)
+        time.sleep(0.5)
+    print("🛑 Stopping cluster...")
+    for worker in workers:
+        worker.stop()
+    for worker in workers:
+        worker.wait(30)
+
+
+def shard_for(guild_id, shard_count):
+    return (guild_id >> 22) % shard_count
+
+
+async def fake_gateway(database, guilds, events, crash_rate):
+    # Stands in for bot.py: receives synthetic guild events for its own shards,
+    # writes settings through the shared store and reports changes made by the
+    # other processes, like watch_changes in bot.py.
+    from persistence import ConfigWriter
+    from storage import Storage
+
+    shard_count = int(os.environ['SHARD_COUNT'])
+    shard_ids = {int(s) for s in os.environ['SHARD_IDS'].split(',')}
+    cluster_id = os.environ['CLUSTER_ID']
+    owned = [gid for gid in guilds if shard_for(gid, shard_count) in shard_ids]
+    storage = Storage(database)
+    config = storage.load_settings(lambda gid: shard_for(gid, shard_count) in shard_ids)
+    writer = ConfigWriter(config, storage, delay=0.2)
+    seq = await storage.run(storage.last_change)
+    seen = 0
+    try:
+        for i in range(events):
+            await asyncio.sleep(random.uniform(0.01, 0.05))
+            if random.random() < crash_rate:
+                print(f"💥 Fake cluster {cluster_id} crashing")
+                os._exit(1)
+            guild_id = random.choice(owned)
+            config.setdefault(str(guild_id), {})['panel_title'] = f"cluster {cluster_id} event {i}"
+            writer.mark_dirty(guild_id)
+            changed, seq = await storage.run(storage.changes_since, seq)
+            seen += len(changed)
+        await writer.flush()
+        await asyncio.sleep(0.5)
+        changed, seq = await storage.run(storage.changes_since, seq)
+        seen += len(changed)
+        print(f"✅ Fake cluster {cluster_id}: {events} events on {len(owned)} guilds, {seen} remote changes seen")
+    finally:
+        storage.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the ticket bot as several sharded processes.")
+    parser.add_argument('--shards', type=int, default=int(os.getenv('SHARD_COUNT', '2')))
+    parser.add_argument('--clusters', type=int, default=int(os.getenv('CLUSTERS', '2')))
+    parser.add_argument('--fake', action='store_true', help="run fake gateway workers instead of bot.py")
+    parser.add_argument('--duration', type=float, default=None, help="stop after this many seconds")
+    parser.add_argument('--fake-worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--guilds', type=int, default=200)
+    parser.add_argument('--events', type=int, default=100)
+    parser.add_argument('--crash-rate', type=float, default=0.005)
+    args = parser.parse_args()
+
+    if args.fake_worker:
+        rng = random.Random(0)
+        guilds = [rng.randrange(10**17, 10**18) for _ in range(args.guilds)]
+        asyncio.run(fake_gateway(os.getenv('DATABASE_FILE', 'tickets.db'), guilds, args.events, args.crash_rate))
+        return
+
+    if args.fake:
+        command = [sys.executable, os.path.abspath(__file__), '--fake-worker', '--guilds', str(args.guilds),
+                   '--events', str(args.events), '--crash-rate', str(args.crash_rate)]
+    else:
+        command = [sys.executable, os.path.join(HERE, 'bot.py')]
+    workers = [Worker(i, shard_ids, args.shards, command) for i, shard_ids in enumerate(plan(args.shards, args.clusters))]
+    supervise(workers, args.duration)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import asyncio
+import functools
+import time
+from bisect import bisect_left
+
+# In-process metrics in the Prometheus text format. Recording a value is a
+# dict lookup and a couple of additions; everything derived from live state
+# (gauges, counters kept by other modules) is only computed when the endpoint
+# is scraped. The endpoint is a tiny HTTP server on the bot's own loop.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in labels) + "}"
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f"{name}_bucket{format_labels(labels + (('le', f'{bound:g}'),))} {cumulative}"
+        yield f"{name}_bucket{format_labels(labels + (('le', '+Inf'),))} {self.count}"
+        yield f"{name}_sum{format_labels(labels)} {self.sum}"
+        yield f"{name}_count{format_labels(labels)} {self.count}"
+
+
+class Metrics:
+    def __init__(self, prefix="ticketbot"):
+        self.prefix = prefix
+        self.meta = {}
+        self.counters = {}
+        self.histograms = {}
+        self.collectors = []
+        self.server = None
+        self.lag_task = None
+        self.loop_lag = 0.0
+
+    def describe(self, name, kind, help_text):
+        self.meta[f"{self.prefix}_{name}"] = (kind, help_text)
+
+    def inc(self, name, labels=(), value=1):
+        key = (name, labels)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, labels=(), buckets=LATENCY_BUCKETS):
+        histogram = self.histograms.get((name, labels))
+        if histogram is None:
+            histogram = self.histograms[(name, labels)] = Histogram(buckets)
+        histogram.observe(value)
+
+    def collector(self, fn):
+        # fn() yields (name, labels, value) at scrape time
+        self.collectors.append(fn)
+        return fn
+
+    def timed(self, kind, name=None):
+        # Decorator for coroutine handlers: latency histogram plus error count.
+        def decorate(func):
+            labels = (('kind', kind), ('name', name or func.__qualname__))
+
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                except Exception:
+                    self.inc("handler_errors_total", labels)
+                    raise
+                finally:
+                    self.observe("handler_seconds", time.perf_counter() - started, labels)
+            return wrapper
+        return decorate
+
+    def failed(self, kind, name):
+        # an error a handler caught and answered itself, which timed() never sees
+        self.inc("handler_errors_total", (('kind', kind), ('name', name)))
+
+    def render(self):
+        samples = {}
+        for (name, labels), value in self.counters.items():
+            samples.setdefault(name, []).append(f"{self.prefix}_{name}{format_labels(labels)} {value}")
+        for (name, labels), histogram in self.histograms.items():
+            samples.setdefault(name, []).extend(histogram.lines(f"{self.prefix}_{name}", labels))
+        for fn in self.collectors:
+            try:
+                for name, labels, value in fn():
+                    samples.setdefault(name, []).append(f"{self.prefix}_{name}{format_labels(labels)} {value}")
+            except Exception as e:
+                print(f"Error collecting metrics from {fn.__name__}: {e}")
+        out = []
+        for name in sorted(samples):
+            full = f"{self.prefix}_{name}"
+            kind, help_text = self.meta.get(full, ('untyped', ''))
+            if help_text:
+                out.append(f"# HELP {full} {help_text}")
+            out.append(f"# TYPE {full} {kind}")
+            out.extend(samples[name])
+        return "\n".join(out) + "\n"
+
+    async def _handle(self, reader, writer):
+        try:
+            request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=5)
+            path = request.split(b" ", 2)[1] if request.count(b" ") >= 2 else b""
+            if path.split(b"?")[0] == b"/metrics":
+                status, body = "200 OK", self.render().encode()
+            else:
+                status, body = "404 Not Found", b"not found\n"
+            writer.write(f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                         f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+            await writer.drain()
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _watch_lag(self, interval):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + interval
+            await asyncio.sleep(interval)
+            self.loop_lag = max(0.0, loop.time() - expected)
+            self.observe("event_loop_lag_seconds", self.loop_lag, buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0))
+
+    async def serve(self, host, port, lag_interval=1.0):
+        if self.server is None:
+            self.server = await asyncio.start_server(self._handle, host, port)
+            self.lag_task = asyncio.create_task(self._watch_lag(lag_interval))
+        return self.server
@@ -0,0 +1,124 @@
+import asyncio
+import time
+import traceback
+
+import discord
+
+from rest import CircuitOpen
+
+# Background job that brings open tickets in line with the guild's current
+# support role and ticket categories after an admin changes them. A job only
+# records what to undo (old roles to strip, old categories to move out of)
+# and a cursor; what tickets should look like is read from the settings when
+# each ticket is visited, so a second change while a job runs just widens
+# it. Tickets are visited in channel id order, a few per batch with a pause
+# in between, and the job (stored in the guild config) is saved after every
+# batch so a restart resumes at the cursor. Tickets that are already right
+# cost no REST call and no pause.
+
+CONFIG_KEY = 'ticket_migration'
+
+
+def new_job():
+    return {'remove_roles': [], 'from_categories': [], 'mention_role': None, 'cursor': 0,
+            'done': 0, 'changed': 0, 'failed': 0, 'started_at': time.time()}
+
+
+class Migrator:
+    def __init__(self, targets, apply, save, batch=5, pause=5.0):
+        # targets(guild): ids of open tickets; apply(guild, job, id): True if
+        # the ticket was changed; save(guild, job or None): persist progress.
+        self.targets = targets
+        self.apply = apply
+        self.save = save
+        self.batch = batch
+        self.pause = pause
+        self.jobs = {}
+        self.totals = {}
+        self.tasks = {}
+        self.restarted = set()
+
+    def request(self, guild, job, old_role=None, old_category=None, remove_old=False, new_role=None):
+        # Merges a settings change into the guild's job (job may be None) and
+        # starts it from the first ticket again.
+        job = job or new_job()
+        if old_role and remove_old and old_role not in job['remove_roles']:
+            job['remove_roles'].append(old_role)
+        if old_category and old_category not in job['from_categories']:
+            job['from_categories'].append(old_category)
+        if new_role:
+            job['mention_role'] = new_role
+        # the counts describe the pass that starts now
+        job['cursor'] = job['done'] = job['changed'] = job['failed'] = 0
+        task = self.tasks.get(guild.id)
+        if task and not task.done():
+            # the running batch must not move the cursor past the restart
+            self.restarted.add(guild.id)
+        self.start(guild, job)
+        return job
+
+    def start(self, guild, job):
+        self.jobs[guild.id] = job
+        self.save(guild, job)
+        task = self.tasks.get(guild.id)
+        if task is None or task.done():
+            self.tasks[guild.id] = asyncio.create_task(self._run(guild))
+
+    def cancel(self, guild):
+        task = self.tasks.pop(guild.id, None)
+        if task:
+            task.cancel()
+        self.totals.pop(guild.id, None)
+        self.restarted.discard(guild.id)
+        if self.jobs.pop(guild.id, None) is not None:
+            self.save(guild, None)
+            return True
+        return False
+
+    def progress(self, guild_id):
+        job = self.jobs.get(guild_id)
+        if job is None:
+            return None
+        return job['done'], max(self.totals.get(guild_id, 0), job['done'])
+
+    async def _run(self, guild):
+        try:
+            while True:
+                job = self.jobs.get(guild.id)
+                if job is None:
+                    return
+                remaining = [t for t in sorted(self.targets(guild)) if t > job['cursor']]
+                self.totals[guild.id] = job['done'] + len(remaining)
+                if not remaining:
+                    break
+                changed = 0
+                for channel_id in remaining[:self.batch]:
+                    failed = False
+                    try:
+                        applied = await self.apply(guild, job, channel_id)
+                    except (discord.HTTPException, CircuitOpen) as e:
+                        applied, failed = False, True
+                        print(f"Error migrating ticket {channel_id} in {guild.id}: {e}")
+                    if guild.id in self.restarted:
+                        # the new pass visits this ticket again and counts it then
+                        break
+                    job['cursor'] = channel_id
+                    job['done'] += 1
+                    job['failed'] += failed
+                    if applied:
+                        job['changed'] += 1
+                        changed += 1
+                self.restarted.discard(guild.id)
+                self.save(guild, job)
+                if changed:
+                    await asyncio.sleep(self.pause)
+                else:
+                    await asyncio.sleep(0)
+            print(f"🔁 {guild.name}: {job['done']} open tickets checked, {job['changed']} updates made ({job['failed']} failed)")
+            self.jobs.pop(guild.id, None)
+            self.totals.pop(guild.id, None)
+            self.save(guild, None)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            traceback.print_exc()
@@ -0,0 +1,146 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+# Write-behind saver for the guild config.
+# Changes only mark a guild dirty; a timer (or the dirty threshold) coalesces
+# them into one flush. Dirty guilds are encoded on the loop (they are small),
+# then the sink writes them out from an executor.
+
+
+class ConfigWriter:
+    def __init__(self, data, sink, delay=2.0, max_dirty=50):
+        self.data = data
+        self.sink = sink
+        self.delay = delay
+        self.max_dirty = max_dirty
+        self.dirty = set()
+        self.last_flush_ms = 0.0
+        self.flush_count = 0
+        self.on_flush = None
+        self._timer = None
+        self._task = None
+        self._lock = None
+
+    def mark_dirty(self, guild_id):
+        self.dirty.add(str(guild_id))
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if len(self.dirty) >= self.max_dirty:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.delay, self._start_flush)
+
+    def _start_flush(self):
+        self._timer = None
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self.flush())
+
+    def _collect(self):
+        dirty, self.dirty = self.dirty, set()
+        changed = [(gid, self.data.get(gid)) for gid in dirty]
+        return dirty, self.sink.prepare(changed)
+
+    async def flush(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self.dirty:
+                return
+            dirty, payload = self._collect()
+            started = time.perf_counter()
+            loop = asyncio.get_running_loop()
+            try:
+                await loop.run_in_executor(getattr(self.sink, 'executor', None), self.sink.write, payload)
+            except BaseException as e:
+                self.dirty |= dirty
+                if isinstance(e, Exception):
+                    print(f"❌ Failed to save config: {e}")
+                    self._timer = loop.call_later(self.delay, self._start_flush)
+                raise
+            self.last_flush_ms = (time.perf_counter() - started) * 1000
+            self.flush_count += 1
+            if self.on_flush:
+                self.on_flush(self.last_flush_ms / 1000, len(dirty))
+            if self.dirty and self._timer is None:
+                # marked while this flush ran: _start_flush skipped them then
+                self._timer = loop.call_later(0 if len(self.dirty) >= self.max_dirty else self.delay, self._start_flush)
+
+    def flush_sync(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self.dirty:
+            return
+        dirty, payload = self._collect()
+        try:
+            self.sink.write(payload)
+        except BaseException:
+            self.dirty |= dirty
+            raise
+
+
+class JsonFileSink:
+    # Keeps every guild pre-encoded so a flush never re-encodes unchanged guilds.
+    def __init__(self, path, data):
+        self.path = path
+        self.chunks = {gid: json.dumps(value, indent=4) for gid, value in data.items()}
+
+    def prepare(self, changed):
+        for gid, value in changed:
+            if value is None:
+                self.chunks.pop(gid, None)
+            else:
+                self.chunks[gid] = json.dumps(value, indent=4)
+        return list(self.chunks.items())
+
+    def write(self, parts):
+        write_atomic(self.path, render(parts))
+
+
+def load_json(path):
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            try:
+                return json.load(f)
+            except:
+                print(f"⚠️ {path} is unreadable, keeping a copy as {path}.corrupt")
+        os.replace(path, path + '.corrupt')
+    return {}
+
+
+def render(parts):
+    if not parts:
+        return "{}"
+    body = ",\n".join(f"    {json.dumps(gid)}: {chunk.replace(chr(10), chr(10) + '    ')}" for gid, chunk in parts)
+    return "{\n" + body + "\n}"
+
+
+def write_atomic(path, text):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".config-", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    if hasattr(os, "O_DIRECTORY"):
+        dir_fd = os.open(directory, os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
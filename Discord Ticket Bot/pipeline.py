@@ -0,0 +1,137 @@
+import asyncio
+import time
+import traceback
+from collections import deque
+
+# Per-guild ticket creation queue.
+# Requests are admitted (cooldown, open-ticket limit, queue capacity), queued
+# per guild and processed by a small number of workers per guild. Workers take
+# a token from the guild's bucket before each creation so a burst of clicks is
+# spread out instead of tripping Discord's channel-create rate limit.
+
+SWEEP_INTERVAL = 60.0
+# a guild's bucket and wait stats are dropped after this long without a ticket
+IDLE_RETENTION = 3600.0
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, reserve=0):
+        # reserve: tokens that must be left over, so this caller yields to others
+        self._refill()
+        if self.tokens >= 1 + reserve:
+            self.tokens -= 1
+            return 0.0
+        return (1 + reserve - self.tokens) / self.rate
+
+    def block(self, seconds):
+        # Empties the bucket so the next token is only available after seconds.
+        self._refill()
+        self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+    async def acquire(self):
+        while True:
+            wait = self.take()
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+
+class TicketPipeline:
+    def __init__(self, handler, workers=2, max_queue=100, rate=0.5, burst=5):
+        self.handler = handler
+        self.workers = workers
+        self.max_queue = max_queue
+        self.rate = rate
+        self.burst = burst
+        self.queues = {}
+        self.active = {}
+        self.buckets = {}
+        self.pending = set()
+        self.cooldowns = {}
+        self.swept = time.monotonic()
+        self.waits = {}
+
+    def admit(self, guild_id, user_id, open_count, max_open=1, cooldown=30):
+        # Returns None when the request may be queued, otherwise the reason to show the user.
+        now = time.monotonic()
+        if now - self.swept > SWEEP_INTERVAL:
+            self._sweep(now)
+        if (guild_id, user_id) in self.pending:
+            return "⏳ Your ticket is already being created, hang on!"
+        if open_count >= max_open:
+            return "❌ You already have an open ticket." if max_open == 1 else f"❌ You already have {open_count} open tickets."
+        ready_at = self.cooldowns.get((guild_id, user_id), 0)
+        if ready_at > now:
+            return f"⏳ Please wait {int(ready_at - now) + 1}s before opening another ticket."
+        queue = self.queues.get(guild_id)
+        if queue and queue.qsize() >= self.max_queue:
+            return "❌ Too many tickets are being opened right now, try again in a minute."
+        self.cooldowns[(guild_id, user_id)] = now + cooldown
+        return None
+
+    def _sweep(self, now):
+        # expired cooldowns and idle guilds' buckets and wait stats would
+        # otherwise pile up, one per user or guild ever seen
+        self.swept = now
+        self.cooldowns = {key: ready_at for key, ready_at in self.cooldowns.items() if ready_at > now}
+        for guild_id, bucket in list(self.buckets.items()):
+            if guild_id not in self.active and now - bucket.updated > IDLE_RETENTION:
+                del self.buckets[guild_id]
+                self.waits.pop(guild_id, None)
+
+    def submit(self, guild_id, user_id, *args):
+        # Returns the 1-based queue position of the new request.
+        queue = self.queues.get(guild_id)
+        if queue is None:
+            queue = self.queues[guild_id] = asyncio.Queue()
+        self.pending.add((guild_id, user_id))
+        queue.put_nowait((time.monotonic(), user_id, args))
+        if self.active.get(guild_id, 0) < self.workers:
+            self.active[guild_id] = self.active.get(guild_id, 0) + 1
+            asyncio.create_task(self._worker(guild_id, queue))
+        return queue.qsize()
+
+    async def _worker(self, guild_id, queue):
+        bucket = self.buckets.get(guild_id)
+        if bucket is None:
+            bucket = self.buckets[guild_id] = TokenBucket(self.rate, self.burst)
+        try:
+            while not queue.empty():
+                queued_at, user_id, args = queue.get_nowait()
+                try:
+                    await bucket.acquire()
+                    self.waits.setdefault(guild_id, deque(maxlen=50)).append(time.monotonic() - queued_at)
+                    await self.handler(*args)
+                except Exception as e:
+                    print(f"❌ Error creating ticket: {e}")
+                    traceback.print_exc()
+                finally:
+                    self.pending.discard((guild_id, user_id))
+                    queue.task_done()
+        finally:
+            self.active[guild_id] -= 1
+            if not self.active[guild_id]:
+                del self.active[guild_id]
+                if queue.empty():
+                    self.queues.pop(guild_id, None)
+
+    def stats(self, guild_id):
+        queue = self.queues.get(guild_id)
+        waits = self.waits.get(guild_id) or ()
+        return {
+            'depth': queue.qsize() if queue else 0,
+            'workers': self.active.get(guild_id, 0),
+            'last_wait': waits[-1] if waits else 0.0,
+            'avg_wait': sum(waits) / len(waits) if waits else 0.0,
+        }
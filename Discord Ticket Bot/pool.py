@@ -0,0 +1,119 @@
+import asyncio
+import time
+import traceback
+from collections import deque
+
+import discord
+
+from pipeline import TokenBucket
+from rest import CircuitOpen
+
+# Warm pool of hidden, pre-created ticket channels per guild. Opening a ticket
+# claims one (a single channel edit) instead of waiting on a channel create;
+# the pool is then refilled in the background at a limited rate. Pool channels
+# are recognised by name prefix and topic, so any left over after a crash are
+# adopted (or deleted) at the next startup.
+
+POOL_PREFIX = "pool-"
+POOL_TOPIC = "Reserved by the ticket bot, do not use."
+MAX_POOL_SIZE = 20
+
+
+def is_pool_channel(channel):
+    return isinstance(channel, discord.TextChannel) and channel.name.startswith(POOL_PREFIX) and channel.topic == POOL_TOPIC
+
+
+class WarmPool:
+    def __init__(self, create, delete, rate=0.1, burst=2):
+        self.create = create
+        self.delete = delete
+        self.rate = rate
+        self.burst = burst
+        self.channels = {}
+        self.sizes = {}
+        self.tasks = {}
+        self.buckets = {}
+        self.timings = {'pooled': deque(maxlen=100), 'cold': deque(maxlen=100)}
+
+    def available(self, guild_id):
+        return len(self.channels.get(guild_id, ()))
+
+    def owns(self, channel_id):
+        return any(channel_id in dq for dq in self.channels.values())
+
+    def set_size(self, guild, size):
+        self.sizes[guild.id] = max(0, min(MAX_POOL_SIZE, size))
+        self.refill(guild)
+
+    def reclaim(self, guild, size, found):
+        # Adopt pool channels left from a previous run; returns the extras to delete.
+        self.sizes[guild.id] = max(0, min(MAX_POOL_SIZE, size))
+        dq = self.channels.setdefault(guild.id, deque())
+        extras = []
+        for channel in found:
+            if len(dq) < self.sizes[guild.id] and channel.id not in dq:
+                dq.append(channel.id)
+            else:
+                extras.append(channel)
+        self.refill(guild)
+        return extras
+
+    def claim(self, guild):
+        dq = self.channels.get(guild.id)
+        channel = None
+        while dq and channel is None:
+            channel = guild.get_channel(dq.popleft())
+        if self.sizes.get(guild.id):
+            self.refill(guild)
+        return channel
+
+    def release(self, guild, channel):
+        # puts back a claimed channel that never became a ticket
+        dq = self.channels.setdefault(guild.id, deque())
+        if channel.id not in dq:
+            dq.appendleft(channel.id)
+
+    def discard(self, channel_id):
+        for dq in self.channels.values():
+            if channel_id in dq:
+                dq.remove(channel_id)
+                return
+
+    def record(self, pooled, started):
+        self.timings['pooled' if pooled else 'cold'].append(time.perf_counter() - started)
+
+    def p50(self, kind):
+        values = sorted(self.timings[kind])
+        return values[len(values) // 2] if values else None
+
+    def refill(self, guild):
+        task = self.tasks.get(guild.id)
+        if task is None or task.done():
+            self.tasks[guild.id] = asyncio.create_task(self._refill(guild))
+
+    async def _refill(self, guild):
+        bucket = self.buckets.get(guild.id)
+        if bucket is None:
+            bucket = self.buckets[guild.id] = TokenBucket(self.rate, self.burst)
+        dq = self.channels.setdefault(guild.id, deque())
+        failures = 0
+        while len(dq) > self.sizes.get(guild.id, 0):
+            channel = guild.get_channel(dq.pop())
+            if channel:
+                try:
+                    await self.delete(channel, "Warm pool shrunk")
+                except (discord.HTTPException, CircuitOpen) as e:
+                    print(f"Error deleting pool channel {channel.id}: {e}")
+        while len(dq) < self.sizes.get(guild.id, 0) and failures < 3:
+            await bucket.acquire()
+            try:
+                channel = await self.create(guild)
+            except (discord.HTTPException, CircuitOpen) as e:
+                failures += 1
+                print(f"Error creating pool channel in {guild.id}: {e}")
+                await asyncio.sleep(30 * failures)
+                continue
+            except Exception:
+                traceback.print_exc()
+                return
+            dq.append(channel.id)
@@ -0,0 +1,98 @@
+import re
+from collections import OrderedDict
+
+import discord
+
+# Per-guild settings compiled once: parsed color, resolved defaults, template
+# embeds and permission overwrites. Entries live in an LRU and are dropped
+# whenever the guild's settings are saved.
+
+DEFAULT_COLOR = 0x00ff99
+DEFAULTS = {
+    'panel_title': '📩 Support Tickets',
+    'panel_description': 'Click to open a private ticket.',
+    'button_label': 'Open Ticket',
+    'button_emoji': '🎫',
+    'embed_color': '0x00ff99',
+    'welcome_message': 'thank you for reaching out!',
+}
+
+HIDDEN = discord.PermissionOverwrite(read_messages=False)
+TICKET_USER = discord.PermissionOverwrite(read_messages=True, send_messages=True)
+TICKET_SUPPORT = discord.PermissionOverwrite(read_messages=True, send_messages=True)
+TICKET_BOT = discord.PermissionOverwrite(read_messages=True, send_messages=True, manage_messages=True, manage_channels=True, embed_links=True, attach_files=True, read_message_history=True, add_reactions=True)
+
+# One emoji as Discord accepts it on a button: a pictographic character with
+# optional variation selector, skin tone and ZWJ sequence (👍🏽, 🧑‍💻), a
+# keycap (1️⃣), a flag (🇫🇷) or a tagged subdivision flag. Without a full
+# emoji table this is a shape check, but it rejects plain text like "é".
+_PICTO = "\u00a9\u00ae\u203c\u2049\u2122\u2139\u2194-\u21aa\u231a-\u23ff\u24c2\u25aa-\u27bf\u2934\u2935\u2b05-\u2b55\u3030\u303d\u3297\u3299\U0001f000-\U0001faff"
+_MODS = "\ufe0f\U0001f3fb-\U0001f3ff"
+EMOJI = re.compile(
+    f"[{_PICTO}][{_MODS}]*(?:\u200d[{_PICTO}][{_MODS}]*)*[\U000e0020-\U000e007f]*"
+    "|[0-9#*]\ufe0f?\u20e3"
+    "|[\U0001f1e6-\U0001f1ff]{2}"
+)
+
+
+def is_emoji(value):
+    return bool(value) and EMOJI.fullmatch(value) is not None
+
+
+def parse_color(value):
+    try:
+        return int(value.replace("#", "0x"), 16)
+    except (AttributeError, TypeError, ValueError):
+        return DEFAULT_COLOR
+
+
+class GuildRender:
+    def __init__(self, guild, settings):
+        self.settings = settings
+        for key, default in DEFAULTS.items():
+            setattr(self, key, settings.get(key) or default)
+        self.color = parse_color(self.embed_color)
+        self.category_id = settings.get('category_id')
+        self.ticket_backend = settings.get('ticket_backend', 'channel')
+        self.category_ids = ([self.category_id] if self.category_id else []) + settings.get('overflow_categories', [])
+        self.support_role_id = settings.get('support_role')
+        self.support_role = guild.get_role(self.support_role_id) if self.support_role_id else None
+        self.panel_embed = discord.Embed(title=self.panel_title, description=self.panel_description, color=self.color)
+        self.welcome_prefix = f", {self.welcome_message}\n**Type:** "
+        self.base_overwrites = {guild.default_role: HIDDEN, guild.me: TICKET_BOT}
+        if self.support_role:
+            self.base_overwrites[self.support_role] = TICKET_SUPPORT
+        self.pool_overwrites = {guild.default_role: HIDDEN, guild.me: TICKET_BOT}
+        # the panel's button view, built by the bot on first use (views need a running loop)
+        self.panel_view = None
+
+    def ticket_overwrites(self, user):
+        overwrites = dict(self.base_overwrites)
+        overwrites[user] = TICKET_USER
+        return overwrites
+
+    def welcome_embed(self, user, ticket_type, description):
+        return discord.Embed(title="Ticket Created 🎫", description=f"{user.mention}{self.welcome_prefix}{ticket_type}\n\n**Issue:** {description}", color=self.color)
+
+
+class RenderCache:
+    def __init__(self, size=2048):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, guild, settings):
+        entry = self.entries.get(guild.id)
+        if entry is not None:
+            self.entries.move_to_end(guild.id)
+            self.hits += 1
+            return entry
+        self.misses += 1
+        entry = self.entries[guild.id] = GuildRender(guild, settings)
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, guild_id):
+        self.entries.pop(int(guild_id), None)
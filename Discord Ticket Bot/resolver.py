@@ -0,0 +1,232 @@
+import bisect
+import difflib
+import heapq
+import re
+
+import discord
+
+# Per-guild name indexes for roles, categories and text channels, keyed by the
+# casefolded name. Exact lookups are dict hits, prefix lookups bisect a sorted
+# key list, and "did you mean" only compares the names sharing the most rare
+# trigrams with the input, found through a trigram index built on the first
+# suggestion.
+# The indexes are built lazily and kept current from the gateway events.
+
+SUGGEST_CANDIDATES = 12
+# posting entries scored per suggestion; the rarest trigrams go first, so the
+# common ones ("cha", "han" in a guild of chan-* names) are rarely reached
+SUGGEST_BUDGET = 2000
+NUMBER = re.compile(r"\d+")
+
+
+def trigrams(key):
+    padded = f"\0{key}\0"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    def __init__(self):
+        self.names = {}
+        self.keys = []
+        self.key_of = {}
+        self.grams = None
+
+    def __len__(self):
+        return len(self.key_of)
+
+    def add(self, obj):
+        if obj.id in self.key_of:
+            self.remove(obj.id)
+        key = obj.name.casefold()
+        bucket = self.names.get(key)
+        if bucket is None:
+            bucket = self.names[key] = {}
+            bisect.insort(self.keys, key)
+            if self.grams is not None:
+                self._add_grams(key)
+        bucket[obj.id] = obj
+        self.key_of[obj.id] = key
+
+    def remove(self, obj_id):
+        key = self.key_of.pop(obj_id, None)
+        if key is None:
+            return
+        bucket = self.names[key]
+        bucket.pop(obj_id, None)
+        if not bucket:
+            del self.names[key]
+            i = bisect.bisect_left(self.keys, key)
+            if i < len(self.keys) and self.keys[i] == key:
+                del self.keys[i]
+            if self.grams is not None:
+                for gram in trigrams(key):
+                    keys = self.grams.get(gram)
+                    if keys is not None:
+                        keys.discard(key)
+                        if not keys:
+                            del self.grams[gram]
+
+    def _add_grams(self, key):
+        for gram in trigrams(key):
+            self.grams.setdefault(gram, set()).add(key)
+
+    def get(self, name):
+        bucket = self.names.get(name.strip().casefold())
+        return next(iter(bucket.values())) if bucket else None
+
+    def _range(self, prefix):
+        lo = bisect.bisect_left(self.keys, prefix)
+        hi = bisect.bisect_left(self.keys, prefix + "\U0010ffff")
+        return lo, hi
+
+    def prefix(self, text, limit=25):
+        lo, hi = self._range(text.strip().casefold())
+        results = []
+        for key in self.keys[lo:min(hi, lo + limit)]:
+            results.extend(self.names[key].values())
+        return results[:limit]
+
+    def suggest(self, text, limit=5):
+        text = text.strip().casefold()
+        if not text:
+            return []
+        found = [self.names[k] for k in self.keys[slice(*self._range(text))][:limit]]
+        if len(found) < limit:
+            for key in self._close_matches(text, limit):
+                if self.names[key] not in found:
+                    found.append(self.names[key])
+        return [next(iter(bucket.values())).name for bucket in found[:limit]]
+
+    def _close_matches(self, text, limit, cutoff=0.6):
+        # difflib's ratio, but a name keeping the input's numbers ranks first:
+        # "chn-5-a" means chan-5-*, not chan-55-a
+        numbers = set(NUMBER.findall(text))
+        matcher = difflib.SequenceMatcher()
+        matcher.set_seq2(text)
+        scored = []
+        for key in self._candidates(text):
+            matcher.set_seq1(key)
+            if matcher.real_quick_ratio() >= cutoff and matcher.quick_ratio() >= cutoff:
+                ratio = matcher.ratio()
+                if ratio >= cutoff:
+                    scored.append((len(numbers.intersection(NUMBER.findall(key))), ratio, key))
+        return [key for _, _, key in heapq.nlargest(limit, scored)]
+
+    def _candidates(self, text):
+        # the keys sharing the most trigrams with text, each weighted by its
+        # rarity; small indexes are compared in full
+        if len(self.keys) <= SUGGEST_CANDIDATES:
+            return self.keys
+        if self.grams is None:
+            self.grams = {}
+            for key in self.keys:
+                self._add_grams(key)
+        postings = sorted((self.grams[gram] for gram in trigrams(text) if gram in self.grams), key=len)
+        shared = {}
+        counted = 0
+        for keys in postings:
+            if counted and counted + len(keys) > SUGGEST_BUDGET:
+                break
+            counted += len(keys)
+            weight = 1 / len(keys)
+            for key in keys:
+                shared[key] = shared.get(key, 0) + weight
+        return heapq.nlargest(SUGGEST_CANDIDATES, shared, key=lambda key: (shared[key], key))
+
+
+def parse_mention(text, prefix):
+    text = text.strip()
+    if text.startswith(prefix) and text.endswith('>'):
+        try:
+            return int(text[len(prefix):-1])
+        except ValueError:
+            return None
+    return None
+
+
+class GuildResolver:
+    def __init__(self, guild):
+        self.roles = NameIndex()
+        self.categories = NameIndex()
+        self.text_channels = NameIndex()
+        for role in guild.roles:
+            self.roles.add(role)
+        for channel in guild.channels:
+            self.add_channel(channel)
+
+    def index_for(self, channel):
+        if isinstance(channel, discord.CategoryChannel):
+            return self.categories
+        if isinstance(channel, discord.TextChannel):
+            return self.text_channels
+        return None
+
+    def add_channel(self, channel):
+        index = self.index_for(channel)
+        if index is not None:
+            index.add(channel)
+
+    def remove_channel(self, channel):
+        index = self.index_for(channel)
+        if index is not None:
+            index.remove(channel.id)
+
+
+class Resolver:
+    def __init__(self):
+        self.guilds = {}
+
+    def get(self, guild):
+        entry = self.guilds.get(guild.id)
+        if entry is None:
+            entry = self.guilds[guild.id] = GuildResolver(guild)
+        return entry
+
+    def drop(self, guild_id):
+        self.guilds.pop(guild_id, None)
+
+    def role(self, guild, text):
+        role_id = parse_mention(text, '<@&')
+        if role_id is not None:
+            return guild.get_role(role_id)
+        return self.get(guild).roles.get(text)
+
+    def category(self, guild, text):
+        channel_id = parse_mention(text, '<#')
+        if channel_id is not None:
+            channel = guild.get_channel(channel_id)
+            return channel if isinstance(channel, discord.CategoryChannel) else None
+        return self.get(guild).categories.get(text)
+
+    def text_channel(self, guild, text):
+        channel_id = parse_mention(text, '<#')
+        if channel_id is not None:
+            channel = guild.get_channel(channel_id)
+            return channel if isinstance(channel, discord.TextChannel) else None
+        return self.get(guild).text_channels.get(text.strip().lstrip('#'))
+
+    # gateway events; guilds that were never queried are left unindexed
+
+    def role_changed(self, role):
+        entry = self.guilds.get(role.guild.id)
+        if entry:
+            entry.roles.add(role)
+
+    def role_deleted(self, role):
+        entry = self.guilds.get(role.guild.id)
+        if entry:
+            entry.roles.remove(role.id)
+
+    def channel_changed(self, channel):
+        entry = self.guilds.get(channel.guild.id)
+        if entry:
+            entry.add_channel(channel)
+
+    def channel_deleted(self, channel):
+        entry = self.guilds.get(channel.guild.id)
+        if entry:
+            entry.remove_channel(channel)
+
+
+def did_you_mean(names):
+    return f"\nDid you mean: {', '.join(f'`{n}`' for n in names)}?" if names else ""
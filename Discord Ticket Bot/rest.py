@@ -0,0 +1,170 @@
+import asyncio
+import random
+import time
+
+from pipeline import TokenBucket
+from tracing import tracer
+
+try:
+    from aiohttp import ClientError
+except ImportError:
+    ClientError = OSError
+
+# Shared wrapper for Discord REST calls. Transient failures (5xx, timeouts,
+# dropped connections) are retried with jittered exponential backoff, other
+# errors are raised straight away. Every route (call kind plus its major
+# parameter, like Discord's own buckets) has a token bucket tracking the
+# budget left; background calls keep a reserve in it and wait while
+# foreground calls are in flight in the same guild, so dashboard refreshes
+# yield to ticket creation. A guild whose calls keep failing gets its circuit
+# opened for a while and calls fail fast with CircuitOpen.
+# Calls that make something new (send*, create*) are only retried after a
+# 429: a timeout or 5xx may still have created the channel or message, and
+# discord.py already retries 5xx itself. Buckets that have refilled are
+# dropped now and then, since a fresh bucket behaves the same.
+
+TRANSIENT = (asyncio.TimeoutError, OSError, ClientError)
+CREATES = ('send', 'create')
+SWEEP_INTERVAL = 60.0
+
+
+class CircuitOpen(Exception):
+    def __init__(self, guild_id, retry_in):
+        super().__init__(f"Discord calls for guild {guild_id} are paused for {retry_in:.0f}s after repeated failures")
+        self.guild_id = guild_id
+        self.retry_in = retry_in
+
+
+def classify(error):
+    # 'rate_limited', 'transient', or None when retrying won't help
+    status = getattr(error, 'status', None)
+    if status == 429 or getattr(error, 'retry_after', None) is not None:
+        return 'rate_limited'
+    if status is not None:
+        return 'transient' if status >= 500 else None
+    if isinstance(error, TRANSIENT):
+        return 'transient'
+    return None
+
+
+def creates(fn):
+    return getattr(fn, '__name__', '').startswith(CREATES)
+
+
+class Rest:
+    def __init__(self, retries=3, base_delay=0.5, max_delay=8.0, rate=1.0, burst=5, reserve=2,
+                 failure_threshold=3, reset_after=30.0, max_yield=5.0):
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rate = rate
+        self.burst = burst
+        self.reserve = min(reserve, burst - 1)
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.max_yield = max_yield
+        self.buckets = {}
+        self.busy = {}
+        self.failures = {}
+        self.opened_until = {}
+        self.routes = {}
+        self.swept = time.monotonic()
+        self.counts = {'calls': 0, 'retries': 0, 'rate_limited': 0, 'failed': 0, 'rejected': 0, 'opened': 0}
+
+    async def call(self, guild_id, route, fn, *args, low=False, **kwargs):
+        self.counts['calls'] += 1
+        family = route.split(':', 1)[0]
+        self.routes[family] = self.routes.get(family, 0) + 1
+        with tracer.span(f"rest {family}", route=route, low=low):
+            return await self._call(guild_id, route, fn, args, kwargs, low)
+
+    async def _call(self, guild_id, route, fn, args, kwargs, low):
+        if time.monotonic() - self.swept > SWEEP_INTERVAL:
+            self._sweep()
+        bucket = self.buckets.get(route)
+        if bucket is None:
+            bucket = self.buckets[route] = TokenBucket(self.rate, self.burst)
+        if not low:
+            self.busy[guild_id] = self.busy.get(guild_id, 0) + 1
+        try:
+            attempt = 0
+            while True:
+                self._check(guild_id)
+                if low:
+                    await self._yield(guild_id)
+                await self._acquire(bucket, self.reserve if low else 0)
+                try:
+                    result = await fn(*args, **kwargs)
+                except Exception as e:
+                    kind = classify(e)
+                    if kind is None:
+                        raise
+                    if kind == 'rate_limited':
+                        self.counts['rate_limited'] += 1
+                        bucket.block(getattr(e, 'retry_after', None) or 5.0)
+                    if attempt >= self.retries or (kind == 'transient' and creates(fn)):
+                        if kind == 'transient':
+                            self._failed(guild_id)
+                        raise
+                    attempt += 1
+                    self.counts['retries'] += 1
+                    if kind == 'transient':
+                        await asyncio.sleep(self.backoff(attempt))
+                    continue
+                self.failures.pop(guild_id, None)
+                self.opened_until.pop(guild_id, None)
+                return result
+        finally:
+            if not low:
+                self.busy[guild_id] -= 1
+                if not self.busy[guild_id]:
+                    del self.busy[guild_id]
+
+    def _sweep(self):
+        # a full bucket has nobody waiting on it and no budget to remember
+        self.swept = time.monotonic()
+        for route, bucket in list(self.buckets.items()):
+            bucket._refill()
+            if bucket.tokens >= bucket.capacity:
+                del self.buckets[route]
+
+    def backoff(self, attempt):
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def remaining(self, route):
+        bucket = self.buckets.get(route)
+        if bucket is None:
+            return self.burst
+        bucket._refill()
+        return max(0, int(bucket.tokens))
+
+    def is_open(self, guild_id):
+        return self.opened_until.get(guild_id, 0) > time.monotonic()
+
+    def _check(self, guild_id):
+        # After reset_after the circuit is half-open: calls go through, and
+        # the failure count is kept so one more failure opens it again.
+        retry_in = self.opened_until.get(guild_id, 0) - time.monotonic()
+        if retry_in > 0:
+            self.counts['rejected'] += 1
+            raise CircuitOpen(guild_id, retry_in)
+
+    def _failed(self, guild_id):
+        self.counts['failed'] += 1
+        failures = self.failures[guild_id] = self.failures.get(guild_id, 0) + 1
+        if failures >= self.failure_threshold:
+            self.opened_until[guild_id] = time.monotonic() + self.reset_after
+            self.counts['opened'] += 1
+
+    async def _yield(self, guild_id):
+        deadline = time.monotonic() + self.max_yield
+        while self.busy.get(guild_id) and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+
+    async def _acquire(self, bucket, reserve):
+        while True:
+            wait = bucket.take(reserve)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
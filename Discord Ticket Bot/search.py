@@ -0,0 +1,187 @@
+import asyncio
+import re
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+from tracing import tracer
+
+# Full-text index of ticket conversations (SQLite FTS5), kept in its own
+# database file so a large index never competes with ticket and settings
+# writes. Messages are buffered on the loop and written in one transaction
+# per flush from a dedicated thread, the same write-behind scheme as
+# ConfigWriter. Rows are keyed by message id (the ticket's issue description
+# by the ticket channel id), so nothing is lost when the channel is deleted.
+# Every row also carries a "g<guild id>" token in its own column; searches
+# AND it with the query, so FTS5 only walks one guild's postings.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS search_docs (
+    id INTEGER PRIMARY KEY,
+    guild_id INTEGER NOT NULL,
+    channel_id INTEGER NOT NULL,
+    owner_id INTEGER NOT NULL,
+    number INTEGER,
+    author_id INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_search_docs_guild ON search_docs (guild_id, created_at);
+CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5(
+    body, guild, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+);
+"""
+
+PURGE_BATCH = 5000
+QUERY_TOKEN = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def fts_query(text):
+    # Every word has to match; "quoted text" is a phrase and a trailing *
+    # makes a prefix search. Everything is quoted, so FTS5 operators typed by
+    # the user are searched for literally instead of breaking the query.
+    terms = []
+    for phrase, word in QUERY_TOKEN.findall(text):
+        if phrase.strip():
+            terms.append('"' + phrase.replace('"', '""') + '"')
+        elif word:
+            prefix = word.endswith('*') and len(word) > 1
+            word = word.rstrip('*').replace('"', '""')
+            if word:
+                terms.append(f'"{word}"' + ('*' if prefix else ''))
+    return " ".join(terms)
+
+
+class SearchIndex:
+    def __init__(self, path, delay=2.0, max_pending=500):
+        self.path = path
+        self.delay = delay
+        self.max_pending = max_pending
+        self.pending = []
+        self.indexed = 0
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="search")
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._timer = None
+        self._task = None
+        self._lock = None
+
+    async def run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        with tracer.span(f"search {fn.__name__}"):
+            return await loop.run_in_executor(self.executor, fn, *args)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.conn.close()
+
+    # writes
+
+    def add(self, ticket, doc_id, author_id, text, created_at):
+        if not text or not text.strip():
+            return
+        self.pending.append((doc_id, ticket.guild_id, ticket.channel_id, ticket.owner_id, ticket.number,
+                             author_id, created_at, text))
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if len(self.pending) >= self.max_pending:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.delay, self._start_flush)
+
+    def _start_flush(self):
+        self._timer = None
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self.flush())
+
+    async def flush(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self.pending:
+                return
+            rows, self.pending = self.pending, []
+            loop = asyncio.get_running_loop()
+            try:
+                await self.run(self.write, rows)
+            except Exception as e:
+                self.pending = rows + self.pending
+                print(f"❌ Failed to write search index: {e}")
+                self._timer = loop.call_later(self.delay, self._start_flush)
+                return
+            if self.pending and self._timer is None:
+                # added while this flush ran: _start_flush skipped them then
+                self._timer = loop.call_later(0 if len(self.pending) >= self.max_pending else self.delay, self._start_flush)
+
+    def flush_sync(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        rows, self.pending = self.pending, []
+        if rows:
+            self.write(rows)
+
+    def write(self, rows):
+        # one lookup for ids already indexed, then two executemany calls, so
+        # the thread hands the GIL back and forth once per batch, not per row
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            seen = set()
+            for start in range(0, len(rows), 500):
+                ids = [row[0] for row in rows[start:start + 500]]
+                seen.update(r[0] for r in self.conn.execute(
+                    f"SELECT id FROM search_docs WHERE id IN ({','.join('?' * len(ids))})", ids))
+            fresh = []
+            for row in rows:
+                if row[0] not in seen:
+                    seen.add(row[0])
+                    fresh.append(row)
+            self.conn.executemany(
+                "INSERT INTO search_docs (id, guild_id, channel_id, owner_id, number, author_id, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", [row[:7] for row in fresh])
+            self.conn.executemany("INSERT INTO search_fts (rowid, body, guild) VALUES (?, ?, ?)",
+                                  [(row[0], row[7], f"g{row[1]}") for row in fresh])
+        self.indexed += len(fresh)
+
+    def purge(self, guild_id, before=None):
+        # Deletes the guild's rows (older than `before` when given) in small
+        # transactions, so a big purge never holds the write lock for long.
+        removed = 0
+        while True:
+            with self.conn:
+                self.conn.execute("BEGIN IMMEDIATE")
+                if before is None:
+                    ids = [r[0] for r in self.conn.execute("SELECT id FROM search_docs WHERE guild_id = ? LIMIT ?",
+                                                           (guild_id, PURGE_BATCH))]
+                else:
+                    ids = [r[0] for r in self.conn.execute("SELECT id FROM search_docs WHERE guild_id = ? AND created_at < ? LIMIT ?",
+                                                           (guild_id, before, PURGE_BATCH))]
+                if not ids:
+                    return removed
+                marks = ",".join("?" * len(ids))
+                self.conn.execute(f"DELETE FROM search_fts WHERE rowid IN ({marks})", ids)
+                self.conn.execute(f"DELETE FROM search_docs WHERE id IN ({marks})", ids)
+            removed += len(ids)
+
+    # reads
+
+    def search(self, guild_id, query, limit=5, offset=0):
+        match = fts_query(query)
+        if not match:
+            return []
+        return self.conn.execute(
+            "SELECT d.id, d.channel_id, d.owner_id, d.number, d.author_id, d.created_at, "
+            "snippet(search_fts, 0, '**', '**', '…', 16) AS snippet "
+            "FROM search_fts JOIN search_docs d ON d.id = search_fts.rowid "
+            "WHERE search_fts MATCH ? ORDER BY bm25(search_fts, 1.0, 0.0) LIMIT ? OFFSET ?",
+            (f'guild : "g{guild_id}" AND ({match})', limit, offset)).fetchall()
+
+    def stats(self, guild_id):
+        row = self.conn.execute("SELECT COUNT(*), MIN(created_at) FROM search_docs WHERE guild_id = ?", (guild_id,)).fetchone()
+        return row[0], row[1]
@@ -0,0 +1,356 @@
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from tracing import tracer
+
+# SQLite store for guild settings, tickets and posted dashboard/panel messages.
+# One connection, used only from a single worker thread; coroutines go through
+# Storage.run so no query ever blocks the event loop.
+# The file can be shared by several bot processes (cluster.py): every settings
+# write is also logged to the changes table, which the other processes poll to
+# reload that guild.
+# Guild settings are not all loaded at startup: SettingsCache reads a guild's
+# row the first time it is used and keeps recent guilds in an LRU. Handlers
+# fetch their guild through Storage.run before touching it; the reader
+# connection is only a fallback for code paths that were not warmed.
+
+CHANGE_RETENTION = 3600
+SETTINGS_MIN_IDLE = 300.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS guild_settings (
+    guild_id INTEGER PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tickets (
+    channel_id INTEGER PRIMARY KEY,
+    guild_id INTEGER NOT NULL,
+    owner_id INTEGER NOT NULL,
+    type TEXT,
+    number INTEGER,
+    state TEXT NOT NULL DEFAULT 'open',
+    opened_at REAL NOT NULL,
+    closed_at REAL,
+    first_response_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_tickets_guild ON tickets (guild_id, state);
+CREATE INDEX IF NOT EXISTS idx_tickets_owner ON tickets (guild_id, owner_id);
+CREATE TABLE IF NOT EXISTS messages (
+    message_id INTEGER PRIMARY KEY,
+    guild_id INTEGER NOT NULL,
+    channel_id INTEGER NOT NULL,
+    kind TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_messages_guild ON messages (guild_id, kind);
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id INTEGER NOT NULL,
+    origin TEXT NOT NULL,
+    at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS analytics (
+    guild_id INTEGER PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class Storage:
+    def __init__(self, path):
+        self.path = path
+        self.origin = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA busy_timeout=5000")
+        self.conn.executescript(SCHEMA)
+        self.migrate()
+        # the event loop's own connection, for single-row settings reads; in
+        # WAL mode it never waits on the writer thread
+        self.reader = sqlite3.connect(path, check_same_thread=False)
+
+    def migrate(self):
+        # columns added after the first release; CREATE TABLE IF NOT EXISTS
+        # leaves existing tables alone
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(tickets)")}
+        if 'first_response_at' not in columns:
+            self.conn.execute("ALTER TABLE tickets ADD COLUMN first_response_at REAL")
+
+    async def run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        with tracer.span(f"sqlite {fn.__name__}"):
+            return await loop.run_in_executor(self.executor, fn, *args)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.conn.close()
+        self.reader.close()
+
+    # guild settings
+
+    def load_settings(self, owns=None):
+        rows = self.conn.execute("SELECT guild_id, data FROM guild_settings")
+        return {str(guild_id): json.loads(data) for guild_id, data in rows if owns is None or owns(guild_id)}
+
+    def get_settings(self, guild_id):
+        row = self.conn.execute("SELECT data FROM guild_settings WHERE guild_id = ?", (int(guild_id),)).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def read_settings(self, guild_id, conn=None):
+        # None for no row; the loop's fallback passes the reader connection
+        row = (conn or self.conn).execute("SELECT data FROM guild_settings WHERE guild_id = ?", (int(guild_id),)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def settings_with(self, keys):
+        # guilds whose settings set any of keys, without loading the others
+        where = " OR ".join("json_extract(data, ?) IS NOT NULL" for _ in keys)
+        rows = self.conn.execute(f"SELECT guild_id, data FROM guild_settings WHERE {where}", [f'$."{key}"' for key in keys])
+        return [(str(guild_id), json.loads(data)) for guild_id, data in rows]
+
+    # ConfigWriter sink: only the changed guilds are written, one row each
+    def prepare(self, changed):
+        return [(int(gid), json.dumps(value) if value is not None else None) for gid, value in changed]
+
+    def write(self, rows):
+        now = time.time()
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            for guild_id, data in rows:
+                if data is None:
+                    self.conn.execute("DELETE FROM guild_settings WHERE guild_id = ?", (guild_id,))
+                else:
+                    self.conn.execute(
+                        "INSERT INTO guild_settings (guild_id, data, updated_at) VALUES (?, ?, ?) "
+                        "ON CONFLICT(guild_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+                        (guild_id, data, now))
+                self.conn.execute("INSERT INTO changes (guild_id, origin, at) VALUES (?, ?, ?)", (guild_id, self.origin, now))
+            self.conn.execute("DELETE FROM changes WHERE at < ?", (now - CHANGE_RETENTION,))
+
+    def last_change(self):
+        return self.conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+
+    def changes_since(self, seq):
+        # guild ids changed by other processes after seq, and the new high-water mark
+        rows = self.conn.execute("SELECT seq, guild_id, origin FROM changes WHERE seq > ? ORDER BY seq", (seq,)).fetchall()
+        if not rows:
+            return set(), seq
+        return {r['guild_id'] for r in rows if r['origin'] != self.origin}, rows[-1]['seq']
+
+    # tickets
+
+    def add_ticket(self, channel_id, guild_id, owner_id, ticket_type, number, opened_at):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO tickets (channel_id, guild_id, owner_id, type, number, state, opened_at) "
+            "VALUES (?, ?, ?, ?, ?, 'open', ?)",
+            (channel_id, guild_id, owner_id, ticket_type, number, opened_at))
+
+    def close_ticket(self, channel_id, closed_at):
+        self.conn.execute("UPDATE tickets SET state = 'closed', closed_at = ? WHERE channel_id = ? AND state != 'closed'",
+                          (closed_at, channel_id))
+
+    def set_first_response(self, channel_id, at):
+        self.conn.execute("UPDATE tickets SET first_response_at = ? WHERE channel_id = ? AND first_response_at IS NULL",
+                          (at, channel_id))
+
+    def open_tickets(self, guild_id=None):
+        if guild_id is None:
+            return self.conn.execute("SELECT * FROM tickets WHERE state != 'closed'").fetchall()
+        return self.conn.execute("SELECT * FROM tickets WHERE guild_id = ? AND state != 'closed'", (guild_id,)).fetchall()
+
+    def ticket_numbers(self):
+        rows = self.conn.execute("SELECT guild_id, MAX(number) FROM tickets GROUP BY guild_id")
+        return {guild_id: number or 0 for guild_id, number in rows}
+
+    def add_tickets(self, tickets):
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            for t in tickets:
+                self.add_ticket(t.channel_id, t.guild_id, t.owner_id, t.type, t.number, t.opened_at)
+
+    def close_tickets(self, channel_ids, closed_at):
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            for channel_id in channel_ids:
+                self.close_ticket(channel_id, closed_at)
+
+    def tickets_for_owner(self, guild_id, owner_id):
+        return self.conn.execute("SELECT * FROM tickets WHERE guild_id = ? AND owner_id = ? ORDER BY opened_at DESC",
+                                 (guild_id, owner_id)).fetchall()
+
+    # analytics aggregates, one JSON document per guild
+
+    def load_analytics(self, owns=None):
+        rows = self.conn.execute("SELECT guild_id, data FROM analytics")
+        return [(guild_id, json.loads(data)) for guild_id, data in rows if owns is None or owns(guild_id)]
+
+    def save_analytics(self, rows):
+        now = time.time()
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            self.conn.executemany(
+                "INSERT INTO analytics (guild_id, data, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(guild_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+                [(guild_id, json.dumps(data), now) for guild_id, data in rows])
+
+    # dashboard / panel messages
+
+    def set_message(self, guild_id, channel_id, message_id, kind):
+        self.conn.execute("INSERT OR REPLACE INTO messages (message_id, guild_id, channel_id, kind) VALUES (?, ?, ?, ?)",
+                          (message_id, guild_id, channel_id, kind))
+
+    def get_messages(self, guild_id, kind):
+        return self.conn.execute("SELECT message_id, channel_id FROM messages WHERE guild_id = ? AND kind = ?",
+                                 (guild_id, kind)).fetchall()
+
+    def delete_message(self, message_id):
+        self.conn.execute("DELETE FROM messages WHERE message_id = ?", (message_id,))
+
+    # migration
+
+    def get_meta(self, key):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def import_config(self, data):
+        self.write(self.prepare(list(data.items())))
+        self.set_meta('imported_config_json', str(time.time()))
+        return len(data)
+
+
+class SettingsCache:
+    # Dict-like view of guild settings keyed by string guild id, loaded on
+    # first access. A guild is only evicted once it has been idle for
+    # min_idle seconds and has no unsaved changes (pinned), so a handler that
+    # holds a guild's dict across an await never edits an evicted copy. A
+    # guild without settings is cached as None, which is also how a removed
+    # guild reaches the ConfigWriter.
+    # There is no iteration: only resident guilds could be listed. Jobs that
+    # need every guild with some setting use with_settings instead.
+    def __init__(self, storage, size=10000, min_idle=SETTINGS_MIN_IDLE):
+        self.storage = storage
+        self.size = size
+        self.min_idle = min_idle
+        self.pinned = lambda guild_id: False
+        self.entries = OrderedDict()
+        self.used = {}
+        self.loads = 0
+        self.blocking_loads = 0
+
+    def _add(self, guild_id, settings):
+        self.loads += 1
+        self.entries[guild_id] = settings
+        self.used[guild_id] = time.monotonic()
+        self._evict()
+
+    def _entry(self, guild_id):
+        if guild_id in self.entries:
+            self.entries.move_to_end(guild_id)
+        else:
+            self.blocking_loads += 1
+            self._add(guild_id, self.storage.read_settings(guild_id, self.storage.reader))
+        self.used[guild_id] = time.monotonic()
+        return self.entries[guild_id]
+
+    def resident(self, guild_id):
+        return guild_id in self.entries
+
+    async def fetch(self, guild_id):
+        # load a guild through the storage thread so the handler that follows
+        # finds it resident
+        if guild_id in self.entries:
+            self.entries.move_to_end(guild_id)
+            self.used[guild_id] = time.monotonic()
+            return
+        settings = await self.storage.run(self.storage.read_settings, guild_id)
+        if guild_id not in self.entries:
+            self._add(guild_id, settings)
+
+    async def with_settings(self, *keys):
+        # (guild id, settings) for every guild that sets any of keys; stored
+        # guilds are made resident, and resident copies (which may hold
+        # unsaved changes) win over the stored rows
+        for guild_id, settings in await self.storage.run(self.storage.settings_with, keys):
+            if guild_id not in self.entries:
+                self._add(guild_id, settings)
+        return [(guild_id, settings) for guild_id, settings in list(self.entries.items())
+                if settings and any(key in settings for key in keys)]
+
+    def _evict(self):
+        idle_since = time.monotonic() - self.min_idle
+        while len(self.entries) > self.size:
+            guild_id = next(iter(self.entries))
+            if self.used.get(guild_id, 0) > idle_since or self.pinned(guild_id):
+                return
+            del self.entries[guild_id]
+            self.used.pop(guild_id, None)
+
+    def get(self, guild_id, default=None):
+        value = self._entry(guild_id)
+        return default if value is None else value
+
+    def __getitem__(self, guild_id):
+        value = self._entry(guild_id)
+        if value is None:
+            raise KeyError(guild_id)
+        return value
+
+    def __contains__(self, guild_id):
+        return self._entry(guild_id) is not None
+
+    def __setitem__(self, guild_id, value):
+        self._entry(guild_id)
+        self.entries[guild_id] = value
+
+    def setdefault(self, guild_id, default=None):
+        value = self._entry(guild_id)
+        if value is None:
+            value = self.entries[guild_id] = default
+        return value
+
+    def pop(self, guild_id, *default):
+        value = self._entry(guild_id)
+        self.entries[guild_id] = None
+        if value is None:
+            if default:
+                return default[0]
+            raise KeyError(guild_id)
+        return value
+
+    def __len__(self):
+        return sum(1 for value in self.entries.values() if value is not None)
+
+
+def import_config_json(json_path, db_path):
+    with open(json_path, 'r') as f:
+        data = json.load(f)
+    storage = Storage(db_path)
+    try:
+        return storage.import_config(data)
+    finally:
+        storage.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python storage.py config.json tickets.db")
+        sys.exit(1)
+    count = import_config_json(sys.argv[1], sys.argv[2])
+    print(f"✅ Imported {count} guilds into {sys.argv[2]}")
@@ -0,0 +1,125 @@
+import re
+import time
+from dataclasses import dataclass
+
+# In-memory index of open tickets keyed by channel id, backed by the tickets
+# table in storage.py. Ticket numbers are handed out per guild from a counter,
+# so two tickets opened at the same moment can never get the same name.
+
+DISCORD_EPOCH = 1420070400000
+LEGACY_NAME = re.compile(r"^ticket-(\d{15,20})-\d{4}$")
+
+
+@dataclass
+class Ticket:
+    channel_id: int
+    guild_id: int
+    owner_id: int
+    type: str = "general"
+    number: int = 0
+    state: str = "open"
+    opened_at: float = 0.0
+    last_activity: float = 0.0
+    warned_at: float = 0.0
+    first_response_at: float = 0.0
+
+    def __post_init__(self):
+        if not self.last_activity:
+            self.last_activity = self.opened_at
+
+    def touch(self, when):
+        if when > self.last_activity:
+            self.last_activity = when
+            self.warned_at = 0.0
+
+    @property
+    def name(self):
+        return f"ticket-{self.number:04d}"
+
+
+class TicketRegistry:
+    def __init__(self):
+        self.tickets = {}
+        self.counters = {}
+        self.by_owner = {}
+        self.by_guild = {}
+        self.loaded = False
+
+    def get(self, channel_id):
+        return self.tickets.get(channel_id)
+
+    def __contains__(self, channel_id):
+        return channel_id in self.tickets
+
+    def __len__(self):
+        return len(self.tickets)
+
+    def next_number(self, guild_id):
+        number = self.counters.get(guild_id, 0) + 1
+        self.counters[guild_id] = number
+        return number
+
+    def add(self, ticket):
+        self.tickets[ticket.channel_id] = ticket
+        self.by_owner.setdefault((ticket.guild_id, ticket.owner_id), set()).add(ticket.channel_id)
+        self.by_guild.setdefault(ticket.guild_id, set()).add(ticket.channel_id)
+        if ticket.number > self.counters.get(ticket.guild_id, 0):
+            self.counters[ticket.guild_id] = ticket.number
+
+    def remove(self, channel_id):
+        ticket = self.tickets.pop(channel_id, None)
+        if ticket:
+            owned = self.by_owner.get((ticket.guild_id, ticket.owner_id))
+            if owned:
+                owned.discard(channel_id)
+                if not owned:
+                    del self.by_owner[(ticket.guild_id, ticket.owner_id)]
+            in_guild = self.by_guild.get(ticket.guild_id)
+            if in_guild:
+                in_guild.discard(channel_id)
+                if not in_guild:
+                    del self.by_guild[ticket.guild_id]
+        return ticket
+
+    def open_for(self, guild_id, owner_id):
+        return [self.tickets[c] for c in self.by_owner.get((guild_id, owner_id), ())]
+
+    def for_guild(self, guild_id):
+        return [self.tickets[c] for c in self.by_guild.get(guild_id, ())]
+
+    def load(self, rows, numbers):
+        # rows: open tickets from storage, numbers: {guild_id: highest number ever used}
+        for guild_id, number in numbers.items():
+            self.counters[guild_id] = max(self.counters.get(guild_id, 0), number)
+        for row in rows:
+            self.add(Ticket(row['channel_id'], row['guild_id'], row['owner_id'], row['type'] or "general",
+                            row['number'] or 0, row['state'], row['opened_at'],
+                            first_response_at=row['first_response_at'] or 0.0))
+        self.loaded = True
+
+    def reconcile(self, guild):
+        # One pass over the guild's channels and active threads: adopt ticket
+        # channels created before the registry existed and forget tickets
+        # whose channel is gone (or whose thread was archived).
+        adopted = []
+        seen = set()
+        for channel in [*guild.channels, *guild.threads]:
+            ticket = self.tickets.get(channel.id)
+            if ticket is None:
+                match = LEGACY_NAME.match(channel.name)
+                if not match:
+                    continue
+                created = channel.created_at.timestamp() if channel.created_at else time.time()
+                ticket = Ticket(channel.id, guild.id, int(match.group(1)), "general",
+                                self.next_number(guild.id), "open", created)
+                self.add(ticket)
+                adopted.append(ticket)
+            seen.add(channel.id)
+            # last activity comes from the cached last message id, no history fetch
+            last_message_id = getattr(channel, 'last_message_id', None)
+            if last_message_id:
+                ticket.touch(((last_message_id >> 22) + DISCORD_EPOCH) / 1000)
+        missing = [t for t in self.for_guild(guild.id) if t.channel_id not in seen]
+        for ticket in missing:
+            self.remove(ticket.channel_id)
+        return adopted, missing
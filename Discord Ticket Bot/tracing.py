@@ -0,0 +1,215 @@
+import contextvars
+import functools
+import itertools
+import json
+import random
+import time
+from collections import deque
+
+# Sampled span tracing. A trace follows one interaction (or one dashboard
+# update) through its awaits; the current trace lives in a context variable,
+# so the REST wrapper and storage add their spans without being passed
+# anything. Work handed to another task (the ticket queue) carries the trace
+# along and the trace only ends once that work is done too. Finished traces
+# go into a ring buffer and can be dumped in the Chrome trace-event format
+# (chrome://tracing, Perfetto). Unsampled work costs one random() call.
+
+# None: no trace decided yet; UNSAMPLED: this work was not sampled, and
+# nothing nested in it should start a trace of its own.
+UNSAMPLED = False
+_current = contextvars.ContextVar('trace', default=None)
+
+
+class Trace:
+    __slots__ = ('id', 'name', 'guild_id', 'start', 'end', 'spans', 'args', 'refs', 'handed_off')
+
+    def __init__(self, trace_id, name, guild_id=None):
+        self.id = trace_id
+        self.name = name
+        self.guild_id = guild_id
+        self.start = time.perf_counter()
+        self.end = None
+        self.spans = []
+        self.args = {}
+        self.refs = 1
+        self.handed_off = None
+
+    @property
+    def duration(self):
+        return (self.end or time.perf_counter()) - self.start
+
+
+class Span:
+    __slots__ = ('trace', 'name', 'args', 'start')
+
+    def __init__(self, trace, name, args):
+        self.trace = trace
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        args = self.args
+        if exc_type is not None:
+            args = dict(args or (), error=exc_type.__name__)
+        self.trace.spans.append((self.name, self.start, time.perf_counter(), args))
+        return False
+
+
+class NoSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NO_SPAN = NoSpan()
+
+
+def guild_id_of(args):
+    # interactions, contexts and channels have .guild, guilds have .me
+    for arg in args:
+        guild = getattr(arg, 'guild', None)
+        if guild is not None and hasattr(guild, 'id'):
+            return guild.id
+        if hasattr(arg, 'me') and hasattr(arg, 'id'):
+            return arg.id
+    return None
+
+
+class Tracer:
+    def __init__(self, rate=0.1, size=500):
+        self.rate = rate
+        self.traces = deque(maxlen=size)
+        self.ids = itertools.count(1)
+
+    def current(self):
+        trace = _current.get()
+        return trace if trace and trace.end is None else None
+
+    def span(self, name, **args):
+        trace = _current.get()
+        if not trace or trace.end is not None:
+            return NO_SPAN
+        return Span(trace, name, args or None)
+
+    def annotate(self, **args):
+        trace = self.current()
+        if trace is not None:
+            trace.args.update(args)
+
+    def handoff(self):
+        # Call before passing work to another task; that task calls resume().
+        if _current.get() is UNSAMPLED:
+            return UNSAMPLED
+        trace = self.current()
+        if trace is not None:
+            trace.refs += 1
+            trace.handed_off = time.perf_counter()
+        return trace
+
+    async def resume(self, trace, coro):
+        if trace is None:
+            return await coro
+        if trace is UNSAMPLED:
+            token = _current.set(UNSAMPLED)
+            try:
+                return await coro
+            finally:
+                _current.reset(token)
+        if trace.handed_off is not None:
+            trace.spans.append(("queued", trace.handed_off, time.perf_counter(), None))
+        token = _current.set(trace)
+        try:
+            return await coro
+        finally:
+            _current.reset(token)
+            self._release(trace)
+
+    def traced(self, name, root=False):
+        # Nested calls become spans of the running trace; top-level calls
+        # (or root=True) start a new trace when sampled.
+        def decorate(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                if not root and _current.get() is UNSAMPLED:
+                    return await func(*args, **kwargs)
+                trace = self.current()
+                if trace is not None and not root:
+                    with Span(trace, name, None):
+                        return await func(*args, **kwargs)
+                if self.rate <= 0 or random.random() >= self.rate:
+                    token = _current.set(UNSAMPLED)
+                    try:
+                        return await func(*args, **kwargs)
+                    finally:
+                        _current.reset(token)
+                trace = Trace(next(self.ids), name, guild_id_of(args))
+                for arg in args:
+                    if hasattr(arg, 'response') and hasattr(arg, 'created_at'):
+                        # how long the interaction took to reach this handler
+                        trace.args['gateway_delay_ms'] = round((time.time() - arg.created_at.timestamp()) * 1000, 1)
+                        break
+                token = _current.set(trace)
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    _current.reset(token)
+                    self._release(trace)
+            return wrapper
+        return decorate
+
+    def _release(self, trace):
+        trace.refs -= 1
+        if trace.refs == 0:
+            trace.end = time.perf_counter()
+            self.traces.append(trace)
+
+    def finished(self, guild_id=None):
+        return [t for t in self.traces if guild_id is None or t.guild_id == guild_id]
+
+    def slowest(self, n=10, guild_id=None):
+        return sorted(self.finished(guild_id), key=lambda t: t.end - t.start, reverse=True)[:n]
+
+    def chrome_trace(self, guild_id=None):
+        events = []
+        for trace in self.finished(guild_id):
+            common = {'pid': 1, 'tid': trace.id}
+            events.append({'name': 'thread_name', 'ph': 'M', 'args': {'name': f"{trace.name} #{trace.id}"}, **common})
+            events.append({'name': trace.name, 'cat': 'trace', 'ph': 'X', 'ts': trace.start * 1e6,
+                           'dur': (trace.end - trace.start) * 1e6, 'args': dict(trace.args, guild_id=str(trace.guild_id)), **common})
+            for name, start, end, args in trace.spans:
+                event = {'name': name, 'cat': 'span', 'ph': 'X', 'ts': start * 1e6, 'dur': (end - start) * 1e6, **common}
+                if args:
+                    event['args'] = args
+                events.append(event)
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def dump(self, path, guild_id=None):
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace(guild_id), f)
+        return path
+
+
+def summarize(trace, top=3):
+    # "1234ms open_ticket: rest channels 800ms, other 300ms, ..."
+    # Only leaf spans count, so an outer span doesn't hide what it waited on;
+    # "other" is the time not covered by any span (interaction responses, CPU).
+    spans = sorted(trace.spans, key=lambda s: s[1])
+    totals = {}
+    for i, (name, start, end, _) in enumerate(spans):
+        if i + 1 < len(spans) and spans[i + 1][1] < end:
+            continue
+        totals[name] = totals.get(name, 0.0) + (end - start)
+    other = trace.duration - sum(totals.values())
+    if other > 0.001:
+        totals['other'] = other
+    parts = ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in sorted(totals.items(), key=lambda kv: -kv[1])[:top])
+    return f"{trace.duration * 1000:.0f}ms {trace.name}" + (f": {parts}" if parts else "")
+
+
+tracer = Tracer()
@@ -0,0 +1,133 @@
+import asyncio
+import gzip
+import html
+import json
+import os
+import time
+
+import discord
+
+# Streams a ticket channel into a gzipped JSONL file and a self-contained HTML
+# page. Messages are written one history page at a time (file IO runs in an
+# executor), so memory stays flat however long the ticket is. Both files are
+# written under a temporary name, fsynced and renamed only once complete.
+
+PAGE_SIZE = 100
+MAX_ATTEMPTS = 5
+
+HTML_HEAD = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{title}</title>
+<style>
+body {{ background: #313338; color: #dbdee1; font-family: sans-serif; margin: 0; padding: 16px; }}
+h1 {{ font-size: 18px; color: #fff; }}
+.msg {{ padding: 6px 0; border-bottom: 1px solid #3f4147; }}
+.author {{ font-weight: bold; color: #fff; }}
+.bot {{ background: #5865f2; color: #fff; font-size: 10px; padding: 1px 4px; border-radius: 3px; }}
+.time {{ color: #949ba4; font-size: 12px; margin-left: 6px; }}
+.content {{ white-space: pre-wrap; margin-top: 2px; }}
+.embed {{ border-left: 4px solid #5865f2; background: #2b2d31; padding: 6px 10px; margin-top: 4px; white-space: pre-wrap; }}
+a {{ color: #00a8fc; }}
+</style></head><body>
+<h1>{title}</h1>
+"""
+HTML_FOOT = "<p class=\"time\">{count} messages • exported {exported}</p>\n</body></html>\n"
+
+
+def message_record(message):
+    return {
+        'id': message.id,
+        'author_id': message.author.id,
+        'author': str(message.author),
+        'bot': message.author.bot,
+        'created_at': message.created_at.isoformat(),
+        'content': message.content,
+        'embeds': [{'title': e.title, 'description': e.description} for e in message.embeds],
+        'attachments': [a.url for a in message.attachments],
+    }
+
+
+def record_html(record):
+    esc = html.escape
+    parts = [f"<div class=\"msg\"><span class=\"author\">{esc(record['author'])}</span>"]
+    if record['bot']:
+        parts.append(" <span class=\"bot\">BOT</span>")
+    parts.append(f"<span class=\"time\">{esc(record['created_at'][:19].replace('T', ' '))}</span>")
+    if record['content']:
+        parts.append(f"<div class=\"content\">{esc(record['content'])}</div>")
+    for embed in record['embeds']:
+        text = "\n".join(esc(x) for x in (embed['title'], embed['description']) if x)
+        parts.append(f"<div class=\"embed\">{text}</div>")
+    for url in record['attachments']:
+        parts.append(f"<div><a href=\"{esc(url)}\">{esc(url.rsplit('/', 1)[-1].split('?')[0])}</a></div>")
+    parts.append("</div>\n")
+    return "".join(parts)
+
+
+class TranscriptWriter:
+    def __init__(self, base_path, title):
+        self.jsonl_path = base_path + ".jsonl.gz"
+        self.html_path = base_path + ".html"
+        os.makedirs(os.path.dirname(os.path.abspath(base_path)), exist_ok=True)
+        self.jsonl_raw = open(self.jsonl_path + ".tmp", "wb")
+        self.jsonl = gzip.GzipFile(fileobj=self.jsonl_raw, mode="wb")
+        self.html = open(self.html_path + ".tmp", "w", encoding="utf-8")
+        self.html.write(HTML_HEAD.format(title=html.escape(title)))
+        self.count = 0
+
+    def write_page(self, records):
+        self.jsonl.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records).encode("utf-8"))
+        self.html.write("".join(record_html(r) for r in records))
+        self.count += len(records)
+
+    def finish(self):
+        self.html.write(HTML_FOOT.format(count=self.count, exported=time.strftime("%Y-%m-%d %H:%M:%S UTC", time.gmtime())))
+        self.jsonl.close()
+        for f, path in ((self.jsonl_raw, self.jsonl_path), (self.html, self.html_path)):
+            f.flush()
+            os.fsync(f.fileno())
+            f.close()
+            os.replace(path + ".tmp", path)
+
+    def abort(self):
+        for f, path in ((self.jsonl_raw, self.jsonl_path), (self.html, self.html_path)):
+            try:
+                f.close()
+                os.unlink(path + ".tmp")
+            except OSError:
+                pass
+
+
+async def export_channel(channel, base_path, title, progress=None):
+    # Returns (jsonl_path, html_path, message_count). Rate limits and server
+    # errors resume the history walk after the last saved message.
+    loop = asyncio.get_running_loop()
+    writer = await loop.run_in_executor(None, TranscriptWriter, base_path, title)
+    last_id = None
+    attempt = 0
+    try:
+        while True:
+            try:
+                page = []
+                after = discord.Object(last_id) if last_id else None
+                async for message in channel.history(limit=None, oldest_first=True, after=after):
+                    page.append(message_record(message))
+                    if len(page) >= PAGE_SIZE:
+                        await loop.run_in_executor(None, writer.write_page, page)
+                        last_id = page[-1]['id']
+                        page = []
+                        attempt = 0
+                        if progress:
+                            await progress(writer.count)
+                if page:
+                    await loop.run_in_executor(None, writer.write_page, page)
+                break
+            except discord.HTTPException as e:
+                attempt += 1
+                if attempt >= MAX_ATTEMPTS or (e.status != 429 and e.status < 500):
+                    raise
+                await asyncio.sleep(min(30, 2 ** attempt))
+        await loop.run_in_executor(None, writer.finish)
+    except BaseException:
+        await loop.run_in_executor(None, writer.abort)
+        raise
+    return writer.jsonl_path, writer.html_path, writer.count